@@ -0,0 +1,31 @@
+"""add first_seen to subdomains_master
+
+Revision ID: 0003_master_first_seen
+Revises: 0002_create_app_tables
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_master_first_seen'
+down_revision = '0002_create_app_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = {c['name'] for c in inspector.get_columns('subdomains_master')}
+    if 'first_seen' not in columns:
+        op.add_column('subdomains_master', sa.Column('first_seen', sa.DateTime, nullable=True))
+        # best effort for existing rows; the next reconciliation lowers it to
+        # the earliest provider detection
+        op.execute("UPDATE subdomains_master SET first_seen = created_at WHERE first_seen IS NULL")
+
+
+def downgrade() -> None:
+    op.drop_column('subdomains_master', 'first_seen')
@@ -0,0 +1,37 @@
+"""create crtsh_watermark
+
+Revision ID: 0004_crtsh_watermark
+Revises: 0003_master_first_seen
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_crtsh_watermark'
+down_revision = '0003_master_first_seen'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table('crtsh_watermark'):
+        op.create_table(
+            'crtsh_watermark',
+            sa.Column('id', sa.Integer, primary_key=True, nullable=False),
+            sa.Column('domain', sa.String(length=1024), nullable=False),
+            sa.Column('max_cert_id', sa.BigInteger, nullable=False, server_default=sa.text('0')),
+            sa.Column('max_entry_timestamp', sa.String(length=64), nullable=True),
+            sa.Column('last_full_scan_at', sa.DateTime, nullable=True),
+            sa.Column('updated_at', sa.DateTime, nullable=False),
+        )
+        op.create_index('ix_crtsh_watermark_domain', 'crtsh_watermark', ['domain'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_crtsh_watermark_domain', table_name='crtsh_watermark')
+    op.drop_table('crtsh_watermark')
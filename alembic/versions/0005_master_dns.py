@@ -0,0 +1,34 @@
+"""add DNS resolution outcome to subdomains_master
+
+Revision ID: 0005_master_dns
+Revises: 0004_crtsh_watermark
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_master_dns'
+down_revision = '0004_crtsh_watermark'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = {c['name'] for c in inspector.get_columns('subdomains_master')}
+    if 'dns_status' not in columns:
+        op.add_column('subdomains_master', sa.Column('dns_status', sa.String(length=32), nullable=True))
+    if 'dns_addresses' not in columns:
+        op.add_column('subdomains_master', sa.Column('dns_addresses', sa.JSON, nullable=True))
+    if 'dns_checked_at' not in columns:
+        op.add_column('subdomains_master', sa.Column('dns_checked_at', sa.DateTime, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('subdomains_master', 'dns_checked_at')
+    op.drop_column('subdomains_master', 'dns_addresses')
+    op.drop_column('subdomains_master', 'dns_status')
@@ -0,0 +1,28 @@
+"""add open_ports to alive_subdomains
+
+Revision ID: 0006_alive_open_ports
+Revises: 0005_master_dns
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_alive_open_ports'
+down_revision = '0005_master_dns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = {c['name'] for c in inspector.get_columns('alive_subdomains')}
+    if 'open_ports' not in columns:
+        op.add_column('alive_subdomains', sa.Column('open_ports', sa.JSON, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('alive_subdomains', 'open_ports')
@@ -0,0 +1,37 @@
+"""add probe scheduling columns to subdomains_master
+
+Revision ID: 0007_master_probe_schedule
+Revises: 0006_alive_open_ports
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_master_probe_schedule'
+down_revision = '0006_alive_open_ports'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = {c['name'] for c in inspector.get_columns('subdomains_master')}
+    if 'next_probe_at' not in columns:
+        # existing rows stay NULL, so they are all due for the first scheduled run
+        op.add_column('subdomains_master', sa.Column('next_probe_at', sa.DateTime, nullable=True))
+    if 'probe_failures' not in columns:
+        op.add_column('subdomains_master', sa.Column('probe_failures', sa.Integer, nullable=False, server_default='0'))
+
+    indexes = {i['name'] for i in inspector.get_indexes('subdomains_master')}
+    if 'ix_subdomains_master_next_probe_at' not in indexes:
+        op.create_index('ix_subdomains_master_next_probe_at', 'subdomains_master', ['next_probe_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_subdomains_master_next_probe_at', table_name='subdomains_master')
+    op.drop_column('subdomains_master', 'probe_failures')
+    op.drop_column('subdomains_master', 'next_probe_at')
@@ -0,0 +1,31 @@
+"""add probe worker lease columns to subdomains_master
+
+Revision ID: 0008_master_probe_lease
+Revises: 0007_master_probe_schedule
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_master_probe_lease'
+down_revision = '0007_master_probe_schedule'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = {c['name'] for c in inspector.get_columns('subdomains_master')}
+    if 'lease_owner' not in columns:
+        op.add_column('subdomains_master', sa.Column('lease_owner', sa.String(length=255), nullable=True))
+    if 'lease_expires_at' not in columns:
+        op.add_column('subdomains_master', sa.Column('lease_expires_at', sa.DateTime, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('subdomains_master', 'lease_expires_at')
+    op.drop_column('subdomains_master', 'lease_owner')
@@ -0,0 +1,37 @@
+"""add response fingerprint columns to alive_subdomains
+
+Revision ID: 0009_alive_fingerprint
+Revises: 0008_master_probe_lease
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_alive_fingerprint'
+down_revision = '0008_master_probe_lease'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = {c['name'] for c in inspector.get_columns('alive_subdomains')}
+    if 'final_url' not in columns:
+        op.add_column('alive_subdomains', sa.Column('final_url', sa.Text, nullable=True))
+    if 'server' not in columns:
+        op.add_column('alive_subdomains', sa.Column('server', sa.Text, nullable=True))
+    if 'title' not in columns:
+        op.add_column('alive_subdomains', sa.Column('title', sa.Text, nullable=True))
+    if 'body_hash' not in columns:
+        op.add_column('alive_subdomains', sa.Column('body_hash', sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('alive_subdomains', 'body_hash')
+    op.drop_column('alive_subdomains', 'title')
+    op.drop_column('alive_subdomains', 'server')
+    op.drop_column('alive_subdomains', 'final_url')
@@ -0,0 +1,59 @@
+"""create probe_runs and probe_run_new_alives for resumable probe runs
+
+Revision ID: 0010_probe_runs
+Revises: 0009_alive_fingerprint
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_probe_runs'
+down_revision = '0009_alive_fingerprint'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table('probe_runs'):
+        op.create_table(
+            'probe_runs',
+            sa.Column('id', sa.Integer, primary_key=True, nullable=False),
+            sa.Column('kind', sa.String(length=16), nullable=False),
+            sa.Column('status', sa.String(length=16), nullable=False),
+            sa.Column('owner', sa.String(length=255), nullable=True),
+            sa.Column('row_limit', sa.Integer, nullable=True),
+            sa.Column('cursor', sa.BigInteger, nullable=True),
+            sa.Column('scanned', sa.Integer, nullable=False, server_default=sa.text('0')),
+            sa.Column('probed', sa.Integer, nullable=False, server_default=sa.text('0')),
+            sa.Column('alive', sa.Integer, nullable=False, server_default=sa.text('0')),
+            sa.Column('started_at', sa.DateTime, nullable=False),
+            sa.Column('updated_at', sa.DateTime, nullable=False),
+            sa.Column('finished_at', sa.DateTime, nullable=True),
+            sa.Column('notified_at', sa.DateTime, nullable=True),
+        )
+        op.create_index('ix_probe_runs_kind', 'probe_runs', ['kind'])
+        op.create_index('ix_probe_runs_status', 'probe_runs', ['status'])
+
+    if not inspector.has_table('probe_run_new_alives'):
+        op.create_table(
+            'probe_run_new_alives',
+            sa.Column('id', sa.Integer, primary_key=True, nullable=False),
+            sa.Column('run_id', sa.Integer, nullable=False),
+            sa.Column('subdomain', sa.String(length=1024), nullable=False),
+            sa.Column('status_code', sa.Integer, nullable=True),
+            sa.Column('probed_at', sa.DateTime, nullable=True),
+        )
+        op.create_index('ix_probe_run_new_alives_run_id', 'probe_run_new_alives', ['run_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_probe_run_new_alives_run_id', table_name='probe_run_new_alives')
+    op.drop_table('probe_run_new_alives')
+    op.drop_index('ix_probe_runs_status', table_name='probe_runs')
+    op.drop_index('ix_probe_runs_kind', table_name='probe_runs')
+    op.drop_table('probe_runs')
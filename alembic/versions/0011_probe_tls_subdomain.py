@@ -0,0 +1,33 @@
+"""create probe_tls_subdomain for names harvested from probed certificates
+
+Revision ID: 0011_probe_tls_subdomain
+Revises: 0010_probe_runs
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_probe_tls_subdomain'
+down_revision = '0010_probe_runs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table('probe_tls_subdomain'):
+        op.create_table(
+            'probe_tls_subdomain',
+            sa.Column('id', sa.Integer, primary_key=True, nullable=False),
+            sa.Column('detected_at', sa.DateTime, nullable=False),
+            sa.Column('subdomain', sa.String(length=1024), nullable=True, unique=True),
+            sa.Column('seen_on', sa.String(length=1024), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('probe_tls_subdomain')
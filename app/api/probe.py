@@ -42,8 +42,8 @@ async def probe_now(
         HTTPException: If there's an error scheduling the probe job
     """
     try:
-        # Schedule the background task to probe all subdomains
-        background_tasks.add_task(probe_master)
+        # Schedule the background task to probe all subdomains (results are only persisted)
+        background_tasks.add_task(probe_master, collect=False)
         
         app_logger.info("api.probe.scheduled")
         
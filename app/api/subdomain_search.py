@@ -13,6 +13,8 @@ from app.models.domain_requested import DomainRequested
 from fastapi import HTTPException
 from datetime import datetime
 from app.jobs.scheduler import add_daily_job
+from app.services.master_reconciler import reconcile_master
+from app.services.known_subdomains import KnownSubdomains
 
 import asyncio
 
@@ -112,16 +114,39 @@ async def subdomain_search(
             finally:
                 db_local.close()
 
-        tasks = [
-            asyncio.to_thread(run_crtsh, req.domain),
-            asyncio.to_thread(run_otx, req.domain),
-            asyncio.to_thread(run_shodan, req.domain),
-            asyncio.to_thread(run_virustotal, req.domain),
-        ]
+        def load_known(domain: str) -> KnownSubdomains:
+            db_local = SessionLocal()
+            try:
+                return KnownSubdomains.load(db_local, domain)
+            finally:
+                db_local.close()
+
+        def run_reconcile(domain: str):
+            db_local = SessionLocal()
+            try:
+                reconcile_master(db_local, domain)
+            finally:
+                db_local.close()
+
+        async def run_providers(domain: str):
+            # names already in master, so providers only write what is new (as in the scheduled scan)
+            known = await asyncio.to_thread(load_known, domain)
+            for svc in (crtsh_service, otx_service, shodan_service, virus_total_service):
+                svc.known = known
+            await concurrent_tasks([
+                asyncio.to_thread(run_crtsh, domain),
+                asyncio.to_thread(run_otx, domain),
+                asyncio.to_thread(run_shodan, domain),
+                asyncio.to_thread(run_virustotal, domain),
+            ])
+            for source, counts in known.summary().items():
+                app_logger.info(f"task: {domain} {source}: {counts['written']} rows written, {counts['skipped']} known rows skipped")
 
         app_logger.info(f"scheduling background tasks for {req.domain}")
         # schedule the concurrent execution of tasks in the background
-        background_task.add_task(concurrent_tasks, tasks)
+        background_task.add_task(run_providers, req.domain)
+        # background tasks run in order: merge into master once providers are done
+        background_task.add_task(run_reconcile, req.domain)
 
         return {"status": f'scan initiated for domain {req.domain}'}
     except HTTPException:
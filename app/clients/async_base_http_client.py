@@ -0,0 +1,202 @@
+import asyncio
+import random
+import re
+import weakref
+
+import aiohttp
+
+from typing import Dict, Any, Optional
+from urllib.parse import urljoin
+from abc import ABC
+from app.utils.log import app_logger
+from app.config.settings import settings
+from app.clients.base_http_client import BaseHTTPClient, parse_retry_after
+from app.clients.rate_limiter import get_rate_limiter
+from app.clients.response_cache import CachingClientMixin, decode_body
+
+
+# one pooled session per event loop, shared by every async client on it
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+def get_shared_session() -> aiohttp.ClientSession:
+    """Return the pooled `aiohttp` session of the running loop, creating it on first use.
+
+    The connector caps total and per-host connections and keeps idle
+    connections alive so provider calls reuse TCP/TLS sessions.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=settings.ASYNC_HTTP_MAX_CONNECTIONS,
+            limit_per_host=settings.ASYNC_HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=settings.ASYNC_HTTP_KEEPALIVE,
+            ttl_dns_cache=300,
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[loop] = session
+    return session
+
+
+async def close_shared_session() -> None:
+    """Close the running loop's shared session (call before the loop ends)."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+class AsyncBaseHTTPClient(CachingClientMixin, ABC):
+    """Asyncio counterpart of `BaseHTTPClient`.
+
+    Same constructor, `get`/`post` surface, retry/backoff and 429 handling
+    (including the shared provider rate limiter) and response cache, but requests go through the
+    loop's pooled `aiohttp` session instead of a per-client `requests.Session`.
+    """
+
+    USER_AGENTS = BaseHTTPClient.USER_AGENTS
+
+    def __init__(self,
+                 base_url: str,
+                 api_key: Optional[str] = None,
+                 timeout: int = 30, max_retries: int = 3,
+                 retry_delay: float = 1.5,
+                 content_type: Optional[str] = 'application/json',
+                 accept: Optional[str] = 'application/json',
+                 rate_limit_key: Optional[str] = None,
+                 cache_namespace: Optional[str] = None
+                 ):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+        self.content_type = content_type
+        self.accept = accept
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.rate_limiter = get_rate_limiter(rate_limit_key)
+        self._setup_cache(cache_namespace)
+        self.headers: Dict[str, str] = {}
+
+        # setup default headers
+        self._setup_default_headers()
+
+    def _setup_default_headers(self):
+        """setup default headers for the client"""
+        self.headers.update({
+            'User-Agent': random.choice(self.USER_AGENTS),
+            'Accept': self.accept,
+            'Content-Type': self.content_type,
+        })
+
+        # add authentication header if api_key is provided
+        if self.api_key:
+            self._setup_authentication()
+
+    def _setup_authentication(self):
+        """setup authentication with API key (can be overridden)"""
+        pass
+
+    def _build_url(self, endpoint: str) -> str:
+        """build full URL"""
+        return urljoin(f"{self.base_url}/", endpoint.lstrip('/'))
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        return get_shared_session()
+
+    async def _throttle(self):
+        """wait for the provider rate limiter before sending a request"""
+        if self.rate_limiter is not None:
+            waited = await self.rate_limiter.acquire_async()
+            if waited:
+                app_logger.debug("request.throttled", limiter=self.rate_limiter.name, waited=round(waited, 3))
+
+    async def _on_rate_limited(self, response, url: str, attempt: int):
+        """handle HTTP 429: pause the shared limiter, or this task when there is none"""
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        app_logger.warning("request.rate_limited", url=url, attempt=attempt + 1, wait=retry_after)
+        if self.rate_limiter is not None:
+            self.rate_limiter.penalize(retry_after)
+        else:
+            await asyncio.sleep(retry_after)
+
+    async def _make_request(self, method: str, endpoint: str,
+                            params: Optional[Dict] = None,
+                            data: Optional[Dict] = None,
+                            headers: Optional[Dict] = None) -> Dict[str, Any]:
+        """do HTTP request with retries"""
+        url = self._build_url(endpoint)
+        request_headers = {**self.headers, **(headers or {})}
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        key, entry, fresh = self._cache_lookup(method, url, params)
+        if fresh:
+            body = await asyncio.to_thread(self._cache_read, key, 'hit')
+            if body is not None:
+                return decode_body(body)
+        if entry is not None:
+            request_headers.update(entry.validators())
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._throttle()
+                async with self.session.request(
+                    method,
+                    url,
+                    params=params,
+                    json=data,
+                    headers=request_headers,
+                    timeout=timeout,
+                ) as response:
+                    # check rate limiting
+                    if response.status == 429:
+                        await self._on_rate_limited(response, url, attempt)
+                        continue
+
+                    # stale cache entry is still current
+                    if response.status == 304 and entry is not None:
+                        body = await asyncio.to_thread(self._cache_revalidated, key, response.headers)
+                        if body is not None:
+                            return decode_body(body)
+                        # evicted in the meantime: ask for the full body
+                        entry = None
+                        request_headers = {**self.headers, **(headers or {})}
+                        continue
+
+                    # debug log for non-success status codes (we'll still raise below)
+                    if response.status >= 400:
+                        app_logger.debug("request.status", method=method, url=url, status_code=response.status)
+
+                    response.raise_for_status()
+
+                    body = await response.read()
+                    if key is not None:
+                        await asyncio.to_thread(self._cache_store, key, response.headers, body)
+
+                    # json when possible, otherwise {'text': ...}
+                    return decode_body(body)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # sanitize message to remove memory addresses like <Connection(...) at 0x...>
+                raw = str(e)
+                sanitized = re.sub(r'0x[0-9a-fA-F]+', '<ptr>', raw)
+                exc_type = type(e).__name__
+                app_logger.error("request.failed", method=method, url=url, attempt=attempt + 1, exc_type=exc_type, error=sanitized)
+
+                if attempt == self.max_retries:
+                    raise
+
+                # exponential backoff
+                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+
+        raise Exception(f"Failed to make request after {self.max_retries} attempts")
+
+    async def get(self, endpoint: str, params: Optional[Dict] = None,
+                  headers: Optional[Dict] = None) -> Dict[str, Any]:
+        """do GET request"""
+        return await self._make_request('GET', endpoint, params=params, headers=headers)
+
+    async def post(self, endpoint: str, data: Optional[Dict] = None,
+                   headers: Optional[Dict] = None) -> Dict[str, Any]:
+        """do POST request"""
+        return await self._make_request('POST', endpoint, data=data, headers=headers)
@@ -6,11 +6,29 @@ import re
 
 from typing import Dict, Any, Optional
 from urllib.parse import urljoin
+from email.utils import parsedate_to_datetime
 from abc import ABC
 from app.utils.log import app_logger
+from app.clients.rate_limiter import get_rate_limiter
+from app.clients.response_cache import CachingClientMixin, decode_body
 
-class BaseHTTPClient(ABC):
-    """Base HTTP client with common functionalities like GET, POST, retries, and error handling"""
+def parse_retry_after(value: Optional[str], default: float = 60.0) -> float:
+    """Seconds to wait from a `Retry-After` header (delta-seconds or HTTP date)."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class BaseHTTPClient(CachingClientMixin, ABC):
+    """Base HTTP client with common functionalities like GET, POST, retries, caching and error handling"""
     
     def __init__(self,
                  base_url: str,
@@ -18,7 +36,9 @@ class BaseHTTPClient(ABC):
                  timeout: int = 30, max_retries: int = 3, 
                  retry_delay: float = 1.5,
                  content_type: Optional[str] = 'application/json',
-                 accept: Optional[str] = 'application/json'
+                 accept: Optional[str] = 'application/json',
+                 rate_limit_key: Optional[str] = None,
+                 cache_namespace: Optional[str] = None
                  ):
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
@@ -28,6 +48,10 @@ class BaseHTTPClient(ABC):
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.session = requests.Session()
+        # process-wide token bucket for this provider (None = unlimited)
+        self.rate_limiter = get_rate_limiter(rate_limit_key)
+        # on-disk response cache for GETs (disabled when the namespace has no TTL)
+        self._setup_cache(cache_namespace)
         
         # setup default headers
         self._setup_default_headers()
@@ -68,6 +92,22 @@ class BaseHTTPClient(ABC):
         """build full URL"""
         return urljoin(f"{self.base_url}/", endpoint.lstrip('/'))
     
+    def _throttle(self):
+        """wait for the provider rate limiter before sending a request"""
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.acquire()
+            if waited:
+                app_logger.debug("request.throttled", limiter=self.rate_limiter.name, waited=round(waited, 3))
+
+    def _on_rate_limited(self, response, url: str, attempt: int):
+        """handle HTTP 429: pause the shared limiter, or this thread when there is none"""
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        app_logger.warning("request.rate_limited", url=url, attempt=attempt + 1, wait=retry_after)
+        if self.rate_limiter is not None:
+            self.rate_limiter.penalize(retry_after)
+        else:
+            time.sleep(retry_after)
+
     def _make_request(self, method: str, endpoint: str, 
                      params: Optional[Dict] = None,
                      data: Optional[Dict] = None,
@@ -75,9 +115,18 @@ class BaseHTTPClient(ABC):
         """do HTTP request with retries"""
         url = self._build_url(endpoint)
         request_headers = headers or {}
+
+        key, entry, fresh = self._cache_lookup(method, url, params)
+        if fresh:
+            body = self._cache_read(key, 'hit')
+            if body is not None:
+                return decode_body(body)
+        if entry is not None:
+            request_headers = {**request_headers, **entry.validators()}
         
         for attempt in range(self.max_retries + 1):
             try:
+                self._throttle()
                 response = self.session.request(
                     method=method,
                     url=url,
@@ -89,9 +138,17 @@ class BaseHTTPClient(ABC):
 
                 # check rate limiting
                 if response.status_code == 429:
-                    retry_after = int(response.headers.get('Retry-After', 60))
-                    app_logger.warning("request.rate_limited", url=url, attempt=attempt + 1, wait=retry_after)
-                    time.sleep(retry_after)
+                    self._on_rate_limited(response, url, attempt)
+                    continue
+
+                # stale cache entry is still current
+                if response.status_code == 304 and entry is not None:
+                    body = self._cache_revalidated(key, response.headers)
+                    if body is not None:
+                        return decode_body(body)
+                    # evicted in the meantime: ask for the full body
+                    entry = None
+                    request_headers = headers or {}
                     continue
 
                 # debug log for non-success status codes (we'll still raise below)
@@ -100,6 +157,9 @@ class BaseHTTPClient(ABC):
 
                 response.raise_for_status()
 
+                if key is not None:
+                    self._cache_store(key, response.headers, response.content)
+
                 # try to parse json response
                 try:
                     return response.json()
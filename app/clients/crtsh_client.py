@@ -1,24 +1,39 @@
+import asyncio
+import codecs
+import io
 import json
 import time
 
-from app.core.exceptions.exceptions import ExternalAPIError
+import aiohttp
+
+from app.core.exceptions.exceptions import ExternalAPIError, ParsingError
 from app.utils.log import app_logger
+from app.utils.json_stream import JsonArrayParser, iter_json_array
 from app.clients.base_http_client import BaseHTTPClient
+from app.clients.async_base_http_client import AsyncBaseHTTPClient
 
 
 class CrtshClient(BaseHTTPClient):
+    # bytes read from the socket per step when streaming a response
+    STREAM_CHUNK_SIZE = 64 * 1024
+
     def __init__(self):
         super().__init__(
             base_url="https://crt.sh/",
             timeout=45,
             max_retries=3,
             retry_delay=1.5,
+            rate_limit_key='crtsh',
+            cache_namespace='crtsh',
         )
+        # True once the last search/stream parsed the complete response
+        self.last_complete = False
 
     def search_domain(self, domain):
         """ Search certificates for a given domain.
 
-        This method retries up to `max_retries` when receiving HTTP 502 responses.
+        This method retries up to `max_retries` when receiving HTTP 502 or 429
+        responses (429 pauses the shared crt.sh rate limiter).
         Returns parsed JSON on success or an empty list on failure.
         """
         params = {
@@ -28,11 +43,33 @@ class CrtshClient(BaseHTTPClient):
 
         attempts = getattr(self, 'max_retries', 3)
         delay = getattr(self, 'retry_delay', 1.5)
+        url = self._build_url('')
+        self.last_complete = False
+
+        key, entry, fresh = self._cache_lookup('GET', url, params)
+        if fresh:
+            body = self._cache_read(key, 'hit')
+            if body is not None:
+                return self._load_certificates(body, domain)
+        validators = entry.validators() if entry is not None else {}
 
         for attempt in range(1, attempts + 1):
             try:
                 # Use session.request so we get the full response object
-                resp = self.session.request('GET', self._build_url(''), params=params, timeout=self.timeout)
+                self._throttle()
+                resp = self.session.request('GET', url, params=params, headers=validators, timeout=self.timeout)
+
+                if resp.status_code == 429:
+                    # pauses every crt.sh caller in the process, not just this one
+                    self._on_rate_limited(resp, resp.url, attempt - 1)
+                    continue
+
+                if resp.status_code == 304 and entry is not None:
+                    body = self._cache_revalidated(key, resp.headers)
+                    if body is not None:
+                        return self._load_certificates(body, domain)
+                    entry, validators = None, {}
+                    continue
 
                 if resp.status_code == 502:
                     app_logger.warning(f"crtsh returning 502 (attempt {attempt}/{attempts}); retrying after {delay}s")
@@ -49,15 +86,279 @@ class CrtshClient(BaseHTTPClient):
                     return []
 
                 # attempt JSON parse
-                try:
-                    return resp.json()
-                except json.JSONDecodeError:
-                    app_logger.error(f"crtsh: failed to decode JSON for domain {domain}")
-                    return []
+                certificates = self._load_certificates(resp.content, domain)
+                if key is not None and certificates:
+                    self._cache_store(key, resp.headers, resp.content)
+                return certificates
 
             except Exception as e:
                 app_logger.error(f"error requesting subdomain: {e}")
                 # if it's the last attempt, return empty
                 if attempt >= attempts:
                     return []
-                time.sleep(delay)
\ No newline at end of file
+                time.sleep(delay)
+
+        app_logger.error(f"crtsh: no usable response for domain {domain} after {attempts} attempts")
+        return []
+
+    def _load_certificates(self, body: bytes, domain):
+        try:
+            certificates = json.loads(body) or []
+            self.last_complete = True
+            return certificates
+        except ValueError:
+            app_logger.error(f"crtsh: failed to decode JSON for domain {domain}")
+            return []
+
+    def iter_certificates(self, domain):
+        """ Stream certificates for a given domain one record at a time.
+
+        Same retry policy as `search_domain`, but the body is parsed
+        incrementally so memory stays bounded whatever the response size.
+        Retries only happen before the first record is yielded; a failure
+        mid-stream is logged and ends the iteration. Cached bodies are
+        streamed from disk, and fresh downloads are compressed into the cache
+        while they are parsed.
+        """
+        params = {
+            'q': f'{domain}',
+            'output': 'json'
+        }
+
+        attempts = getattr(self, 'max_retries', 3)
+        delay = getattr(self, 'retry_delay', 1.5)
+        url = self._build_url('')
+        yielded = 0
+        self.last_complete = False
+
+        key, entry, fresh = self._cache_lookup('GET', url, params)
+        cached = self._cache_open(key, 'hit') if fresh else None
+        validators = entry.validators() if entry is not None else {}
+
+        # only network requests count as attempts: replaying a revalidated entry does not
+        attempt = 0
+        while True:
+            try:
+                if cached is not None:
+                    for cert in self._iter_cached(cached):
+                        yielded += 1
+                        yield cert
+                    self.last_complete = True
+                    return
+
+                if attempt >= attempts:
+                    app_logger.error(f"crtsh: no usable response for domain {domain} after {attempts} attempts")
+                    return
+                attempt += 1
+                self._throttle()
+                resp = self.session.request('GET', url, params=params, headers=validators, timeout=self.timeout, stream=True)
+                with resp:
+                    if resp.status_code == 429:
+                        self._on_rate_limited(resp, resp.url, attempt - 1)
+                        continue
+
+                    if resp.status_code == 304 and entry is not None:
+                        self.cache.refresh(key, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+                        cached = self._cache_open(key, 'revalidated')
+                        if cached is None:
+                            entry, validators = None, {}
+                        continue
+
+                    if resp.status_code == 502:
+                        app_logger.warning(f"crtsh returning 502 (attempt {attempt}/{attempts}); retrying after {delay}s")
+                        if attempt < attempts:
+                            time.sleep(delay)
+                            continue
+                        app_logger.error("crtsh: exhausted retries after receiving 502")
+                        return
+
+                    if resp.status_code >= 400:
+                        app_logger.error(f"crtsh returned status {resp.status_code} for domain {domain}")
+                        return
+
+                    writer = self._cache_writer(key, resp.headers)
+                    # crt.sh does not always declare a charset
+                    decoder = codecs.getincrementaldecoder(resp.encoding or 'utf-8')(errors='replace')
+                    try:
+                        for cert in iter_json_array(self._tee(resp.iter_content(chunk_size=self.STREAM_CHUNK_SIZE), decoder, writer)):
+                            yielded += 1
+                            yield cert
+                    except BaseException:
+                        # never cache a partial body (also covers a consumer stopping early)
+                        if writer is not None:
+                            writer.abort()
+                        raise
+                    self._cache_commit(writer)
+                    self.last_complete = True
+                    return
+
+            except ParsingError as e:
+                app_logger.error(f"crtsh: failed to decode JSON stream for domain {domain} after {yielded} records: {e}")
+                return
+            except Exception as e:
+                app_logger.error(f"error requesting subdomain: {e}")
+                # records already handed out cannot be replayed
+                if yielded or attempt >= attempts:
+                    return
+                # an unreadable cache entry falls back to the network
+                cached = None
+                time.sleep(delay)
+
+    def _iter_cached(self, fh):
+        """ yield the certificates of a cached body without loading it whole """
+        with fh:
+            text = io.TextIOWrapper(fh, encoding='utf-8', errors='replace')
+            yield from iter_json_array(iter(lambda: text.read(self.STREAM_CHUNK_SIZE), ''))
+
+    @staticmethod
+    def _tee(chunks, decoder, writer):
+        """ decode raw chunks to text, copying the bytes into the cache writer """
+        for chunk in chunks:
+            if writer is not None:
+                writer.write(chunk)
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+
+
+class AsyncCrtshClient(AsyncBaseHTTPClient):
+    STREAM_CHUNK_SIZE = CrtshClient.STREAM_CHUNK_SIZE
+
+    def __init__(self):
+        super().__init__(
+            base_url="https://crt.sh/",
+            timeout=45,
+            max_retries=3,
+            retry_delay=1.5,
+            rate_limit_key='crtsh',
+            cache_namespace='crtsh',
+        )
+        # True once the last search/stream parsed the complete response
+        self.last_complete = False
+
+    async def search_domain(self, domain):
+        """ Search certificates for a given domain (asyncio `CrtshClient.search_domain`).
+
+        Returns the list of certificate records, or an empty list on failure.
+        """
+        certificates = []
+        async for batch in self.iter_certificate_batches(domain):
+            certificates.extend(batch)
+        return certificates
+
+    async def iter_certificate_batches(self, domain):
+        """ Stream certificates for a given domain, one list of records per network chunk.
+
+        Same retry and caching policy as `CrtshClient.iter_certificates`:
+        retries only happen before the first batch is yielded, and a failure
+        mid-stream is logged and ends the iteration.
+        """
+        params = {
+            'q': f'{domain}',
+            'output': 'json'
+        }
+
+        attempts = getattr(self, 'max_retries', 3)
+        delay = getattr(self, 'retry_delay', 1.5)
+        url = self._build_url('')
+        # large bodies take a while to download; only bound connect and idle reads
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        yielded = 0
+        self.last_complete = False
+
+        key, entry, fresh = self._cache_lookup('GET', url, params)
+        cached = await asyncio.to_thread(self._cache_open, key, 'hit') if fresh else None
+        validators = entry.validators() if entry is not None else {}
+
+        # only network requests count as attempts: replaying a revalidated entry does not
+        attempt = 0
+        while True:
+            try:
+                if cached is not None:
+                    async for batch in self._iter_cached_batches(cached):
+                        yielded += len(batch)
+                        yield batch
+                    self.last_complete = True
+                    return
+
+                if attempt >= attempts:
+                    app_logger.error(f"crtsh: no usable response for domain {domain} after {attempts} attempts")
+                    return
+                attempt += 1
+                await self._throttle()
+                async with self.session.get(url, params=params, headers={**self.headers, **validators}, timeout=timeout) as resp:
+                    if resp.status == 429:
+                        await self._on_rate_limited(resp, str(resp.url), attempt - 1)
+                        continue
+
+                    if resp.status == 304 and entry is not None:
+                        self.cache.refresh(key, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+                        cached = await asyncio.to_thread(self._cache_open, key, 'revalidated')
+                        if cached is None:
+                            entry, validators = None, {}
+                        continue
+
+                    if resp.status == 502:
+                        app_logger.warning(f"crtsh returning 502 (attempt {attempt}/{attempts}); retrying after {delay}s")
+                        if attempt < attempts:
+                            await asyncio.sleep(delay)
+                            continue
+                        app_logger.error("crtsh: exhausted retries after receiving 502")
+                        return
+
+                    if resp.status >= 400:
+                        app_logger.error(f"crtsh returned status {resp.status} for domain {domain}")
+                        return
+
+                    writer = self._cache_writer(key, resp.headers)
+                    # crt.sh does not always declare a charset
+                    decoder = codecs.getincrementaldecoder(resp.charset or 'utf-8')(errors='replace')
+                    parser = JsonArrayParser()
+                    try:
+                        async for chunk in resp.content.iter_chunked(self.STREAM_CHUNK_SIZE):
+                            if writer is not None:
+                                writer.write(chunk)
+                            batch = parser.feed(decoder.decode(chunk))
+                            if batch:
+                                yielded += len(batch)
+                                yield batch
+                        batch = parser.feed(decoder.decode(b'', final=True)) + parser.close()
+                        if batch:
+                            yield batch
+                    except BaseException:
+                        # never cache a partial body (also covers a consumer stopping early)
+                        if writer is not None:
+                            writer.abort()
+                        raise
+                    self._cache_commit(writer)
+                    self.last_complete = True
+                    return
+
+            except ParsingError as e:
+                app_logger.error(f"crtsh: failed to decode JSON stream for domain {domain} after {yielded} records: {e}")
+                return
+            except Exception as e:
+                app_logger.error(f"error requesting subdomain: {e}")
+                # records already handed out cannot be replayed
+                if yielded or attempt >= attempts:
+                    return
+                # an unreadable cache entry falls back to the network
+                cached = None
+                await asyncio.sleep(delay)
+
+    async def _iter_cached_batches(self, fh):
+        """ yield the certificates of a cached body in batches, reading it off the loop """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        parser = JsonArrayParser()
+        try:
+            while True:
+                chunk = await asyncio.to_thread(fh.read, self.STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                batch = parser.feed(decoder.decode(chunk))
+                if batch:
+                    yield batch
+            batch = parser.feed(decoder.decode(b'', final=True)) + parser.close()
+            if batch:
+                yield batch
+        finally:
+            fh.close()
@@ -2,6 +2,9 @@ import json
 
 from app.utils.log import app_logger
 from app.clients.base_http_client import BaseHTTPClient
+from app.clients.async_base_http_client import AsyncBaseHTTPClient
+
+
 class OtxClient(BaseHTTPClient):
     def __init__(self, api_key):
         super().__init__(
@@ -9,7 +12,9 @@ class OtxClient(BaseHTTPClient):
             timeout=45,
             max_retries=3,
             retry_delay=1.5,
-            api_key=api_key
+            api_key=api_key,
+            rate_limit_key='otx',
+            cache_namespace='otx',
         )
     
     def get_subdomains(self, target_domain):
@@ -29,4 +34,30 @@ class OtxClient(BaseHTTPClient):
         
         except json.JSONDecodeError as e:
             app_logger.error(f"error decoding json: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+class AsyncOtxClient(AsyncBaseHTTPClient):
+    def __init__(self, api_key):
+        super().__init__(
+            base_url="https://otx.alienvault.com",
+            timeout=45,
+            max_retries=3,
+            retry_delay=1.5,
+            api_key=api_key,
+            rate_limit_key='otx',
+            cache_namespace='otx',
+        )
+
+    async def get_subdomains(self, target_domain):
+        headers = {
+            "X-OTX-API-KEY": self.api_key
+        }
+
+        try:
+            response = await self.get(endpoint=f"/api/v1/indicators/domain/{target_domain}/passive_dns", headers=headers)
+            return response.get('passive_dns', [])
+
+        except Exception as e:
+            app_logger.error(f"error requesting subdomain: {e}")
+            return []
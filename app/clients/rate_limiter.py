@@ -0,0 +1,105 @@
+import asyncio
+import time
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from app.config.settings import settings
+from app.utils.log import app_logger
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every client of one provider.
+
+    Behavior:
+    - `rate` tokens per second are added up to `burst`; each request takes one.
+    - Callers reserve their slot under the lock and sleep outside it, so
+      concurrent scans are served in order at exactly `rate` requests/second.
+    - `penalize(seconds)` (called on HTTP 429) pauses the whole bucket for
+      `Retry-After` seconds instead of only the thread that got throttled:
+      the reservation schedule is shifted by the pause, so callers already
+      waiting keep their spacing after it instead of all leaving at once.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int = 1):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = float(max(1, burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        # total seconds the schedule was pushed back by penalties; waiters add what accrued after reserving
+        self._shift = 0.0
+        self._lock = Lock()
+
+    def _reserve(self) -> Tuple[float, float]:
+        """Take a token; returns the monotonic time the caller may proceed and the current shift."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._blocked_until)
+            if start > self._updated:
+                self._tokens = min(self.capacity, self._tokens + (start - self._updated) * self.rate)
+                self._updated = start
+            self._tokens -= 1
+            return start + max(0.0, -self._tokens / self.rate), self._shift
+
+    def _remaining(self, ready_at: float, shift: float) -> float:
+        # penalties applied while the caller was waiting push its slot back by the same amount
+        return ready_at + (self._shift - shift) - time.monotonic()
+
+    def acquire(self) -> float:
+        """Block until a request may be sent. Returns the seconds waited."""
+        ready_at, shift = self._reserve()
+        waited = 0.0
+        while True:
+            wait = self._remaining(ready_at, shift)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self) -> float:
+        """Event-loop friendly `acquire()`."""
+        ready_at, shift = self._reserve()
+        waited = 0.0
+        while True:
+            wait = self._remaining(ready_at, shift)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def penalize(self, seconds: float) -> None:
+        """Pause every caller of this bucket for `seconds` (e.g. `Retry-After`)."""
+        with self._lock:
+            now = time.monotonic()
+            until = now + max(0.0, seconds)
+            # concurrent 429s overlap: only the part of the pause not already applied shifts the schedule
+            delta = until - max(now, self._blocked_until)
+            if delta > 0:
+                self._blocked_until = until
+                self._shift += delta
+                self._updated = max(self._updated + delta, until)
+                # no burst right after the pause
+                self._tokens = min(self._tokens, 0.0)
+        app_logger.warning("rate_limiter.paused", limiter=self.name, seconds=seconds)
+
+
+_limiters: Dict[str, Optional[TokenBucket]] = {}
+_registry_lock = Lock()
+
+
+def get_rate_limiter(name: Optional[str]) -> Optional[TokenBucket]:
+    """Return the process-wide bucket for provider `name`.
+
+    Rates come from `Settings` as `<NAME>_RATE_LIMIT` (requests/second) and
+    `<NAME>_RATE_BURST`; a missing or non-positive rate disables limiting.
+    """
+    if not name:
+        return None
+
+    with _registry_lock:
+        if name not in _limiters:
+            rate = float(getattr(settings, f"{name.upper()}_RATE_LIMIT", 0) or 0)
+            burst = int(getattr(settings, f"{name.upper()}_RATE_BURST", 1) or 1)
+            _limiters[name] = TokenBucket(name, rate, burst) if rate > 0 else None
+        return _limiters[name]
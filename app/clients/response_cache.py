@@ -0,0 +1,342 @@
+import collections
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.config.settings import settings
+from app.utils.log import app_logger
+
+
+# query parameters carrying credentials (e.g. Shodan's `?key=`); never part of a cache key
+SECRET_PARAMS = frozenset({'key', 'apikey', 'api_key', 'token', 'access_token'})
+
+_BODY_SUFFIX = '.gz'
+_META_SUFFIX = '.meta'
+
+
+def cache_key(method: str, url: str, params: Optional[Dict] = None) -> str:
+    """Stable key for a request: method + URL + sorted query params, credentials excluded."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((str(k), str(v)) for k, v in params.items() if v is not None)
+    query = sorted((k, v) for k, v in query if k.lower() not in SECRET_PARAMS)
+    canonical = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urlencode(query), ''))
+    return hashlib.sha256(f"{method.upper()} {canonical}".encode()).hexdigest()
+
+
+def decode_body(body: bytes) -> Any:
+    """Parse a cached body the way `BaseHTTPClient` parses live responses."""
+    try:
+        return json.loads(body)
+    except ValueError:
+        return {'text': body.decode('utf-8', errors='replace')}
+
+
+class CacheEntry:
+    """Metadata of one cached response (the body is stored gzip-compressed beside it)."""
+
+    def __init__(self, key: str, stored_at: float, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.key = key
+        self.stored_at = stored_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored_at < ttl
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating a stale entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class CacheWriter:
+    """Gzip a response body as it is read; the entry only becomes visible on `commit()`.
+
+    A failed write (e.g. disk full) is logged and turns the writer into a
+    no-op, so caching never breaks the request being served.
+    """
+
+    def __init__(self, cache: "ResponseCache", key: str, etag: Optional[str], last_modified: Optional[str]):
+        self._cache = cache
+        self._key = key
+        self._etag = etag
+        self._last_modified = last_modified
+        self._done = False
+        fd, self._tmp = tempfile.mkstemp(dir=cache.directory, suffix='.tmp')
+        self._raw = os.fdopen(fd, 'wb')
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=6)
+
+    def write(self, data: bytes) -> None:
+        if self._done:
+            return
+        try:
+            self._gz.write(data)
+        except OSError as e:
+            app_logger.error("cache.store_failed", key=self._key, error=str(e))
+            self.abort()
+
+    def commit(self) -> bool:
+        """Publish the entry; False if the writer already failed or was aborted."""
+        if self._done:
+            return False
+        self._done = True
+        self._gz.close()
+        self._raw.close()
+        self._cache._commit(self._key, self._tmp, self._etag, self._last_modified)
+        return True
+
+    def abort(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        for closable in (self._gz, self._raw):
+            try:
+                closable.close()
+            except OSError:
+                pass
+        try:
+            os.unlink(self._tmp)
+        except OSError:
+            pass
+
+
+class ResponseCache:
+    """Size-bounded on-disk cache of provider responses.
+
+    Bodies are stored gzip-compressed (`<key>.gz`) with a small JSON sidecar
+    (`<key>.meta`) holding the store time and `ETag`/`Last-Modified`
+    validators. Least recently used entries are evicted once the compressed
+    size exceeds `max_bytes`. Hit/miss counters are kept per namespace
+    (provider) and returned by `stats()`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = Lock()
+        # key -> compressed size, least recently used first
+        self._lru: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self._total = 0
+        self._counters: Dict[Tuple[str, str], int] = collections.Counter()
+        self._load()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def _load(self):
+        """Index existing entries by last use and drop leftovers of interrupted writes."""
+        found = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.tmp'):
+                    os.unlink(path)
+                elif name.endswith(_BODY_SUFFIX):
+                    st = os.stat(path)
+                    found.append((st.st_mtime, name[:-len(_BODY_SUFFIX)], st.st_size))
+            except OSError:
+                continue
+        for _, key, size in sorted(found):
+            self._lru[key] = size
+            self._total += size
+        with self._lock:
+            self._evict_locked()
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._path(key, _META_SUFFIX)) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if key not in self._lru:
+            return None
+        return CacheEntry(key, float(meta.get('stored_at', 0)), meta.get('etag'), meta.get('last_modified'))
+
+    def open_body(self, key: str):
+        """Open the decompressed body of `key` for reading (raises OSError if evicted)."""
+        fh = gzip.open(self._path(key, _BODY_SUFFIX), 'rb')
+        self._touch(key)
+        return fh
+
+    def read_body(self, key: str) -> bytes:
+        with self.open_body(key) as fh:
+            return fh.read()
+
+    def writer(self, key: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> CacheWriter:
+        return CacheWriter(self, key, etag, last_modified)
+
+    def store(self, key: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None) -> bool:
+        writer = self.writer(key, etag, last_modified)
+        writer.write(body)
+        return writer.commit()
+
+    def refresh(self, key: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Restart the TTL of a revalidated entry (HTTP 304), keeping its body."""
+        entry = self.lookup(key)
+        if entry is None:
+            return
+        self._write_meta(key, etag or entry.etag, last_modified or entry.last_modified)
+
+    def _write_meta(self, key: str, etag: Optional[str], last_modified: Optional[str]):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fh:
+            json.dump({'stored_at': time.time(), 'etag': etag, 'last_modified': last_modified}, fh)
+        os.replace(tmp, self._path(key, _META_SUFFIX))
+
+    def _commit(self, key: str, tmp: str, etag: Optional[str], last_modified: Optional[str]):
+        body = self._path(key, _BODY_SUFFIX)
+        os.replace(tmp, body)
+        self._write_meta(key, etag, last_modified)
+        size = os.path.getsize(body)
+        with self._lock:
+            self._total += size - self._lru.pop(key, 0)
+            self._lru[key] = size
+            self._evict_locked()
+
+    def _touch(self, key: str):
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+        try:
+            os.utime(self._path(key, _BODY_SUFFIX))
+        except OSError:
+            pass
+
+    def _evict_locked(self):
+        while self._total > self.max_bytes and len(self._lru) > 1:
+            key, size = self._lru.popitem(last=False)
+            self._total -= size
+            for suffix in (_META_SUFFIX, _BODY_SUFFIX):
+                try:
+                    os.unlink(self._path(key, suffix))
+                except OSError:
+                    pass
+            self._counters[('cache', 'evicted')] += 1
+
+    def count(self, namespace: str, event: str) -> None:
+        with self._lock:
+            self._counters[(namespace, event)] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters per namespace (hit/stale/miss/revalidated/stored) plus current size."""
+        with self._lock:
+            out: Dict[str, Any] = {'entries': len(self._lru), 'bytes': self._total}
+            for (namespace, event), value in self._counters.items():
+                out.setdefault(namespace, {})[event] = value
+            return out
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None when it is disabled."""
+    global _cache
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ResponseCache(settings.RESPONSE_CACHE_DIR, settings.RESPONSE_CACHE_MAX_MB * 1024 * 1024)
+            except OSError as e:
+                app_logger.error("cache.unavailable", directory=settings.RESPONSE_CACHE_DIR, error=str(e))
+                return None
+        return _cache
+
+
+def cache_ttl(namespace: Optional[str]) -> float:
+    """TTL in seconds for provider `namespace` from `<NAME>_CACHE_TTL` (0 disables caching)."""
+    if not namespace:
+        return 0.0
+    return float(getattr(settings, f"{namespace.upper()}_CACHE_TTL", 0) or 0)
+
+
+class CachingClientMixin:
+    """Response-cache plumbing shared by the sync and async base clients.
+
+    Only GET requests are cached. A fresh entry is served without touching the
+    network; a stale one is revalidated with its validators, and a 304 restarts
+    its TTL.
+    """
+
+    cache: Optional[ResponseCache] = None
+    cache_namespace: Optional[str] = None
+    cache_ttl: float = 0.0
+
+    def _setup_cache(self, namespace: Optional[str]):
+        self.cache_namespace = namespace
+        self.cache_ttl = cache_ttl(namespace)
+        self.cache = get_response_cache() if self.cache_ttl > 0 else None
+
+    def _cache_lookup(self, method: str, url: str, params: Optional[Dict] = None):
+        """Return `(key, entry, fresh)`; `key` is None when the request is not cacheable."""
+        if self.cache is None or method.upper() != 'GET':
+            return None, None, False
+        key = cache_key(method, url, params)
+        entry = self.cache.lookup(key)
+        if entry is None:
+            self.cache.count(self.cache_namespace, 'miss')
+            return key, None, False
+        if entry.is_fresh(self.cache_ttl):
+            return key, entry, True
+        self.cache.count(self.cache_namespace, 'stale')
+        return key, entry, False
+
+    def _cache_open(self, key: str, event: str):
+        """Open a cached body and count `event`; None if it was evicted meanwhile."""
+        try:
+            fh = self.cache.open_body(key)
+        except OSError:
+            return None
+        self.cache.count(self.cache_namespace, event)
+        return fh
+
+    def _cache_read(self, key: str, event: str) -> Optional[bytes]:
+        fh = self._cache_open(key, event)
+        if fh is None:
+            return None
+        with fh:
+            return fh.read()
+
+    def _cache_revalidated(self, key: str, headers) -> Optional[bytes]:
+        self.cache.refresh(key, headers.get('ETag'), headers.get('Last-Modified'))
+        return self._cache_read(key, 'revalidated')
+
+    def _cache_store(self, key: str, headers, body: bytes):
+        try:
+            if self.cache.store(key, body, headers.get('ETag'), headers.get('Last-Modified')):
+                self.cache.count(self.cache_namespace, 'stored')
+        except OSError as e:
+            app_logger.error("cache.store_failed", namespace=self.cache_namespace, error=str(e))
+
+    def _cache_writer(self, key: Optional[str], headers) -> Optional[CacheWriter]:
+        if key is None:
+            return None
+        try:
+            return self.cache.writer(key, headers.get('ETag'), headers.get('Last-Modified'))
+        except OSError as e:
+            app_logger.error("cache.store_failed", namespace=self.cache_namespace, error=str(e))
+            return None
+
+    def _cache_commit(self, writer: Optional[CacheWriter]):
+        if writer is None:
+            return
+        try:
+            if writer.commit():
+                self.cache.count(self.cache_namespace, 'stored')
+        except OSError as e:
+            app_logger.error("cache.store_failed", namespace=self.cache_namespace, error=str(e))
@@ -1,4 +1,5 @@
 from app.clients.base_http_client import BaseHTTPClient
+from app.clients.async_base_http_client import AsyncBaseHTTPClient
 from app.utils.log import app_logger
 from app.config.settings import settings
 
@@ -6,7 +7,7 @@ import json
 
 class ShodanClient(BaseHTTPClient):
     def __init__(self):
-        super().__init__(base_url="https://api.shodan.io")
+        super().__init__(base_url="https://api.shodan.io", rate_limit_key='shodan', cache_namespace='shodan')
 
 
     def search_domain(self, domain):
@@ -23,4 +24,19 @@ class ShodanClient(BaseHTTPClient):
         
         except json.JSONDecodeError as e:
             app_logger.error(f"error decoding json: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+class AsyncShodanClient(AsyncBaseHTTPClient):
+    def __init__(self):
+        super().__init__(base_url="https://api.shodan.io", rate_limit_key='shodan', cache_namespace='shodan')
+
+    async def search_domain(self, domain):
+        """ search subdomains for a given domain """
+        try:
+            response = await self.get(f"/dns/domain/{domain}?key={settings.SHODAN_API_KEY}")
+            return response.get('subdomains', [])
+
+        except Exception as e:
+            app_logger.error(f"error requesting subdomain: {e}")
+            return []
@@ -2,6 +2,7 @@
 import json
 
 from app.clients.base_http_client import BaseHTTPClient
+from app.clients.async_base_http_client import AsyncBaseHTTPClient
 from app.utils.log import app_logger
 from app.config.settings import settings
 
@@ -10,7 +11,9 @@ class VirusTotalClient(BaseHTTPClient):
     def __init__(self):
         super().__init__(
             base_url="https://www.virustotal.com",
-            api_key=settings.VIRUS_TOTAL_API_KEY
+            api_key=settings.VIRUS_TOTAL_API_KEY,
+            rate_limit_key='virus_total',
+            cache_namespace='virus_total',
             )
         # headers used for VT requests (we still pass headers per-request)
         self.headers = {
@@ -43,4 +46,36 @@ class VirusTotalClient(BaseHTTPClient):
             return {}
         except Exception as e:
             app_logger.error(f"error requesting subdomain from VirusTotal: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+
+class AsyncVirusTotalClient(AsyncBaseHTTPClient):
+    def __init__(self):
+        super().__init__(
+            base_url="https://www.virustotal.com",
+            api_key=settings.VIRUS_TOTAL_API_KEY,
+            rate_limit_key='virus_total',
+            cache_namespace='virus_total',
+            )
+        self.headers = {
+            "x-apikey": self.api_key,
+            "accept": "application/json"
+        }
+
+    async def search_domain(self, domain: str, limit: int = 40, next_url: str = None) -> dict:
+        """Request a single page of subdomains for `domain` (asyncio `VirusTotalClient.search_domain`)."""
+        try:
+            if next_url:
+                return await self.get(next_url, headers=self.headers)
+
+            params = {"limit": limit} if limit is not None else {}
+
+            return await self.get(
+                f"/api/v3/domains/{domain}/relationships/subdomains",
+                headers=self.headers,
+                params=params,
+            )
+
+        except Exception as e:
+            app_logger.error(f"error requesting subdomain from VirusTotal: {e}")
+            return {}
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv, find_dotenv
-from os import getenv
+from os import cpu_count, getenv
 from typing import Optional
 
 _env_path = find_dotenv()  # locate a .env file in this folder or parent folders
@@ -24,5 +24,128 @@ class Settings(BaseSettings):
     # These may be unset in environments where notifications aren't configured.
     SLACK_WEBHOOK_URL: Optional[str] = getenv('SLACK_WEBHOOK_URL')
     DISCORD_WEBHOOK_URL: Optional[str] = getenv('DISCORD_WEBHOOK_URL')
-        
+
+    # Provider rate limits (requests/second, shared by all scans in the process; 0 disables)
+    CRTSH_RATE_LIMIT: float = float(getenv('CRTSH_RATE_LIMIT', 0.2))
+    CRTSH_RATE_BURST: int = int(getenv('CRTSH_RATE_BURST', 1))
+    OTX_RATE_LIMIT: float = float(getenv('OTX_RATE_LIMIT', 0))
+    OTX_RATE_BURST: int = int(getenv('OTX_RATE_BURST', 1))
+    SHODAN_RATE_LIMIT: float = float(getenv('SHODAN_RATE_LIMIT', 1.0))
+    SHODAN_RATE_BURST: int = int(getenv('SHODAN_RATE_BURST', 1))
+    VIRUS_TOTAL_RATE_LIMIT: float = float(getenv('VIRUS_TOTAL_RATE_LIMIT', 1.0))
+    VIRUS_TOTAL_RATE_BURST: int = int(getenv('VIRUS_TOTAL_RATE_BURST', 1))
+
+    # Bulk writes for provider results
+    # rows buffered per provider table before a multi-row upsert is flushed
+    BULK_WRITE_BATCH_SIZE: int = int(getenv('BULK_WRITE_BATCH_SIZE', 500))
+    # max seconds a buffered row may wait before the next add() forces a flush
+    BULK_WRITE_FLUSH_INTERVAL: float = float(getenv('BULK_WRITE_FLUSH_INTERVAL', 5.0))
+    # parse crt.sh responses incrementally instead of buffering the whole body
+    CRTSH_STREAM_RESPONSES: bool = getenv('CRTSH_STREAM_RESPONSES', 'true').lower() in ('1', 'true', 'yes')
+    # crt.sh searches yielding at least this many rows are loaded with COPY into a staging table
+    CRTSH_COPY_THRESHOLD: int = int(getenv('CRTSH_COPY_THRESHOLD', 20000))
+    # only process certificates newer than the per-domain watermark of the previous scan
+    CRTSH_INCREMENTAL: bool = getenv('CRTSH_INCREMENTAL', 'true').lower() in ('1', 'true', 'yes')
+    # days after which a domain gets a full pass regardless of its watermark
+    CRTSH_FULL_REFRESH_DAYS: int = int(getenv('CRTSH_FULL_REFRESH_DAYS', 7))
+
+    # Prober
+    PROBER_MAX_WORKERS: int = int(getenv('PROBER_MAX_WORKERS', 20))
+    PROBER_TIMEOUT: float = float(getenv('PROBER_TIMEOUT', 5.0))
+    PROBER_MAX_RETRIES: int = int(getenv('PROBER_MAX_RETRIES', 2))
+    PROBER_RETRY_DELAY: float = float(getenv('PROBER_RETRY_DELAY', 1.0))
+    # "threads" probes with a worker pool, "async" probes from one event loop, "processes" splits
+    # each chunk across PROBER_PROCESSES worker processes running PROBER_PROCESS_ENGINE
+    PROBER_ENGINE: str = getenv('PROBER_ENGINE', 'threads')
+    # max probe requests in flight at once with the async engine
+    PROBER_ASYNC_CONCURRENCY: int = int(getenv('PROBER_ASYNC_CONCURRENCY', 1000))
+    # resolve every candidate before probing and skip names that do not resolve
+    PROBER_DNS_ENABLED: bool = getenv('PROBER_DNS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # comma separated resolvers ("1.1.1.1,8.8.8.8", "127.0.0.1:5353"); empty uses the system resolvers
+    PROBER_DNS_RESOLVERS: str = getenv('PROBER_DNS_RESOLVERS', '')
+    # seconds allowed for one lookup (including retries across resolvers) and lookups in flight
+    PROBER_DNS_TIMEOUT: float = float(getenv('PROBER_DNS_TIMEOUT', 3.0))
+    PROBER_DNS_CONCURRENCY: int = int(getenv('PROBER_DNS_CONCURRENCY', 500))
+    # names whose resolution is kept for the rest of a probe run (0 disables the cache)
+    PROBER_DNS_CACHE_SIZE: int = int(getenv('PROBER_DNS_CACHE_SIZE', 200000))
+    # extra ports probed after the default https/http ones (comma separated)
+    PROBER_PORTS: str = getenv('PROBER_PORTS', '8443,8080,8000,3000')
+    # TCP connect sweep of 443, 80 and PROBER_PORTS; HTTP is only attempted on ports that accept connections
+    PROBER_PORT_SCAN_ENABLED: bool = getenv('PROBER_PORT_SCAN_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    PROBER_CONNECT_TIMEOUT: float = float(getenv('PROBER_CONNECT_TIMEOUT', 1.5))
+    # connection attempts in flight during the sweep
+    PROBER_PORT_SCAN_CONCURRENCY: int = int(getenv('PROBER_PORT_SCAN_CONCURRENCY', 2000))
+    # probe results buffered by the background writer before a batch upsert, and max seconds between flushes
+    PROBER_WRITE_BATCH_SIZE: int = int(getenv('PROBER_WRITE_BATCH_SIZE', 500))
+    PROBER_WRITE_FLUSH_INTERVAL: float = float(getenv('PROBER_WRITE_FLUSH_INTERVAL', 2.0))
+    # read master through a server-side cursor and probe it chunk by chunk instead of loading every row
+    PROBER_STREAM: bool = getenv('PROBER_STREAM', 'true').lower() in ('1', 'true', 'yes')
+    PROBER_STREAM_CHUNK_SIZE: int = int(getenv('PROBER_STREAM_CHUNK_SIZE', 5000))
+    # probe scheduling: every subdomain gets a next-due time from its probe history and the
+    # daily full probe is replaced by a job probing only due rows every PROBER_DUE_INTERVAL_MINUTES
+    PROBER_SCHEDULING: bool = getenv('PROBER_SCHEDULING', 'true').lower() in ('1', 'true', 'yes')
+    PROBER_DUE_INTERVAL_MINUTES: int = int(getenv('PROBER_DUE_INTERVAL_MINUTES', 15))
+    # max subdomains probed by one due run (most overdue first, never-probed before anything else)
+    PROBER_DUE_BATCH_SIZE: int = int(getenv('PROBER_DUE_BATCH_SIZE', 5000))
+    # alive hosts are re-probed after this many hours
+    PROBER_ALIVE_INTERVAL_HOURS: float = float(getenv('PROBER_ALIVE_INTERVAL_HOURS', 6))
+    # dead hosts wait this long after their first failed probe, doubling per consecutive failure up to the max
+    PROBER_DEAD_BACKOFF_HOURS: float = float(getenv('PROBER_DEAD_BACKOFF_HOURS', 12))
+    PROBER_DEAD_BACKOFF_MAX_DAYS: float = float(getenv('PROBER_DEAD_BACKOFF_MAX_DAYS', 30))
+    # lease-based work distribution between probe workers (`python -m app.jobs.probe_worker`)
+    # rows claimed per batch and seconds before an unfinished claim can be taken by another worker
+    PROBER_LEASE_BATCH_SIZE: int = int(getenv('PROBER_LEASE_BATCH_SIZE', 500))
+    PROBER_LEASE_SECONDS: int = int(getenv('PROBER_LEASE_SECONDS', 900))
+    # worker id stored on leased rows (default: hostname:pid) and seconds a worker sleeps when nothing is due
+    PROBER_WORKER_ID: str = getenv('PROBER_WORKER_ID', '')
+    PROBER_WORKER_IDLE_SECONDS: float = float(getenv('PROBER_WORKER_IDLE_SECONDS', 60))
+    # concurrent requests per resolved IP (0 disables the cap) and how many IPs the per-run stats log lists
+    PROBER_MAX_PER_IP: int = int(getenv('PROBER_MAX_PER_IP', 8))
+    PROBER_IP_STATS_TOP: int = int(getenv('PROBER_IP_STATS_TOP', 10))
+    # "get": one streamed GET per target (redirects capped, body read up to PROBER_BODY_MAX_BYTES
+    # for the page title and body hash); "head": HEAD with a GET fallback on 405
+    PROBER_REQUEST_MODE: str = getenv('PROBER_REQUEST_MODE', 'get')
+    PROBER_BODY_MAX_BYTES: int = int(getenv('PROBER_BODY_MAX_BYTES', 65536))
+    PROBER_MAX_REDIRECTS: int = int(getenv('PROBER_MAX_REDIRECTS', 5))
+    # deferred retries of rate-limited / transiently failing probes: retries per run, longest
+    # not-before wait kept in the run (longer ones are stored as next_probe_at) and per-IP circuit breaker
+    PROBER_RETRY_BUDGET: int = int(getenv('PROBER_RETRY_BUDGET', 2000))
+    PROBER_RETRY_MAX_WAIT: float = float(getenv('PROBER_RETRY_MAX_WAIT', 30))
+    PROBER_BREAKER_THRESHOLD: int = int(getenv('PROBER_BREAKER_THRESHOLD', 5))
+    PROBER_BREAKER_COOLDOWN: float = float(getenv('PROBER_BREAKER_COOLDOWN', 300))
+    # race a host's scheme/port targets: seconds between starting attempts and how long a more
+    # preferred target may still answer after the first response
+    PROBER_RACE: bool = getenv('PROBER_RACE', 'true').lower() in ('1', 'true', 'yes')
+    PROBER_RACE_STAGGER: float = float(getenv('PROBER_RACE_STAGGER', 0.25))
+    PROBER_RACE_GRACE: float = float(getenv('PROBER_RACE_GRACE', 0.5))
+    # checkpoint probe_master runs in probe_runs and resume an interrupted run (at startup and on
+    # the next run of the same kind); another host's run is taken over once idle this many seconds
+    PROBER_RUN_RESUME: bool = getenv('PROBER_RUN_RESUME', 'true').lower() in ('1', 'true', 'yes')
+    PROBER_RUN_STALE_SECONDS: int = int(getenv('PROBER_RUN_STALE_SECONDS', 900))
+    # worker processes of the "processes" engine and the probe loop each of them runs ("threads" / "async")
+    PROBER_PROCESSES: int = int(getenv('PROBER_PROCESSES', cpu_count() or 1))
+    PROBER_PROCESS_ENGINE: str = getenv('PROBER_PROCESS_ENGINE', 'threads')
+    # store SAN/CN names of the certificates presented to the prober (source probe_tls)
+    PROBER_TLS_HARVEST: bool = getenv('PROBER_TLS_HARVEST', 'true').lower() in ('1', 'true', 'yes')
+
+    # Async provider engine
+    # "threads" runs each provider in a worker thread, "async" drives them all from one event loop
+    SCAN_ENGINE: str = getenv('SCAN_ENGINE', 'threads')
+    # connection pool of the shared aiohttp session (total / per host) and idle keep-alive seconds
+    ASYNC_HTTP_MAX_CONNECTIONS: int = int(getenv('ASYNC_HTTP_MAX_CONNECTIONS', 100))
+    ASYNC_HTTP_MAX_CONNECTIONS_PER_HOST: int = int(getenv('ASYNC_HTTP_MAX_CONNECTIONS_PER_HOST', 10))
+    ASYNC_HTTP_KEEPALIVE: float = float(getenv('ASYNC_HTTP_KEEPALIVE', 30.0))
+
+    # On-disk provider response cache (GET only, API keys never part of the key)
+    RESPONSE_CACHE_ENABLED: bool = getenv('RESPONSE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RESPONSE_CACHE_DIR: str = getenv('RESPONSE_CACHE_DIR', '.cache/responses')
+    # compressed size limit; least recently used entries are evicted beyond it
+    RESPONSE_CACHE_MAX_MB: int = int(getenv('RESPONSE_CACHE_MAX_MB', 512))
+    # seconds a cached response is served without revalidation (0 disables caching for that provider);
+    # kept below the daily scan interval so each scheduled scan revalidates
+    CRTSH_CACHE_TTL: float = float(getenv('CRTSH_CACHE_TTL', 43200))
+    OTX_CACHE_TTL: float = float(getenv('OTX_CACHE_TTL', 72000))
+    SHODAN_CACHE_TTL: float = float(getenv('SHODAN_CACHE_TTL', 72000))
+    VIRUS_TOTAL_CACHE_TTL: float = float(getenv('VIRUS_TOTAL_CACHE_TTL', 72000))
+
 settings = Settings()
\ No newline at end of file
@@ -5,18 +5,28 @@ from app.services.crtsh_service import CrtshService
 from app.services.otx_service import OtxService
 from app.services.shodan_service import ShodanService
 from app.services.virus_total_service import VirusTotalService
+from app.services.master_reconciler import reconcile_master
+from app.services.known_subdomains import KnownSubdomains
+from app.clients.async_base_http_client import close_shared_session
+from app.clients.response_cache import get_response_cache
+from app.config.settings import settings
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import asyncio
 
-def run_scan(domain: str, scheduled: bool = False):
+
+def run_scan(domain: str, scheduled: bool = False, engine: str = None):
     """
     run a full scan for `domain` across services.
     if `scheduled` is True, ensure the DomainRequested row has `scheduled=True`.
+    `engine` ("threads" or "async", default `settings.SCAN_ENGINE`) selects
+    whether providers run in worker threads or on one event loop.
     this function is intended to be called by the scheduler (and can be called
     from the endpoint via BackgroundTasks as well).
     """
-    app_logger.info(f"job: run_scan start {domain} scheduled={scheduled}")
+    engine = engine or settings.SCAN_ENGINE
+    app_logger.info(f"job: run_scan start {domain} scheduled={scheduled} engine={engine}")
     db = SessionLocal()
     try:
         # ensure there's a DomainRequested row marking this domain as scheduled
@@ -45,32 +55,80 @@ def run_scan(domain: str, scheduled: bool = False):
             db.rollback()
             app_logger.debug(f"job: error ensuring DomainRequested lock: {e}")
 
-        # run services in parallel threads
-        services = [
-            (CrtshService(), 'recursive_search'),
-            (OtxService(), 'extract_and_store_data'),
-            (ShodanService(), 'extract_and_store_subdomains_data'),
-            (VirusTotalService(), 'search_subdomains'),
-        ]
-
-        futures = []
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            for svc, method_name in services:
-                method = getattr(svc, method_name)
-                futures.append(executor.submit(_safe_call, method, db, domain))
-
-            # wait for completion and collect errors
-            for fut in as_completed(futures):
-                try:
-                    fut.result()
-                except Exception as e:
-                    app_logger.error(f"job: service error for {domain}: {e}")
+        # names already in master, so providers only write what is new
+        known = KnownSubdomains.load(db, domain)
+
+        if engine == 'async':
+            asyncio.run(_run_providers_async(domain, known))
+        else:
+            _run_providers_threaded(db, domain, known)
+
+        # providers only fill their own tables; consolidate master once per scan
+        reconcile_master(db, domain)
+
+        for source, counts in known.summary().items():
+            app_logger.info(f"job: {domain} {source}: {counts['written']} rows written, {counts['skipped']} known rows skipped")
+
+        # cumulative hit/miss counters per provider, for tuning cache TTLs
+        cache = get_response_cache()
+        if cache is not None:
+            app_logger.info("cache.stats", **cache.stats())
 
         app_logger.info(f"job: run_scan finished {domain}")
     finally:
         db.close()
 
 
+def _run_providers_threaded(db, domain: str, known: KnownSubdomains = None):
+    # run services in parallel threads
+    services = [
+        (CrtshService(), 'recursive_search'),
+        (OtxService(), 'extract_and_store_data'),
+        (ShodanService(), 'extract_and_store_subdomains_data'),
+        (VirusTotalService(), 'search_subdomains'),
+    ]
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for svc, method_name in services:
+            svc.known = known
+            method = getattr(svc, method_name)
+            futures.append(executor.submit(_safe_call, method, db, domain))
+
+        # wait for completion and collect errors
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                app_logger.error(f"job: service error for {domain}: {e}")
+
+
+async def _run_providers_async(domain: str, known: KnownSubdomains = None):
+    """drive every provider from one event loop over the shared aiohttp pool.
+    each provider gets its own db session since their writes run in worker threads."""
+    services = [
+        (CrtshService(), 'recursive_search_async'),
+        (OtxService(), 'extract_and_store_data_async'),
+        (ShodanService(), 'extract_and_store_subdomains_data_async'),
+        (VirusTotalService(), 'search_subdomains_async'),
+    ]
+    for svc, _ in services:
+        svc.known = known
+    sessions = [SessionLocal.session_factory() for _ in services]
+    try:
+        results = await asyncio.gather(
+            *(getattr(svc, method_name)(session, domain) for (svc, method_name), session in zip(services, sessions)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                app_logger.error(f"job: service error for {domain}: {result}")
+    finally:
+        await close_shared_session()
+        for session in sessions:
+            session.close()
+
+
 def _safe_call(fn, db, domain):
     try:
         return fn(db, domain)
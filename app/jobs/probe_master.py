@@ -1,20 +1,30 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 
+from sqlalchemy import bindparam, func, or_, update
 from sqlmodel import select
 
 from app.services.database import SessionLocal
 from app.models.subdomains_master import MasterSubdomains
-from app.models.alive_subdomain import AliveSubdomain
-from app.services.prober_service import ProberService
-from app.clients.base_http_client import BaseHTTPClient
+from app.services.dns_resolver import UNRESOLVED, DnsCache, resolve_all
+from app.services.port_scanner import parse_ports, sweep
+from app.services.probe_writer import ProbeResultWriter
+from app.services.probe_leases import ProbeLeaseManager
+from app.services.probe_runs import ProbeRunStore
+from app.services.probe_processes import ProbeProcessPool
+from app.services.probe_loops import AsyncProbeLoop, ThreadedProbeLoop
+from app.services.tls_names import TlsNameHarvester
+from app.services.ip_groups import IpStats
+from app.services.probe_retry import RetryScheduler
 from app.utils.log import app_logger
 from app.config.settings import settings
 from app.services.notifier import notifier
 
 
-DEFAULT_WORKERS = getattr(settings, "PROBER_MAX_WORKERS", 20)
+DEFAULT_WORKERS = settings.PROBER_MAX_WORKERS
+# extra walks of a full run over master rows added by certificate harvesting during the run
+TLS_FOLLOW_UP_PASSES = 2
 
 
 def probe_master(
@@ -22,132 +32,429 @@ def probe_master(
     limit: Optional[int] = None,
     http_client: Optional[object] = None,
     ports: Optional[List[int]] = None,
+    engine: Optional[str] = None,
+    stream: Optional[bool] = None,
+    collect: Optional[bool] = None,
+    due_only: bool = False,
+    leased: bool = False,
+    worker_id: Optional[str] = None,
 ) -> List[dict]:
     """Probe all subdomains in `subdomains_master` and update probing columns.
 
-    - Fetches subdomains from DB
-    - Probes them concurrently (ThreadPoolExecutor)
-    - Updates `is_alive`, `last_checked`, and `last_alive` when appropriate
+    - Reads subdomain names from DB (with `due_only`, only rows whose
+      `next_probe_at` has passed, never-probed first); with `stream` (default `PROBER_STREAM`)
+      through a server-side cursor in chunks of `PROBER_STREAM_CHUNK_SIZE`, so
+      memory stays flat and the first chunk is probed right away. With
+      `leased`, due rows are instead claimed in batches through
+      `ProbeLeaseManager` (SKIP LOCKED leases), so several workers can probe
+      the same table; unfinished claims are released at the end
+    - Resolves and port-sweeps each chunk in a background thread while the
+      previous chunk is probed, then probes it concurrently with a
+      bounded window, hosts interleaved by resolved IP and capped at
+      `PROBER_MAX_PER_IP` requests per IP: one thread pool for the run
+      (`engine="threads"`, see `ThreadedProbeLoop`) or one event loop with
+      `AsyncProberService` (`engine="async"`, see `AsyncProbeLoop`), or split by IP across
+      `PROBER_PROCESSES` worker processes each running one of those loops
+      (`engine="processes"`, see `ProbeProcessPool`; `http_client` is not
+      used there); defaults to `PROBER_ENGINE`. Rate-limited and transiently failing hosts are
+      re-queued through a per-run `RetryScheduler` (delay queue, retry
+      budget, per-IP circuit breaker) instead of sleeping a worker; queued
+      retries share the window with the following chunks, and the run only
+      waits on the delay queue once it has no fresh hosts left
+    - Persists results in batches through `ProbeResultWriter` (`last_alive` and
+      the next due time on master, upserts into `alive_subdomains` with the
+      response fingerprint of `PROBER_REQUEST_MODE`); newly
+      alive hosts are notified once at the end
+    - Non-leased runs are checkpointed in `probe_runs` (see `ProbeRunStore`):
+      the master id cursor, counters and pending new alive hosts are stored
+      with each batch of results, an interrupted run of the same kind is
+      resumed where it stopped, and its notification is sent once, by the
+      caller that marks it finished; a finished run whose notification was not
+      sent (notifier failure, restart) is sent by the next run or at startup
+      (see `notify_finished_runs`)
+    - With `PROBER_TLS_HARVEST`, names from the certificates presented to the
+      prober are written to master (source `probe_tls`, see
+      `TlsNameHarvester`); an unlimited full run walks the rows they added
+      before finishing, other runs leave them to the next run (they are due
+      right away)
 
-    Returns list of probe result dicts (see ProberService.probe)
+    Returns the list of probe result dicts (see ProberService.probe) when
+    `collect` is set, otherwise an empty list: results are only persisted.
+    `collect` defaults to `not stream`, since keeping every result of a
+    streamed run in memory is what streaming avoids; callers that need the
+    results of a streamed run pass `collect=True`. Leased runs are capped by
+    `limit` (default `PROBER_DUE_BATCH_SIZE`) and do not stream.
     """
 
-    app_logger.info("probe_master.start", max_workers=max_workers, limit=limit)
+    engine = (engine or settings.PROBER_ENGINE).lower()
+    stream = settings.PROBER_STREAM if stream is None else stream
+    app_logger.info("probe_master.start", max_workers=max_workers, limit=limit, engine=engine, stream=stream, due_only=due_only, leased=leased)
 
-    # Fetch subdomains as plain strings (no session-bound objects in threads)
-    session = SessionLocal()
+    ports = ports or parse_ports(settings.PROBER_PORTS)
+    results: List[dict] = []
+    if leased:
+        limit = limit or settings.PROBER_DUE_BATCH_SIZE
+        stream = False
+    collect = not stream if collect is None else collect
+
+    # dedicated session: the cursor stays open while chunks are probed
+    reader = SessionLocal.session_factory()
+    # leases already make leased runs resumable; other runs keep a checkpoint
+    runs = ProbeRunStore(reader) if not leased else None
+    if runs is not None:
+        notify_finished_runs(runs)
+    run = runs.start("due" if due_only else "full", limit) if runs is not None else None
+    cursor = None
+    if run is not None:
+        cursor = run.cursor
+        if run.row_limit:
+            limit = max(run.row_limit - run.scanned, 0)
+            if not limit:
+                app_logger.info("probe_master.run_exhausted", run_id=run.id)
+
+    # certificate names seen while probing go back into master as discoveries
+    harvester = TlsNameHarvester(SessionLocal.session_factory()) if settings.PROBER_TLS_HARVEST else None
+    leases = ProbeLeaseManager(reader, worker_id) if leased else None
+    # results are persisted in batches from a background thread while probing continues
+    writer = ProbeResultWriter(
+        SessionLocal.session_factory(),
+        run=run,
+        harvester=harvester,
+        worker_id=leases.worker_id if leases is not None else None,
+    )
+
+    def sink(res: dict) -> None:
+        writer.put(res)
+        if collect:
+            results.append(res)
+
+    # per-IP request counters, retry queue and circuit breakers shared by every chunk of the run
+    ip_stats = IpStats()
+    retries = RetryScheduler()
+    # resolutions are reused by every chunk of the run (and by the TLS follow-up walks)
+    dns_cache = DnsCache()
+
+    # the thread pool, event loop or worker processes live for the whole run;
+    # results come back to this process's writer
+    if engine == "processes":
+        prober = ProbeProcessPool(sink, max_workers=max_workers, ports=ports, ip_stats=ip_stats)
+    elif engine == "async":
+        prober = AsyncProbeLoop(sink, ports=ports, ip_stats=ip_stats, retries=retries)
+    else:
+        prober = ThreadedProbeLoop(sink, max_workers=max_workers, http_client=http_client, ports=ports, ip_stats=ip_stats, retries=retries)
+    finished = False
     try:
-        # Select all subdomains from master table (limit can be used to cap work)
-        q = select(MasterSubdomains)
-        if limit:
-            rows = session.execute(q.limit(limit)).scalars().all()
+        chunk_size = settings.PROBER_STREAM_CHUNK_SIZE if stream else None
+        if leases is not None:
+            _probe_chunks(((names, None) for names in leases.iter_claims(settings.PROBER_LEASE_BATCH_SIZE, limit)), prober, ports, sink, writer, dns_cache)
+        elif run is not None and run.row_limit and not limit:
+            pass
+        elif due_only or limit or harvester is None:
+            _probe_chunks(_iter_subdomain_chunks(reader, limit, chunk_size, due_only, cursor), prober, ports, sink, writer, dns_cache)
         else:
-            rows = session.execute(q).scalars().all()
-        subdomains = [r.subdomain for r in rows]
+            _probe_full_walk(reader, chunk_size, cursor, prober, ports, sink, writer, harvester, dns_cache)
+        prober.close()
+        new_alives = writer.close()
+        finished = True
     finally:
-        session.close()
+        if not finished:
+            prober.close(terminate=True)
+        reader.close()
+        if not finished:
+            writer.close()
+        writer.db.close()
+        if harvester is not None:
+            harvester.close()
+        # results are stored (clearing their leases); give back what was not probed
+        if leases is not None:
+            leases.release()
+        if run is not None and not finished:
+            ProbeRunStore.release(run.id)
+
+    if run is not None and writer.stalled:
+        # results were dropped: the run stays open and is resumed from its last stored checkpoint
+        app_logger.warning("probe_master.run_incomplete", run_id=run.id, failed=writer.failed)
+        ProbeRunStore.release(run.id)
+        return results
+
+    # only the caller that closes the run sends its notification
+    if run is not None and not runs.finish(run.id):
+        app_logger.info("probe_master.run_already_finished", run_id=run.id)
+        return results
 
-    if not subdomains:
+    if not writer.received:
         app_logger.info("probe_master.no_subdomains")
+        if run is not None:
+            runs.mark_notified(run.id)
+            runs.release(run.id)
         return []
 
-    # if no http_client passed, create a default BaseHTTPClient instance
-    if http_client is None:
-        # BaseHTTPClient requires a base_url; we pass empty string because
-        # ProberService uses full URLs when calling client's session.request.
-        http_client = BaseHTTPClient(base_url="", timeout=getattr(settings, "PROBER_TIMEOUT", 5.0), max_retries=getattr(settings, "PROBER_MAX_RETRIES", 2), retry_delay=getattr(settings, "PROBER_RETRY_DELAY", 1.0))
-
-    prober = ProberService(timeout=getattr(settings, "PROBER_TIMEOUT", 5.0), http_client=http_client, ports=ports)
-
-    results = []
-    new_alives: List[dict] = []
-
-    with ThreadPoolExecutor(max_workers=max_workers) as exe:
-        future_to_sub = {exe.submit(prober.probe, sd): sd for sd in subdomains}
-        for fut in as_completed(future_to_sub):
-            sd = future_to_sub.get(fut)
-            res = None
-            try:
-                res = fut.result()
-                results.append(res)
-            except Exception as e:
-                app_logger.error("probe_master.worker_error", subdomain=sd, error=str(e))
-                continue  # Skip processing if probe failed
-
-            # Persist each result immediately in its own session to avoid losing successes
-            if res is None:
-                continue
-                
-            try:
-                r = res
-                sd = r["subdomain"]
-                is_alive = r.get("is_alive", False)
-                probed_at = r.get("probed_at", datetime.now())
-
-                writer = SessionLocal()
-                try:
-                    stmt = select(MasterSubdomains).where(MasterSubdomains.subdomain == sd)
-                    obj = writer.execute(stmt).scalars().one_or_none()
-                    if obj is None:
-                        app_logger.warning("probe_master.missing_in_db", subdomain=sd)
-                    else:
-                        # We no longer track `last_checked` or `is_alive` in master
-                        # Only update `last_alive` when a probe reports reachable
-                        if is_alive:
-                            obj.last_alive = probed_at
-                        writer.add(obj)
-
-                    # maintain alive_subdomains table: upsert when alive
-                    if is_alive:
-                        a_stmt = select(AliveSubdomain).where(AliveSubdomain.subdomain == sd)
-                        alive_obj = writer.execute(a_stmt).scalars().one_or_none()
-                        if alive_obj is None:
-                            alive_obj = AliveSubdomain(
-                                subdomain=sd,
-                                probed_at=probed_at,
-                                last_alive=probed_at,
-                                status_code=r.get("status_code"),
-                            )
-                            writer.add(alive_obj)
-                            # Defer notifications until after all probes are processed
-                            new_alives.append({
-                                "subdomain": sd,
-                                "status": r.get("status_code"),
-                                "probed_at": probed_at,
-                            })
-                        else:
-                            alive_obj.probed_at = probed_at
-                            alive_obj.last_alive = probed_at
-                            alive_obj.status_code = r.get("status_code")
-                            writer.add(alive_obj)
-
-                    writer.commit()
-                except Exception as e:
-                    writer.rollback()
-                    app_logger.error("probe_master.commit_error", subdomain=sd, error=str(e))
-                finally:
-                    writer.close()
-            except Exception as e:
-                # defensive: continue processing other futures, but log unexpected errors
-                app_logger.warning("probe_master.unexpected_error", subdomain=sd if 'sd' in locals() else 'unknown', error=str(e))
-
-    app_logger.info("probe_master.finished", total=len(results), new_alives_count=len(new_alives))
+    app_logger.info("probe_master.finished", run_id=run.id if run is not None else None, total=writer.received, alive=writer.alive, new_alives_count=len(new_alives))
+    app_logger.info("probe_master.ip_stats", top=ip_stats.summary(settings.PROBER_IP_STATS_TOP))
+    app_logger.info("probe_master.dns_cache", cached=len(dns_cache), hits=dns_cache.hits)
+    app_logger.info("probe_master.retries", **(prober.retry_stats if engine == "processes" else retries.stats()))
+    if harvester is not None:
+        app_logger.info("probe_master.tls_harvested", names=harvester.harvested)
 
     # Send batched notifications for any newly discovered alive subdomains
-    if new_alives:
-        try:
-            app_logger.debug("probe_master.sending_notifications", count=len(new_alives))
-            notifier.notify_new_alives(new_alives)
-            app_logger.info("probe_master.notifications_sent", count=len(new_alives))
-        except Exception as e:
-            app_logger.error("notifier.batch_error", error=str(e))
+    if run is not None:
+        # the run's pending rows cover every process that worked on it
+        _notify_run(runs, run.id)
     else:
-        app_logger.debug("probe_master.no_new_alives")
-    
+        _notify(new_alives)
+
     return results
 
 
+def notify_finished_runs(runs: Optional[ProbeRunStore] = None) -> None:
+    """Send the notifications finished probe runs still owe (see `ProbeRunStore.unnotified`).
+
+    Called at the start of every checkpointed run and scheduled once at startup.
+    """
+    if runs is None:
+        db = SessionLocal()
+        try:
+            notify_finished_runs(ProbeRunStore(db))
+        finally:
+            db.close()
+        return
+    for run in runs.unnotified():
+        if runs.claim_notification(run):
+            _notify_run(runs, run.id)
+
+
+def _notify_run(runs: ProbeRunStore, run_id: int) -> None:
+    """Send a claimed run's pending notification; on failure it stays owed (and is retried)."""
+    try:
+        if _notify(runs.pending_new_alives(run_id)):
+            runs.mark_notified(run_id)
+    except Exception as e:
+        app_logger.error("probe_master.notify_run_error", run_id=run_id, error=str(e))
+    finally:
+        runs.release(run_id)
+
+
+def _notify(new_alives: List[dict]) -> bool:
+    """Send one batched notification; False if the notifier failed."""
+    if not new_alives:
+        app_logger.debug("probe_master.no_new_alives")
+        return True
+    try:
+        app_logger.debug("probe_master.sending_notifications", count=len(new_alives))
+        notifier.notify_new_alives(new_alives)
+        app_logger.info("probe_master.notifications_sent", count=len(new_alives))
+    except Exception as e:
+        # the run's pending rows are kept for the next attempt
+        app_logger.error("notifier.batch_error", error=str(e))
+        return False
+    return True
+
+
+def probe_due(limit: Optional[int] = None, engine: Optional[str] = None) -> List[dict]:
+    """Probe only the subdomains that are due (see `ProbeResultWriter` for the schedule).
+
+    Run every `PROBER_DUE_INTERVAL_MINUTES` by the scheduler; each run takes at
+    most `PROBER_DUE_BATCH_SIZE` rows, newly discovered names first and then
+    the most overdue. Rows are leased, so the scheduled job and any standalone
+    probe workers never probe the same rows at once.
+    """
+    return probe_master(limit=limit or settings.PROBER_DUE_BATCH_SIZE, engine=engine, leased=True, collect=True)
+
+
+def _iter_subdomain_chunks(
+    db,
+    limit: Optional[int],
+    chunk_size: Optional[int],
+    due_only: bool = False,
+    after_id: Optional[int] = None,
+) -> Iterator[Tuple[List[str], Optional[int]]]:
+    """Yield master subdomain names in chunks (all at once when `chunk_size` is None).
+
+    Each chunk comes with the highest master id it covers (the run cursor) for
+    full runs, which walk the table in id order starting after `after_id`.
+    Due-only runs need no cursor (probed rows leave the due set) and yield None.
+    """
+    # Select only the id and name columns (limit can be used to cap work)
+    q = select(MasterSubdomains.id, MasterSubdomains.subdomain)
+    if due_only:
+        next_probe_at = MasterSubdomains.next_probe_at
+        q = q.where(or_(next_probe_at.is_(None), next_probe_at <= func.localtimestamp())).order_by(next_probe_at.asc().nulls_first())
+    else:
+        if after_id is not None:
+            q = q.where(MasterSubdomains.id > after_id)
+        q = q.order_by(MasterSubdomains.id)
+    if limit:
+        q = q.limit(limit)
+    if chunk_size is None:
+        parts = [db.execute(q).all()]
+    else:
+        parts = db.execute(q.execution_options(yield_per=chunk_size)).partitions()
+    for part in parts:
+        if not part:
+            continue
+        yield [name for _, name in part], (None if due_only else part[-1][0])
+
+
+# probe loop of a run: `probe(subdomains, open_ports, addresses, on_done)` adds a chunk,
+# `wait(future)` keeps probing until the future is done, `drain()` until every host is settled
+_Prober = Union[ThreadedProbeLoop, AsyncProbeLoop, ProbeProcessPool]
+
+
+class _Chunk(NamedTuple):
+    """A chunk read from master, resolved and swept, ready for the probe loop."""
+
+    # names read (the run's scanned count) and the highest master id among them
+    names: List[str]
+    last_id: Optional[int]
+    # names left to probe, "not alive" results of the ones that do not resolve
+    subdomains: List[str]
+    unresolved: List[dict]
+    addresses: Dict[str, List[str]]
+    open_ports: Optional[Dict[str, List[int]]]
+
+
+def _probe_full_walk(
+    db,
+    chunk_size: Optional[int],
+    after_id: Optional[int],
+    prober: _Prober,
+    ports: List[int],
+    sink: Callable[[dict], None],
+    writer: ProbeResultWriter,
+    harvester: TlsNameHarvester,
+    dns_cache: Optional[DnsCache] = None,
+) -> None:
+    """`_probe_chunks` over all of master, then over the rows harvesting added meanwhile.
+
+    Harvested names are new master rows with higher ids, so each follow-up
+    pass continues after the last id seen, for up to `TLS_FOLLOW_UP_PASSES`
+    passes while harvesting still finds names.
+    """
+    harvested = harvester.harvested
+    for follow_up in range(TLS_FOLLOW_UP_PASSES + 1):
+        if follow_up:
+            # the harvested names of everything probed so far must be in master before the next walk
+            writer.drain()
+            harvester.flush()
+            if harvester.harvested == harvested:
+                return
+            harvested = harvester.harvested
+            app_logger.info("probe_master.tls_follow_up", after_id=after_id, harvested=harvested)
+        after_id = _probe_chunks(_iter_subdomain_chunks(db, None, chunk_size, False, after_id), prober, ports, sink, writer, dns_cache) or after_id
+
+
+def _probe_chunks(
+    chunks: Iterator[Tuple[List[str], Optional[int]]],
+    prober: _Prober,
+    ports: List[int],
+    sink: Callable[[dict], None],
+    writer: ProbeResultWriter,
+    dns_cache: Optional[DnsCache] = None,
+) -> Optional[int]:
+    """Probe `chunks`, preparing the next one (reading, DNS, port sweep) in a background thread meanwhile.
+
+    Hosts waiting for a retry stay in the probe loop's window while the
+    following chunks are probed; only once `chunks` is exhausted does the
+    loop wait out the delay queue. Each chunk is checkpointed once its
+    results (and those of every chunk before it) are queued on `writer`.
+    Names are resolved through the run's `dns_cache`. Returns the last
+    chunk's master id.
+    """
+    last_id = None
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="probe-prepare") as prepare:
+        upcoming = prepare.submit(_prepare_chunk, chunks, ports, dns_cache)
+        try:
+            while True:
+                # retries and the previous chunk's last hosts keep the workers busy meanwhile
+                prober.wait(upcoming)
+                chunk = upcoming.result()
+                if chunk is None:
+                    break
+                upcoming = prepare.submit(_prepare_chunk, chunks, ports, dns_cache)
+                for res in chunk.unresolved:
+                    sink(res)
+                # every result of the chunk is queued: the run may resume after it
+                prober.probe(chunk.subdomains, chunk.open_ports, chunk.addresses, on_done=partial(writer.checkpoint, chunk.last_id, len(chunk.names)))
+                last_id = chunk.last_id
+        finally:
+            upcoming.cancel()
+    # no fresh hosts left: now the delay queue is worth waiting for
+    prober.drain()
+    return last_id
+
+
+def _prepare_chunk(
+    chunks: Iterator[Tuple[List[str], Optional[int]]],
+    ports: List[int],
+    dns_cache: Optional[DnsCache] = None,
+) -> Optional[_Chunk]:
+    """Read the next chunk and run the stages before HTTP probing on it (None when there is none left)."""
+    item = next(chunks, None)
+    if item is None:
+        return None
+    names, last_id = item
+
+    # resolve everything first so names that no longer exist never reach the HTTP stage
+    subdomains, unresolved, addresses = names, [], {}
+    if settings.PROBER_DNS_ENABLED:
+        subdomains, unresolved, addresses = _resolve_stage(names, dns_cache)
+
+    # TCP connect sweep: HTTP/TLS work is only spent on ports that accept connections
+    open_ports: Optional[Dict[str, List[int]]] = None
+    if settings.PROBER_PORT_SCAN_ENABLED and subdomains:
+        open_ports = sweep(subdomains, [443, 80] + ports, addresses)
+    return _Chunk(names, last_id, subdomains, unresolved, addresses, open_ports)
+
+
+def _resolve_stage(subdomains: List[str], dns_cache: Optional[DnsCache] = None):
+    """Resolve `subdomains` in bulk and record the outcome in master.
+
+    Returns the names to probe, probe-shaped "not alive" results for the
+    names that do not resolve, and the resolved addresses per name.
+    """
+    resolutions = resolve_all(subdomains, cache=dns_cache)
+    _record_dns(list(resolutions.values()))
+
+    keep: List[str] = []
+    unresolved: List[dict] = []
+    addresses: Dict[str, List[str]] = {}
+    for sd in subdomains:
+        res = resolutions[sd]
+        if res["status"] in UNRESOLVED:
+            unresolved.append({"subdomain": sd, "is_alive": False, "probed_at": res["resolved_at"], "status_code": None, "error": f"dns: {res['status']}", "open_ports": None})
+        else:
+            keep.append(sd)
+            addresses[sd] = res["addresses"]
+
+    app_logger.info("probe_master.dns_resolved", total=len(subdomains), resolved=len(keep), dropped=len(unresolved))
+    return keep, unresolved, addresses
+
+
+def _record_dns(resolutions: List[dict]) -> None:
+    table = MasterSubdomains.__table__
+    stmt = (
+        update(table)
+        .where(table.c.subdomain == bindparam("b_subdomain"))
+        .values(dns_status=bindparam("b_status"), dns_addresses=bindparam("b_addresses"), dns_checked_at=bindparam("b_checked_at"))
+    )
+    rows = [
+        {"b_subdomain": r["subdomain"], "b_status": r["status"], "b_addresses": r["addresses"], "b_checked_at": r["resolved_at"]}
+        for r in resolutions
+    ]
+    if not rows:
+        return
+    writer = SessionLocal()
+    try:
+        writer.execute(stmt, rows)
+        writer.commit()
+    except Exception as e:
+        writer.rollback()
+        app_logger.error("probe_master.dns_record_error", count=len(rows), error=str(e))
+    finally:
+        writer.close()
+
+
 if __name__ == "__main__":
     # quick runner for manual execution
-    res = probe_master()
+    res = probe_master(stream=False, collect=True)
     print(f"Probed: {len(res)} subdomains")
@@ -0,0 +1,64 @@
+"""Standalone probe worker for lease-based distributed probing.
+
+Run one or more of these (on any number of machines) against the same
+database; each claims due subdomains with SKIP LOCKED leases, probes them and
+writes the results, so probing scales with the number of workers:
+
+    python -m app.jobs.probe_worker [--worker-id ID] [--batch 5000] [--engine threads|async|processes] [--once]
+"""
+import argparse
+import time
+from typing import Optional
+
+from app.jobs.probe_master import probe_master
+from app.services.probe_leases import default_worker_id
+from app.utils.log import app_logger
+from app.config.settings import settings
+
+
+def run_probe_worker(
+    worker_id: Optional[str] = None,
+    batch: Optional[int] = None,
+    engine: Optional[str] = None,
+    once: bool = False,
+) -> int:
+    """Probe due rows until stopped (or until nothing is due with `once`).
+
+    Each pass is one leased `probe_master` run of at most `batch` rows, with
+    its own batched new-alive notification. When a pass finds fewer rows than
+    `batch`, the worker sleeps `PROBER_WORKER_IDLE_SECONDS`. Returns the number
+    of results processed.
+    """
+    worker_id = worker_id or default_worker_id()
+    batch = batch or settings.PROBER_DUE_BATCH_SIZE
+    app_logger.info("probe_worker.start", worker=worker_id, batch=batch, engine=engine or settings.PROBER_ENGINE)
+
+    processed = 0
+    try:
+        while True:
+            results = probe_master(limit=batch, engine=engine, leased=True, worker_id=worker_id, collect=True)
+            processed += len(results)
+            if len(results) < batch:
+                if once:
+                    break
+                time.sleep(settings.PROBER_WORKER_IDLE_SECONDS)
+    except KeyboardInterrupt:
+        app_logger.info("probe_worker.interrupted", worker=worker_id)
+
+    app_logger.info("probe_worker.stopped", worker=worker_id, processed=processed)
+    return processed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lease-based probe worker")
+    parser.add_argument("--worker-id", default=None, help="lease owner id (default: PROBER_WORKER_ID or hostname:pid)")
+    parser.add_argument("--batch", type=int, default=None, help="rows per pass (default: PROBER_DUE_BATCH_SIZE)")
+    parser.add_argument("--engine", choices=["threads", "async", "processes"], default=None, help="probe engine (default: PROBER_ENGINE)")
+    parser.add_argument("--once", action="store_true", help="exit once nothing is due instead of polling")
+    args = parser.parse_args()
+
+    run_probe_worker(worker_id=args.worker_id, batch=args.batch, engine=args.engine, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
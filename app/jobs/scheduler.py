@@ -2,8 +2,10 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from app.utils.log import app_logger
 from app.jobs.dixcover import run_scan
-from app.services.database import engine
-from app.jobs.probe_master import probe_master
+from app.services.database import SessionLocal, engine
+from app.jobs.probe_master import notify_finished_runs, probe_master, probe_due
+from app.services.probe_runs import ProbeRunStore
+from app.config.settings import settings
 
 # Use the application's SQLAlchemy engine so APScheduler persists jobs
 _scheduler = BackgroundScheduler(jobstores={
@@ -48,10 +50,86 @@ def add_daily_probe_job():
         app_logger.info(f"scheduler: probe job already exists {job_id}")
         return
 
-    _scheduler.add_job(probe_master, 'interval', days=1, id=job_id, replace_existing=False)
+    # results are only persisted, never returned to anyone
+    _scheduler.add_job(probe_master, 'interval', days=1, kwargs={"collect": False}, id=job_id, replace_existing=False)
     app_logger.info(f"scheduler: added daily probe job {job_id}")
 
 
+def add_due_probe_job():
+    """Schedule `probe_due` every `PROBER_DUE_INTERVAL_MINUTES` (persistent jobstore).
+
+    Replaces the daily full probe when probe scheduling is enabled; runs never
+    overlap. An existing job is replaced, so a changed interval takes effect
+    on the next start.
+    """
+    job_id = "probe_due"
+    _scheduler.add_job(
+        probe_due,
+        'interval',
+        minutes=settings.PROBER_DUE_INTERVAL_MINUTES,
+        id=job_id,
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+    app_logger.info(f"scheduler: added due probe job {job_id} every {settings.PROBER_DUE_INTERVAL_MINUTES} min")
+
+
+def add_resume_probe_job():
+    """Schedule a one-off `probe_master` run resuming an interrupted probe run.
+
+    Only runs this process may take over are considered (see `ProbeRunStore`);
+    the newest one is resumed. No-op with `PROBER_RUN_RESUME` disabled.
+    """
+    if not settings.PROBER_RUN_RESUME:
+        return
+    db = SessionLocal()
+    try:
+        interrupted = ProbeRunStore(db).interrupted()
+    finally:
+        db.close()
+    if not interrupted:
+        return
+
+    run = interrupted[0]
+    job_id = "probe_master_resume"
+    _scheduler.add_job(
+        probe_master,
+        'date',
+        kwargs={"due_only": run.kind == "due", "collect": False},
+        id=job_id,
+        replace_existing=True,
+    )
+    app_logger.info(f"scheduler: added resume probe job {job_id} for run {run.id}")
+
+
+def add_notify_probe_runs_job():
+    """Schedule a one-off send of the notifications finished probe runs still owe.
+
+    Covers runs that finished but whose notification failed or was cut off by
+    a restart (see `ProbeRunStore.unnotified`).
+    """
+    db = SessionLocal()
+    try:
+        owed = ProbeRunStore(db).unnotified()
+    finally:
+        db.close()
+    if not owed:
+        return
+
+    job_id = "probe_runs_notify"
+    _scheduler.add_job(notify_finished_runs, 'date', id=job_id, replace_existing=True)
+    app_logger.info(f"scheduler: added probe run notification job {job_id} for {len(owed)} run(s)")
+
+
+def remove_due_probe_job():
+    job_id = "probe_due"
+    job = _scheduler.get_job(job_id)
+    if job:
+        _scheduler.remove_job(job_id)
+        app_logger.info(f"scheduler: removed probe job {job_id}")
+
+
 def remove_probe_job():
     job_id = "probe_master_daily"
     job = _scheduler.get_job(job_id)
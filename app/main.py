@@ -3,14 +3,34 @@ from contextlib import asynccontextmanager
 from app.api.subdomain_search import router as subdomain_search
 from app.api.probe import router as probe_router
 from app.api.data_consume import router as data_consume_router
-from app.jobs.scheduler import start_scheduler, shutdown_scheduler, add_daily_probe_job
+from app.jobs.scheduler import (
+    start_scheduler,
+    shutdown_scheduler,
+    add_daily_probe_job,
+    add_due_probe_job,
+    remove_probe_job,
+    remove_due_probe_job,
+    add_resume_probe_job,
+    add_notify_probe_runs_job,
+)
+from app.config.settings import settings
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
     start_scheduler()
-    # register daily probe job (idempotent if already present)
-    add_daily_probe_job()
+    # register the probe job (idempotent if already present): due-only runs with
+    # probe scheduling, otherwise the daily full probe
+    if settings.PROBER_SCHEDULING:
+        remove_probe_job()
+        add_due_probe_job()
+    else:
+        remove_due_probe_job()
+        add_daily_probe_job()
+    # pick up a probe run interrupted by a restart
+    add_resume_probe_job()
+    # and the new-alive notifications of finished runs that were never sent
+    add_notify_probe_runs_job()
     yield
     # Shutdown logic (opcional)
     shutdown_scheduler()
@@ -1,8 +1,8 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 from sqlmodel import Field, Column, DateTime, SQLModel
-from sqlalchemy import Integer
+from sqlalchemy import Integer, JSON, String, Text
 
 
 class AliveSubdomain(SQLModel, table=True):
@@ -15,4 +15,12 @@ class AliveSubdomain(SQLModel, table=True):
     # last time the host was observed alive
     last_alive: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
     status_code: Optional[int] = Field(default=None, sa_column=Column(Integer, nullable=True))
+    # ports that accepted a TCP connection in the pre-probe sweep
+    open_ports: Optional[List[int]] = Field(default=None, sa_column=Column(JSON, nullable=True))
+    # fingerprint of the response that made the host count as alive
+    final_url: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    server: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    title: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    # sha256 of the first PROBER_BODY_MAX_BYTES of the body ("get" probe mode only)
+    body_hash: Optional[str] = Field(default=None, sa_column=Column(String(64), nullable=True))
     notes: Optional[str] = Field(default=None)
@@ -0,0 +1,20 @@
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import Field, Column, DateTime, SQLModel
+from sqlalchemy import BigInteger
+
+
+class CrtshWatermark(SQLModel, table=True):
+    __tablename__ = "crtsh_watermark"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # domain queried on crt.sh (the scan root or a searched subdomain)
+    domain: str = Field(index=True, unique=True, nullable=False)
+    # highest crt.sh certificate id already processed for this domain
+    max_cert_id: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, default=0))
+    # entry_timestamp of the newest processed certificate (informational)
+    max_entry_timestamp: Optional[str] = Field(default=None)
+    # last time every certificate was processed regardless of the watermark
+    last_full_scan_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
+    updated_at: datetime = Field(default_factory=datetime.now, sa_column=Column(DateTime, nullable=False))
@@ -0,0 +1,30 @@
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import Field, Column, DateTime, SQLModel
+from sqlalchemy import BigInteger, Integer
+
+
+class ProbeRun(SQLModel, table=True):
+    __tablename__ = "probe_runs"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # "full" (walks subdomains_master by id) or "due"; only a run of the same kind is resumed
+    kind: str = Field(index=True, nullable=False)
+    # "running" until the run completes; interrupted runs stay "running" until resumed
+    status: str = Field(default="running", index=True, nullable=False)
+    # host that last worked on the run
+    owner: Optional[str] = Field(default=None)
+    # row cap the run was started with
+    row_limit: Optional[int] = Field(default=None, sa_column=Column(Integer, nullable=True))
+    # highest subdomains_master.id whose chunk is fully stored (full runs)
+    cursor: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
+    # master rows covered by checkpoints, probe results stored and alive ones among them
+    scanned: int = Field(default=0, sa_column=Column(Integer, nullable=False, default=0))
+    probed: int = Field(default=0, sa_column=Column(Integer, nullable=False, default=0))
+    alive: int = Field(default=0, sa_column=Column(Integer, nullable=False, default=0))
+    started_at: datetime = Field(default_factory=datetime.now, sa_column=Column(DateTime, nullable=False))
+    updated_at: datetime = Field(default_factory=datetime.now, sa_column=Column(DateTime, nullable=False))
+    finished_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
+    # set once the new-alive notification is sent; a finished run without it still owes one
+    notified_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
@@ -0,0 +1,16 @@
+from typing import Optional
+from datetime import datetime
+
+from sqlmodel import Field, Column, DateTime, SQLModel
+from sqlalchemy import Integer
+
+
+# first-time-alive hosts of a probe run, notified once when the run finishes
+class ProbeRunNewAlive(SQLModel, table=True):
+    __tablename__ = "probe_run_new_alives"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: int = Field(index=True, nullable=False)
+    subdomain: str = Field(nullable=False)
+    status_code: Optional[int] = Field(default=None, sa_column=Column(Integer, nullable=True))
+    probed_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
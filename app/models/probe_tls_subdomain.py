@@ -0,0 +1,10 @@
+from sqlmodel import Field
+
+from app.models.base_model import BaseTable
+
+class ProbeTlsSubdomain(BaseTable, table=True):
+    __tablename__ = "probe_tls_subdomain"
+
+    subdomain: str = Field(index=True, unique=True)
+    # probed host whose certificate listed the name
+    seen_on: str = Field()
@@ -2,7 +2,7 @@ from typing import Optional, List
 from datetime import datetime
 
 from sqlmodel import Field, Column, DateTime, SQLModel
-from sqlalchemy import JSON
+from sqlalchemy import JSON, Integer
 
 
 class MasterSubdomains(SQLModel, table=True):
@@ -12,7 +12,20 @@ class MasterSubdomains(SQLModel, table=True):
     subdomain: str = Field(index=True, unique=True, nullable=False)
     # list of sources that detected this subdomain (keeps history)
     sources: Optional[List[str]] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    # earliest detection reported by any provider table
+    first_seen: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
     # last time we observed it alive (kept for quick overview)
     last_alive: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
+    # when the prober should look at this subdomain again (NULL = never probed, due now)
+    next_probe_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True, index=True))
+    # consecutive probes that found the host dead; drives the re-probe backoff
+    probe_failures: int = Field(default=0, sa_column=Column(Integer, nullable=False, server_default='0'))
+    # probe worker currently holding this row and when its claim lapses
+    lease_owner: Optional[str] = Field(default=None, nullable=True)
+    lease_expires_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
+    # outcome of the last DNS pre-resolution before probing (ok, nxdomain, no_answer, timeout, error)
+    dns_status: Optional[str] = Field(default=None, nullable=True)
+    dns_addresses: Optional[List[str]] = Field(default=None, sa_column=Column(JSON, nullable=True))
+    dns_checked_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
     # when this master record was created in the system
     created_at: datetime = Field(default_factory=datetime.now, sa_column=Column(DateTime, nullable=False))
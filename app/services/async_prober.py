@@ -0,0 +1,431 @@
+import asyncio
+import random
+import re
+from datetime import datetime
+from urllib.parse import urljoin
+from typing import AsyncIterator, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+import aiohttp
+
+from app.utils.log import app_logger
+from app.config.settings import settings
+from app.clients.base_http_client import BaseHTTPClient, parse_retry_after
+from app.services.port_scanner import default_port
+from app.services.ip_groups import IpStats, PreResolvedResolver, interleave_by_ip, primary_address
+from app.services.fingerprint import fingerprint
+from app.services.probe_retry import RATE_LIMITED, TRANSIENT, RetryLater, RetryScheduler
+from app.services.probe_race import TargetRace, race_result
+from app.services.tls_names import peer_cert_names
+
+
+class _Unlimited:
+    """Async no-op context used when a host has no per-IP cap."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_LIMIT = _Unlimited()
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class _Response(NamedTuple):
+    """What is kept of one HTTP exchange once its connection is released."""
+
+    status: int
+    url: str
+    headers: Mapping[str, str]
+    body: Optional[bytes]
+    charset: Optional[str]
+    # SAN/CN names of the certificate the HTTPS connection presented
+    tls_names: Optional[List[str]] = None
+
+
+class _TlsResponse(aiohttp.ClientResponse):
+    """Keeps the TLS object of the connection a response arrived on.
+
+    A body-less response (HEAD) releases its connection as soon as the
+    headers are read, so it is taken when the response starts.
+    """
+
+    ssl_object = None
+
+    async def start(self, connection):
+        if connection.transport is not None:
+            self.ssl_object = connection.transport.get_extra_info("ssl_object")
+        return await super().start(connection)
+
+
+class AsyncProberService:
+    """Asyncio counterpart of `ProberService` for probing thousands of hosts at once.
+
+    - Same probing order per host (default https, default http, then `ports`
+      with https before http), HEAD first with a GET fallback on 405, and the
+      same result dict as `ProberService.probe`.
+      Targets closed in a TCP sweep (`open_ports`) are skipped the same way.
+    - A global semaphore caps the number of requests in flight across all
+      hosts; every request has its own timeout.
+    - Hosts sharing a resolved IP (`addresses`, from the DNS stage) are
+      interleaved and capped at `max_per_ip` concurrent requests per IP. The
+      connector connects to those addresses without another lookup and keeps
+      connections alive per hostname (TLS needs the name's own SNI), so the
+      HEAD/GET pair and the scheme/port attempts of a host reuse them.
+      Per-IP counters are kept in `ip_stats`.
+    - `mode="get"` sends one GET per target instead of HEAD + GET, following
+      at most `max_redirects` redirects and reading at most `max_body_bytes`
+      of the body for the title and body hash, like `ProberService`.
+    - With `race`, a host's targets are raced instead of tried one by one:
+      one starts every `PROBER_RACE_STAGGER` seconds (immediately when the
+      running ones failed), the first answer cancels the rest, and a more
+      preferred target still running gets `PROBER_RACE_GRACE` seconds to
+      answer too (see `TargetRace`).
+    - `probe_many` keeps a bounded window of host tasks and cancels the ones
+      still pending if the caller stops early or is cancelled. 429s and
+      transient errors are never slept on inside a task: the host is re-queued
+      in a `RetryScheduler` (up to `max_retries` times, backing off from
+      `retry_delay`) and the window slot goes to the next host.
+    - With `harvest_tls`, alive results carry the `tls_names` of the
+      certificate the host's HTTPS connection presented, read from the
+      connection's TLS object (see `_TlsResponse`).
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        verify: bool = True,
+        user_agent: Optional[str] = None,
+        ports: Optional[List[int]] = None,
+        concurrency: Optional[int] = None,
+        max_retries: int = 2,
+        retry_delay: float = 1.0,
+        max_per_ip: Optional[int] = None,
+        ip_stats: Optional[IpStats] = None,
+        mode: Optional[str] = None,
+        max_body_bytes: Optional[int] = None,
+        max_redirects: Optional[int] = None,
+        race: Optional[bool] = None,
+        harvest_tls: Optional[bool] = None,
+    ):
+        self.timeout = timeout
+        self.verify = verify
+        ua = user_agent or random.choice(getattr(BaseHTTPClient, "USER_AGENTS", ["dixcover-prober/1.0"]))
+        self.headers = {"User-Agent": ua}
+        self.ports = ports or [8443, 8080, 8000, 3000]
+        self.concurrency = concurrency or settings.PROBER_ASYNC_CONCURRENCY
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_per_ip = settings.PROBER_MAX_PER_IP if max_per_ip is None else max_per_ip
+        self.ip_stats = ip_stats or IpStats()
+        self.addresses: Dict[str, List[str]] = {}
+        self.mode = (mode or settings.PROBER_REQUEST_MODE).lower()
+        self.max_body_bytes = max_body_bytes or settings.PROBER_BODY_MAX_BYTES
+        self.max_redirects = settings.PROBER_MAX_REDIRECTS if max_redirects is None else max_redirects
+        self.race = settings.PROBER_RACE if race is None else race
+        self.race_stagger = settings.PROBER_RACE_STAGGER
+        self.race_grace = settings.PROBER_RACE_GRACE
+        self.harvest_tls = settings.PROBER_TLS_HARVEST if harvest_tls is None else harvest_tls
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._ip_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    async def start(self):
+        """Create the semaphore and connection pool on the running loop."""
+        if self._session is None or self._session.closed:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._ip_semaphores = {}
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency,
+                limit_per_host=0,
+                ssl=None if self.verify else False,
+                ttl_dns_cache=300,
+                resolver=PreResolvedResolver(self.addresses),
+                keepalive_timeout=settings.ASYNC_HTTP_KEEPALIVE,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                response_class=_TlsResponse,
+            )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _targets(self, subdomain: str, open_ports: Optional[List[int]] = None) -> List[Tuple[str, Optional[int]]]:
+        targets = [("https", None), ("http", None)]
+        for port in self.ports:
+            targets.extend([("https", port), ("http", port)])
+        if open_ports is not None:
+            targets = [(scheme, port) for scheme, port in targets if default_port(scheme, port) in open_ports]
+        return targets
+
+    def _ip_slot(self, ip: Optional[str]):
+        """Per-IP concurrency cap (a no-op for unresolved hosts or when disabled)."""
+        if ip is None or not self.max_per_ip:
+            return _NO_LIMIT
+        semaphore = self._ip_semaphores.get(ip)
+        if semaphore is None:
+            semaphore = self._ip_semaphores[ip] = asyncio.Semaphore(self.max_per_ip)
+        return semaphore
+
+    async def _read_body(self, resp: aiohttp.ClientResponse) -> bytes:
+        """Read at most `max_body_bytes` of the (decoded) body; a failed read keeps what arrived."""
+        body = bytearray()
+        try:
+            while len(body) < self.max_body_bytes:
+                chunk = await resp.content.read(self.max_body_bytes - len(body))
+                if not chunk:
+                    break
+                body += chunk
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            app_logger.debug("probe.body_read_failed", url=str(resp.url), error=str(e) or type(e).__name__)
+        return bytes(body)
+
+    def _tls_names(self, resp: aiohttp.ClientResponse) -> Optional[List[str]]:
+        if not self.harvest_tls or resp.url.scheme != "https":
+            return None
+        return peer_cert_names(getattr(resp, "ssl_object", None))
+
+    async def _single_request(
+        self,
+        subdomain: str,
+        method: str,
+        url: str,
+        allow_redirects: bool = True,
+        read_body: bool = False,
+    ) -> _Response:
+        """Send one request; returns the response, raises `RetryLater` on a 429 or a transient error."""
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        ip = primary_address(self.addresses, subdomain)
+        try:
+            # take the per-IP slot first so hosts of a busy IP do not hold global slots while waiting
+            async with self._ip_slot(ip), self._semaphore:
+                try:
+                    async with self._session.request(method, url, timeout=timeout, allow_redirects=allow_redirects) as resp:
+                        tls_names = self._tls_names(resp)
+                        body = await self._read_body(resp) if read_body and resp.status != 429 else None
+                        response = _Response(resp.status, str(resp.url), resp.headers, body, resp.charset, tls_names)
+                except Exception:
+                    self.ip_stats.record(ip, subdomain, ok=False)
+                    raise
+                self.ip_stats.record(ip, subdomain, ok=True)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as e:
+            # sanitize exception message to avoid leaking memory addresses
+            sanitized = re.sub(r'0x[0-9a-fA-F]+', '<ptr>', str(e) or type(e).__name__)
+            app_logger.debug("probe.request_exception", subdomain=subdomain, url=url, error=sanitized)
+            if _is_transient(e):
+                raise RetryLater(TRANSIENT, sanitized) from e
+            raise
+
+        # rate limited: hand the host back to the retry queue instead of sleeping on it
+        if response.status == 429:
+            retry_after = response.headers.get("Retry-After")
+            wait = parse_retry_after(retry_after) if retry_after else None
+            app_logger.warning("probe.rate_limited", subdomain=subdomain, url=url, wait=wait)
+            raise RetryLater(RATE_LIMITED, "rate limited", wait)
+        return response
+
+    async def _fetch(self, subdomain: str, url: str) -> Optional[_Response]:
+        """One GET per hop, redirects followed by hand up to `max_redirects`."""
+        resp = await self._single_request(subdomain, "GET", url, allow_redirects=False, read_body=True)
+        # the host's own certificate, before any redirect leaves it
+        tls_names = resp.tls_names if resp is not None else None
+        for _ in range(self.max_redirects):
+            if resp is None or resp.status not in _REDIRECTS or "Location" not in resp.headers:
+                break
+            location = urljoin(resp.url, resp.headers["Location"])
+            try:
+                resp = await self._single_request(subdomain, "GET", location, allow_redirects=False, read_body=True)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError, RetryLater) as e:
+                # the host answered; an unreachable redirect target does not make it dead
+                app_logger.debug("probe.redirect_failed", subdomain=subdomain, url=location, error=str(e) or type(e).__name__)
+                break
+        return resp._replace(tls_names=tls_names) if resp is not None else None
+
+    async def _try_scheme_port(self, subdomain: str, scheme: str, port: Optional[int]) -> Tuple[Optional[int], Optional[Dict]]:
+        url = f"{scheme}://{subdomain}/" if port is None else f"{scheme}://{subdomain}:{port}/"
+        if self.mode == "get":
+            resp = await self._fetch(subdomain, url)
+        else:
+            # HEAD first, GET when HEAD is not allowed
+            resp = await self._single_request(subdomain, "HEAD", url)
+            if resp is None or resp.status == 405:
+                resp = await self._single_request(subdomain, "GET", url)
+        status = resp.status if resp is not None else None
+        info = fingerprint(resp.url, resp.headers, resp.body, resp.charset) if resp is not None else None
+        if resp is not None and resp.tls_names:
+            info["tls_names"] = resp.tls_names
+        app_logger.debug("probe.result", subdomain=subdomain, url=url, is_alive=status is not None, status_code=status)
+        return status, info
+
+    async def _attempt(self, subdomain: str, scheme: str, port: Optional[int]) -> Tuple[bool, object]:
+        """One raced target: `(answered, value)` as recorded by `TargetRace`."""
+        try:
+            status, info = await self._try_scheme_port(subdomain, scheme, port)
+        except RetryLater as e:
+            # a 429 is an answer; a transient failure is not
+            return e.reason == RATE_LIMITED, e
+        except Exception as e:
+            app_logger.debug("probe.try_failed", subdomain=subdomain, scheme=scheme, port=port, error=str(e) or type(e).__name__)
+            return False, e
+        return (True, (status, info)) if status is not None else (False, None)
+
+    async def _race(self, subdomain: str, targets: List[Tuple[str, Optional[int]]]) -> Tuple[TargetRace, Optional[int]]:
+        """Race `targets`; returns the race and the winning index (None when all failed)."""
+        loop = asyncio.get_running_loop()
+        race = TargetRace(len(targets), self.race_stagger, self.race_grace)
+        tasks: Dict[asyncio.Future, int] = {}
+        try:
+            while True:
+                now = loop.time()
+                won = race.winner(now)
+                if won is not None or race.finished(len(tasks)):
+                    return race, won
+                if race.should_launch(len(tasks), now):
+                    index = race.launch(now)
+                    scheme, port = targets[index]
+                    tasks[asyncio.ensure_future(self._attempt(subdomain, scheme, port))] = index
+                    continue
+                done, _ = await asyncio.wait(tasks, timeout=race.wait_timeout(now), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    race.record(tasks.pop(task), *task.result())
+        finally:
+            # first answer wins: stop the slower attempts
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def probe(self, subdomain: str, open_ports: Optional[List[int]] = None) -> Dict:
+        await self.start()
+        probed_at = datetime.now()
+        last_error = None
+
+        if open_ports is not None and not open_ports:
+            app_logger.debug("probe.no_open_ports", subdomain=subdomain)
+            return {"subdomain": subdomain, "is_alive": False, "probed_at": probed_at, "status_code": None, "error": "no open ports", "open_ports": open_ports}
+
+        targets = self._targets(subdomain, open_ports)
+        if self.race and len(targets) > 1:
+            race, won = await self._race(subdomain, targets)
+            if won is not None:
+                app_logger.debug("probe.success", subdomain=subdomain, scheme=targets[won][0], port=targets[won][1], raced=race.launched)
+            return race_result(subdomain, probed_at, open_ports, race, won)
+
+        transient = None
+        for scheme, port in targets:
+            try:
+                status, info = await self._try_scheme_port(subdomain, scheme, port)
+            except RetryLater as e:
+                if e.reason == RATE_LIMITED:
+                    # the host answered; stop here and come back after Retry-After
+                    return {"subdomain": subdomain, "is_alive": True, "probed_at": probed_at, "status_code": 429, "error": e.error, "open_ports": open_ports, "retry": RATE_LIMITED, "retry_after": e.retry_after}
+                last_error = transient = e.error
+                app_logger.debug("probe.try_failed", subdomain=subdomain, scheme=scheme, port=port, error=last_error)
+                continue
+            except Exception as e:
+                last_error = str(e) or type(e).__name__
+                app_logger.debug("probe.try_failed", subdomain=subdomain, scheme=scheme, port=port, error=last_error)
+                continue
+            if status is not None:
+                app_logger.debug("probe.success", subdomain=subdomain, scheme=scheme, port=port, status_code=status)
+                return {"subdomain": subdomain, "is_alive": True, "probed_at": probed_at, "status_code": status, "error": None, "open_ports": open_ports, **(info or {})}
+
+        # all attempts failed (network errors); timeouts and dropped connections are worth another try later
+        app_logger.debug("probe.error", subdomain=subdomain, error=last_error)
+        result = {"subdomain": subdomain, "is_alive": False, "probed_at": probed_at, "status_code": None, "error": last_error, "open_ports": open_ports}
+        if transient is not None:
+            result.update(retry=TRANSIENT, retry_after=None)
+        return result
+
+    async def _probe_safe(self, subdomain: str, open_ports: Optional[List[int]] = None) -> Dict:
+        try:
+            return await self.probe(subdomain, open_ports)
+        except Exception as e:
+            app_logger.error("probe_master.worker_error", subdomain=subdomain, error=str(e))
+            return {"subdomain": subdomain, "is_alive": False, "probed_at": datetime.now(), "status_code": None, "error": str(e), "open_ports": open_ports}
+
+    async def probe_many(
+        self,
+        subdomains: Iterable[str],
+        window: Optional[int] = None,
+        open_ports: Optional[Dict[str, List[int]]] = None,
+        addresses: Optional[Dict[str, List[str]]] = None,
+        retries: Optional[RetryScheduler] = None,
+    ) -> AsyncIterator[Dict]:
+        """Yield probe results as they complete.
+
+        At most `window` hosts (default: twice the request concurrency) are in
+        progress at a time, so huge inputs do not create one task per host up
+        front. `open_ports` maps hosts to their TCP sweep result and
+        `addresses` to their resolved IPs (hosts are then interleaved by IP).
+        Rate-limited and transiently failing hosts go through `retries` (a
+        `RetryScheduler`, by default one using `max_retries`/`retry_delay`) and
+        are probed again once due; only settled results are yielded.
+        """
+        await self.start()
+        window = window or self.concurrency * 2
+        if retries is None:
+            retries = RetryScheduler(max_attempts=self.max_retries, base_delay=self.retry_delay)
+        if addresses:
+            self.addresses.update(addresses)
+            subdomains = interleave_by_ip(subdomains, addresses)
+        pending = iter(subdomains)
+        in_flight = set()
+
+        def launch(subdomain: str) -> Optional[Dict]:
+            blocked = retries.admit(subdomain, primary_address(self.addresses, subdomain))
+            if blocked is None:
+                in_flight.add(asyncio.ensure_future(self._probe_safe(subdomain, open_ports.get(subdomain) if open_ports is not None else None)))
+            return blocked
+
+        try:
+            while True:
+                for subdomain in retries.due():
+                    blocked = launch(subdomain)
+                    if blocked is not None:
+                        yield blocked
+                for subdomain in pending:
+                    blocked = launch(subdomain)
+                    if blocked is not None:
+                        yield blocked
+                    if len(in_flight) >= window:
+                        break
+                if not in_flight:
+                    delay = retries.next_due_in()
+                    if delay is None:
+                        return
+                    await asyncio.sleep(delay)
+                    continue
+                done, in_flight = await asyncio.wait(in_flight, timeout=retries.next_due_in(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    res = task.result()
+                    settled = retries.settle(res, primary_address(self.addresses, res["subdomain"]))
+                    if settled is not None:
+                        yield settled
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+
+def _is_transient(e: BaseException) -> bool:
+    """Timeouts and dropped connections; refused connections and TLS failures are not retried."""
+    if isinstance(e, (asyncio.TimeoutError, aiohttp.ServerDisconnectedError, aiohttp.ClientPayloadError)):
+        return True
+    return isinstance(e, aiohttp.ClientOSError) and not isinstance(e, aiohttp.ClientConnectorError)
@@ -1,6 +1,5 @@
-import re
 from threading import Lock
-from app.utils.log import app_logger
+from app.utils.normalizer import get_normalizer
 
 class BaseSubdomainService:
     def __init__(self, max_depth=5, delay=5, max_workers=8):
@@ -10,15 +9,13 @@ class BaseSubdomainService:
         self.found_subdomains = set()
         self.processed_domains = set()
         self.lock = Lock()
+        # names already in master for the scanned root (shared by every provider of a scan)
+        self.known = None
 
     def is_valid_subdomain(self, name, target_domain):
-        name = name.replace('*.', '')  # remove wildcard
-        if not name.endswith(f'{target_domain}') and name != target_domain:
-            return False
-        domain_pattern = re.compile(
-            r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$'
-            r'(\.[a-zA-Z0-9]([a-zA-Z0-9\-_]{0,61}[a-zA-Z0-9])?)*$'
-        )
-        if not bool(domain_pattern.match(name)):
-            app_logger.debug(f'invalid subdomain: {name}')
-        return bool(domain_pattern.match(name))
\ No newline at end of file
+        """ True when `name` (wildcards, case and IDNA aside) is `target_domain` or one of its subdomains """
+        return get_normalizer(target_domain).is_valid(name)
+
+    def normalize_subdomain(self, name, target_domain):
+        """ cleaned form of `name` to store, or None if it is not valid under `target_domain` """
+        return get_normalizer(target_domain).normalize(name)
@@ -0,0 +1,131 @@
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Optional, Type
+
+from sqlalchemy import JSON, cast
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from sqlmodel import SQLModel
+
+from app.config.settings import settings
+from app.models.subdomains_master import MasterSubdomains
+from app.services.known_subdomains import KnownSubdomains
+from app.utils.log import app_logger
+
+
+class BulkSubdomainWriter:
+    """Buffer provider rows and write them with multi-row upserts.
+
+    Behavior:
+    - Rows are buffered per provider table and de-duplicated by `subdomain`
+      (the last row seen for a name wins, like the previous per-row upsert).
+    - A flush issues one `INSERT ... ON CONFLICT` for the provider table and,
+      when `merge_master` is set, one for `subdomains_master` that appends the
+      provider to `sources` in SQL. Both statements share a single commit.
+    - A flush happens when `batch_size` rows are buffered, when `flush_interval`
+      seconds passed since the last flush, and on `close()`.
+    - With `known`, names already credited to `source` in master are skipped
+      before they are buffered, and written rows are reported back to it.
+    - Safe to share between threads (crt.sh feeds it from its worker pool).
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        model: Type[SQLModel],
+        source: str,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        merge_master: bool = True,
+        known: Optional[KnownSubdomains] = None,
+    ):
+        self.db = db
+        self.table = model.__table__
+        self.source = source
+        self.batch_size = batch_size or settings.BULK_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.BULK_WRITE_FLUSH_INTERVAL
+        self.merge_master = merge_master
+        self.known = known
+        self.written = 0
+        self.failed = 0
+        self._rows: Dict[str, dict] = {}
+        self._lock = Lock()
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def add(self, row: dict) -> None:
+        """Buffer a provider row (must contain `subdomain`), flushing when due."""
+        if self.known is not None and not self.known.should_write(row['subdomain'], self.source):
+            return
+        with self._lock:
+            self._rows[row['subdomain']] = row
+            due = (
+                len(self._rows) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+            if due:
+                self._flush_locked()
+
+    def flush(self) -> int:
+        """Write buffered rows now. Returns the number of rows written."""
+        with self._lock:
+            return self._flush_locked()
+
+    def close(self) -> None:
+        self.flush()
+        app_logger.debug(f"{self.source}: bulk writer closed (written={self.written} failed={self.failed})")
+
+    def _flush_locked(self) -> int:
+        self._last_flush = time.monotonic()
+        if not self._rows:
+            return 0
+
+        rows = list(self._rows.values())
+        self._rows = {}
+        try:
+            self.db.execute(self._provider_upsert(rows))
+            if self.merge_master:
+                self.db.execute(self._master_upsert([r['subdomain'] for r in rows]))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            self.failed += len(rows)
+            app_logger.error(f"{self.source}: error flushing {len(rows)} rows into {self.table.name}: {e}")
+            return 0
+
+        self.written += len(rows)
+        if self.known is not None:
+            self.known.record_written(self.source, len(rows))
+        app_logger.debug(f"{self.source}: flushed {len(rows)} rows into {self.table.name}")
+        return len(rows)
+
+    def _provider_upsert(self, rows):
+        insert_stmt = pg_insert(self.table).values(rows)
+        update_stmt = {k: insert_stmt.excluded[k] for k in rows[0].keys() if k != 'subdomain'}
+        if update_stmt:
+            return insert_stmt.on_conflict_do_update(index_elements=['subdomain'], set_=update_stmt)
+        return insert_stmt.on_conflict_do_nothing(index_elements=['subdomain'])
+
+    def _master_upsert(self, subdomains):
+        table = MasterSubdomains.__table__
+        now = datetime.now()
+        insert_stmt = pg_insert(table).values([
+            {'subdomain': sd, 'sources': [self.source], 'first_seen': now, 'created_at': now} for sd in subdomains
+        ])
+        existing = cast(table.c.sources, JSONB)
+        incoming = cast(insert_stmt.excluded.sources, JSONB)
+        # append the source only when it is not already listed; rows that
+        # already carry it are left untouched
+        return insert_stmt.on_conflict_do_update(
+            index_elements=['subdomain'],
+            set_={'sources': cast(existing.op('||')(incoming), JSON)},
+            where=~existing.contains(incoming),
+        )
@@ -0,0 +1,117 @@
+from typing import Iterable, Iterator, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.utils.log import app_logger
+
+
+STAGING_TABLE = "crtsh_staging"
+
+# one statement: de-duplicate the staged names, upsert them into the provider
+# table and append 'crtsh' to the master row in the same snapshot
+MERGE_SQL = f"""
+WITH staged AS (
+    SELECT DISTINCT ON (subdomain) subdomain, registered_on, expires_on
+    FROM {STAGING_TABLE}
+    ORDER BY subdomain, expires_on DESC
+), provider AS (
+    INSERT INTO crtsh_subdomain (detected_at, subdomain, registered_on, expires_on)
+    SELECT LOCALTIMESTAMP, subdomain, registered_on, expires_on FROM staged
+    ON CONFLICT (subdomain) DO UPDATE SET
+        registered_on = excluded.registered_on,
+        expires_on = excluded.expires_on
+    RETURNING subdomain
+)
+INSERT INTO subdomains_master (subdomain, sources, first_seen, created_at)
+SELECT subdomain, '["crtsh"]'::json, LOCALTIMESTAMP, LOCALTIMESTAMP FROM provider
+ON CONFLICT (subdomain) DO UPDATE SET
+    sources = (subdomains_master.sources::jsonb || '["crtsh"]'::jsonb)::json
+WHERE NOT (subdomains_master.sources::jsonb @> '["crtsh"]'::jsonb)
+"""
+
+
+def _copy_escape(value) -> str:
+    """Escape a value for the COPY text format."""
+    if value is None:
+        return r'\N'
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+class _CopyStream:
+    """Minimal file-like object feeding COPY FROM STDIN from an iterator.
+
+    psycopg2 calls `read(size)` repeatedly, so only one chunk of rows is held
+    in memory at a time.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, str, str]]):
+        self._lines = self._format(rows)
+        self._buffer = ''
+        self.count = 0
+
+    def _format(self, rows: Iterable[Tuple[str, str, str]]) -> Iterator[str]:
+        for row in rows:
+            self.count += 1
+            yield '\t'.join(_copy_escape(v) for v in row) + '\n'
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            chunk, self._buffer = self._buffer, ''
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+class CrtshCopyIngest:
+    """Bulk-load crt.sh rows through a temporary staging table.
+
+    Behavior:
+    - Streams `(subdomain, registered_on, expires_on)` tuples into a temporary
+      table with `COPY FROM STDIN`; the table is dropped on commit.
+    - Merges the staged rows into `crtsh_subdomain` and `subdomains_master`
+      with a single set-based statement.
+    - Runs in its own session so it never interleaves with the bulk writer
+      that shares the caller's session.
+    """
+
+    def __init__(self, db: Session):
+        self.bind = db.get_bind()
+
+    def ingest(self, rows: Iterable[Tuple[str, str, str]]) -> int:
+        """Load `rows` and merge them. Returns the number of staged rows (0 on error)."""
+        stream = _CopyStream(rows)
+        with Session(bind=self.bind) as session:
+            try:
+                session.execute(text(
+                    f"CREATE TEMP TABLE {STAGING_TABLE} "
+                    f"(subdomain text, registered_on text, expires_on text) ON COMMIT DROP"
+                ))
+                cursor = session.connection().connection.cursor()
+                try:
+                    cursor.copy_expert(
+                        f"COPY {STAGING_TABLE} (subdomain, registered_on, expires_on) FROM STDIN",
+                        stream,
+                    )
+                finally:
+                    cursor.close()
+                merged = session.execute(text(MERGE_SQL)).rowcount
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                app_logger.error(f"Crtsh: COPY ingest failed after {stream.count} rows: {e}")
+                return 0
+
+        app_logger.info(f"Crtsh: COPY ingested {stream.count} rows ({merged} master rows changed)")
+        return stream.count
@@ -1,170 +1,255 @@
-from app.clients.crtsh_client import CrtshClient
+from app.clients.crtsh_client import CrtshClient, AsyncCrtshClient
 from app.models.crtsh_subdomain import CrtshSubdomain
 from sqlalchemy.orm import Session
 from app.services.base_subdomain_service import BaseSubdomainService
-from sqlalchemy.exc import IntegrityError
+from app.services.bulk_writer import BulkSubdomainWriter
+from app.services.crtsh_copy_ingest import CrtshCopyIngest
+from app.services.crtsh_watermark import CertificateWatermark, CrtshWatermarkStore
 from app.utils.log import app_logger
-from app.models.subdomains_master import MasterSubdomains
-from sqlmodel import select
-from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.utils.normalizer import get_normalizer
+from app.config.settings import settings
 
+import asyncio
+import collections
 import concurrent.futures
-import time
+import itertools
+import queue
 class CrtshService(BaseSubdomainService):
-    def __init__(self, max_depth=3, delay=5, max_workers=2):
+    # record batches buffered between the async download and the extraction thread
+    STREAM_QUEUE_SIZE = 8
+
+    def __init__(self, max_depth=3, delay=5, max_workers=2, full_refresh=False):
         super().__init__(max_depth, delay, max_workers)
-    
+        # bulk writer shared by every level of a running search
+        self.writer = None
+        # ignore stored watermarks and process every certificate
+        self.full_refresh = full_refresh
+        self.watermarks = None
+        # watermarks of completed searches, saved once their rows are written
+        self._completed_watermarks = []
+        self._write_failed = False
+
+    def _iter_subdomain_rows(self, certificates, target_domain, subdomains: set):
+        """ yield a row for every valid name in crtsh certificates, collecting names into `subdomains` """
+        normalizer = get_normalizer(target_domain)
+        for cert in certificates:
+            # SAN entries plus the first line of the common name
+            names = (cert.get('name_value') or '').split('\n')
+            names.append((cert.get('common_name') or '').split('\n')[0])
+            for raw in names:
+                name = normalizer.normalize(raw)
+                if name is None:
+                    continue
+                subdomains.add(name)
+                yield {
+                    'subdomain': name,
+                    'registered_on': str(cert['not_before']),
+                    'expires_on': str(cert['not_after']),
+                    }
+
     def _extract_subdomains_data(self, certificates, target_domain, db: Session):
-        """ extract unique subdomains from crtsh certificates data and store them in the db """
+        """ extract unique subdomains from crtsh certificates data and store them in the db
+
+        Result sets with at least `CRTSH_COPY_THRESHOLD` new rows are loaded
+        through a COPY staging table; smaller ones go through the bulk writer.
+        Names already credited to crt.sh in master are not written, but are
+        still returned for frontier expansion.
+        """
         subdomains = set()
-        app_logger.debug(f"Crtsh: extracting from {len(certificates) if certificates else 0} certificates for {target_domain}")
-        
-        for cert in certificates:
-            if 'name_value' in cert:
-                names = cert['name_value'].split('\n')
-                for name in names:
-                    name = name.replace('*.', '').strip().lower() # duplicate logic to clean, i don't like it but ok
-                    
-                    # filter valid subdomains with the conditions of unique and no wildcard
-                    if self.is_valid_subdomain(name, target_domain):
-                        app_logger.debug(f"Crtsh: found valid subdomain {name}")
-                        subdomains.add(name)
-                        data = {
-                            'subdomain': name,
-                            'registered_on': str(cert['not_before']),
-                            'expires_on': str(cert['not_after']),
-                            }
-                        self._store_subdomains_data(db, data)
-                        
-            if 'common_name' in cert:
-                name = cert['common_name'].replace('*.', '').strip().lower().split('\n')[0]
-                if self.is_valid_subdomain(name, target_domain):
-                    app_logger.debug(f"Crtsh: found valid common_name {name}")
-                    subdomains.add(name)
-                    data = {
-                        'subdomain': name,
-                        'registered_on': str(cert['not_before']),
-                        'expires_on': str(cert['not_after']),
-                        }
-                    self._store_subdomains_data(db, data) 
-                    
+        app_logger.debug(f"Crtsh: extracting certificates for {target_domain}")
+
+        rows = self._iter_subdomain_rows(certificates, target_domain, subdomains)
+        if self.known is not None:
+            rows = self.known.filter_rows(rows, 'crtsh')
+        threshold = settings.CRTSH_COPY_THRESHOLD
+        head = list(itertools.islice(rows, threshold))
+        if len(head) < threshold:
+            for data in head:
+                self._store_subdomains_data(db, data)
+        else:
+            app_logger.info(f"Crtsh: large result set for {target_domain}, switching to COPY ingest")
+            ingested = CrtshCopyIngest(db).ingest(
+                (r['subdomain'], r['registered_on'], r['expires_on']) for r in itertools.chain(head, rows)
+            )
+            if not ingested:
+                self._write_failed = True
+            elif self.known is not None:
+                self.known.record_written('crtsh', ingested)
+
         return subdomains
     
     def recursive_search(self, db: Session, domain, current_depth=0):
-        """Recursive search for subdomains"""
-        crtsh_client = CrtshClient()
+        """Breadth-first search for subdomains starting at `domain`.
+
+        Kept under its historical name, but no longer recursive: a frontier of
+        `(domain, depth)` items is drained by a single pool of `max_workers`
+        threads. Each domain is queued at most once, only names not seen before
+        in this search are expanded, and the search ends as soon as the frontier
+        is empty. Returns every subdomain found.
+        """
+        self.watermarks = CrtshWatermarkStore(db, full_refresh=self.full_refresh)
+        # one writer for the whole search, flushed when the frontier is drained
+        with BulkSubdomainWriter(db, CrtshSubdomain, 'crtsh', merge_master=False, known=self.known) as self.writer:
+            self._drain_frontier(db, domain, current_depth)
+        self._save_watermarks(domain)
+        return set(self.found_subdomains)
+
+    def _complete_watermark(self, watermark: CertificateWatermark):
+        if not watermark.full:
+            app_logger.info(f"Crtsh: {watermark.domain} skipped {watermark.skipped} certificates up to id {watermark.since_id}")
         with self.lock:
-            # Avoid processing the same domain multiple times
-            if domain in self.processed_domains:
-                return set()
-            
-            self.processed_domains.add(domain)
-        
-        app_logger.info(f"{'  ' * current_depth}Looking: {domain} (depth: {current_depth})")
-        
-        # Search certificates for this domain
-        certificates = crtsh_client.search_domain(domain)
-        # polite delay to avoid hitting crt.sh rate limits
+            self._completed_watermarks.append(watermark)
+
+    def _save_watermarks(self, root):
+        """ advance watermarks only when every row of the search was written """
+        if self._write_failed or self.writer.failed:
+            app_logger.warning(f"Crtsh: write errors during search for {root}; watermarks left unchanged")
+            return
+        saved = self.watermarks.save(self._completed_watermarks)
+        app_logger.debug(f"Crtsh: advanced {saved} watermarks for {root}")
+
+    def _drain_frontier(self, db: Session, root, start_depth):
+        # frontier bookkeeping only happens on this thread, so no locking is
+        # needed between the membership check and the submit
+        frontier = collections.deque()
+        if root not in self.processed_domains:
+            self.processed_domains.add(root)
+            frontier.append((root, start_depth))
+
+        in_flight = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < self.max_workers:
+                    domain, depth = frontier.popleft()
+                    future = executor.submit(self._search, db, domain, depth)
+                    in_flight[future] = (domain, depth)
+
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    domain, depth = in_flight.pop(future)
+                    self._expand_frontier(frontier, future, domain, depth)
+
+        app_logger.info(f"Crtsh: frontier drained for {root} ({len(self.processed_domains)} domains searched, {len(self.found_subdomains)} subdomains)")
+
+    def _expand_frontier(self, frontier, future, domain, depth):
+        """ record a finished search and queue its new names one level deeper """
         try:
-            app_logger.debug(f"Crtsh: sleeping {self.delay}s to avoid rate limit")
-            time.sleep(self.delay)
-        except Exception:
-            pass
-        app_logger.debug(f"Crtsh: retrieved {len(certificates) if certificates else 0} certificates for {domain}")
-        
-        if not certificates:
-            return set()
-            
-        # Extract subdomains from certificates
-        new_subdomains = self._extract_subdomains_data(certificates, domain, db)
-        
-        
-        with self.lock:
-            # Add new subdomains found
-            before_count = len(self.found_subdomains)
-            self.found_subdomains.update(new_subdomains)
-            new_count = len(self.found_subdomains) - before_count
-            
-        app_logger.info(f"{'  ' * current_depth}Found {len(new_subdomains)} subdomains for {domain} ({new_count} new)")
-        
+            names = future.result()
+        except Exception as e:
+            app_logger.error(f"Crtsh: search failed for {domain}: {e}")
+            return
+
+        new_names = names - self.found_subdomains
+        self.found_subdomains.update(new_names)
+        app_logger.info(f"{'  ' * depth}Found {len(names)} subdomains for {domain} ({len(new_names)} new)")
+
         # If we've reached the maximum depth, do not continue
-        if current_depth >= self.max_depth:
-            return new_subdomains
-            
-        # Recursively search in the new subdomains found
-        domains_to_search = []
-        for subdomain in new_subdomains:
-            if subdomain not in self.processed_domains:
-                domains_to_search.append(subdomain)
-        
-        # Use threading for parallel searches
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_domain = {}
-            
-            if not domains_to_search:
-                return
-            
-            for subdomain in domains_to_search:
-                if not isinstance(subdomain, str):
-                    app_logger.warning(f"incorrect value for subdomain: {subdomain}")
-                    continue
-                
-                future = executor.submit(self.recursive_search, db, subdomain, current_depth + 1)
-                future_to_domain[future] = subdomain
-            
-            # Collect results
-            for future in concurrent.futures.as_completed(future_to_domain):
-                try:
-                    future.result()
-                except Exception as e:
-                    app_logger.debug(f"error gathering results: {e}")
-                    domain = future_to_domain[future]
-        
-        return new_subdomains
+        if depth >= self.max_depth:
+            return
+        for name in sorted(new_names):
+            if name not in self.processed_domains:
+                self.processed_domains.add(name)
+                frontier.append((name, depth + 1))
 
-    def _store_subdomains_data(self, db: Session, data: dict):
-        """ Store subdomains in the database """
+    async def recursive_search_async(self, db: Session, domain, current_depth=0):
+        """ `recursive_search` on the event loop: up to `max_workers` searches are
+        in flight as tasks, and extraction/db work runs in worker threads """
+        self.watermarks = CrtshWatermarkStore(db, full_refresh=self.full_refresh)
+        self.writer = BulkSubdomainWriter(db, CrtshSubdomain, 'crtsh', merge_master=False, known=self.known)
+        try:
+            await self._drain_frontier_async(db, domain, current_depth)
+        finally:
+            await asyncio.to_thread(self.writer.close)
+        await asyncio.to_thread(self._save_watermarks, domain)
+        return set(self.found_subdomains)
+
+    async def _drain_frontier_async(self, db: Session, root, start_depth):
+        frontier = collections.deque()
+        if root not in self.processed_domains:
+            self.processed_domains.add(root)
+            frontier.append((root, start_depth))
+
+        in_flight = {}
+        while frontier or in_flight:
+            while frontier and len(in_flight) < self.max_workers:
+                domain, depth = frontier.popleft()
+                task = asyncio.ensure_future(self._search_async(db, domain, depth))
+                in_flight[task] = (domain, depth)
+
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                domain, depth = in_flight.pop(task)
+                self._expand_frontier(frontier, task, domain, depth)
+
+        app_logger.info(f"Crtsh: frontier drained for {root} ({len(self.processed_domains)} domains searched, {len(self.found_subdomains)} subdomains)")
+
+    async def _search_async(self, db: Session, domain, current_depth):
+        """ stream one crt.sh search into `_extract_subdomains_data` running in a worker thread
+
+        Batches go through a bounded queue, so memory stays bounded and the
+        COPY threshold logic is shared with the threaded path.
+        """
+        crtsh_client = AsyncCrtshClient()
+        app_logger.info(f"{'  ' * current_depth}Looking: {domain} (depth: {current_depth})")
+        watermark = await asyncio.to_thread(self.watermarks.open, domain)
+
+        batches = queue.Queue(maxsize=self.STREAM_QUEUE_SIZE)
+        extraction = asyncio.ensure_future(asyncio.to_thread(self._extract_from_queue, batches, domain, db, watermark))
         try:
-            app_logger.debug(f"Crtsh: upserting {data.get('subdomain')}")
-            table = CrtshSubdomain.__table__
-            insert_stmt = pg_insert(table).values(data)
-            update_stmt = {k: insert_stmt.excluded[k] for k in data.keys() if k != 'subdomain'}
-            if update_stmt:
-                stmt = insert_stmt.on_conflict_do_update(index_elements=['subdomain'], set_=update_stmt)
+            async for batch in crtsh_client.iter_certificate_batches(domain):
+                await asyncio.to_thread(batches.put, batch)
+        finally:
+            # end of stream marker, also sent when the download fails
+            await asyncio.to_thread(batches.put, None)
+        subdomains = await extraction
+
+        if crtsh_client.last_complete:
+            self._complete_watermark(watermark)
+        return subdomains
+
+    def _extract_from_queue(self, batches: queue.Queue, domain, db: Session, watermark: CertificateWatermark):
+        finished = False
+
+        def certificates():
+            nonlocal finished
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    finished = True
+                    return
+                yield from batch
+
+        try:
+            return self._extract_subdomains_data(watermark.filter(certificates()), domain, db)
+        finally:
+            # keep draining if extraction stopped early so the producer never blocks
+            while not finished:
+                finished = batches.get() is None
+
+    def _search(self, db: Session, domain, current_depth):
+        """ search crt.sh for one frontier domain and store what it returns """
+        crtsh_client = CrtshClient()
+        app_logger.info(f"{'  ' * current_depth}Looking: {domain} (depth: {current_depth})")
+        # only certificates newer than this domain's watermark are processed
+        watermark = self.watermarks.open(domain)
+        
+        try:
+            # Search certificates for this domain
+            if settings.CRTSH_STREAM_RESPONSES:
+                certificates = crtsh_client.iter_certificates(domain)
             else:
-                stmt = insert_stmt.on_conflict_do_nothing(index_elements=['subdomain'])
-            db.execute(stmt)
-            db.commit()
-
-            # Upsert into master table in Python so we can merge sources properly
-            try:
-                stmt = select(MasterSubdomains).where(MasterSubdomains.subdomain == data.get('subdomain'))
-                master_obj = db.execute(stmt).scalars().one_or_none()
-                incoming_first = data.get('first_seen') or data.get('detected_at')
-                if master_obj is None:
-                    master_obj = MasterSubdomains(
-                        subdomain=data.get('subdomain'),
-                        sources=['crtsh'],
-                        first_seen=incoming_first,
-                    )
-                    db.add(master_obj)
-                else:
-                    # merge sources
-                    if 'crtsh' not in (master_obj.sources or []):
-                        master_obj.sources = (master_obj.sources or []) + ['crtsh']
-                    # update first_seen to the earliest
-                    if incoming_first:
-                        try:
-                            if master_obj.first_seen is None or incoming_first < master_obj.first_seen:
-                                master_obj.first_seen = incoming_first
-                        except Exception:
-                            pass
-                    db.add(master_obj)
-                db.commit()
-            except Exception:
-                db.rollback()
-        except IntegrityError:
-            db.rollback()
-        except Exception as e:
-            db.rollback()
-            app_logger.error(f'error upserting crtsh rows: {e}')
\ No newline at end of file
+                certificates = crtsh_client.search_domain(domain)
+                app_logger.debug(f"Crtsh: retrieved {len(certificates) if certificates else 0} certificates for {domain}")
+
+            # Extract subdomains from certificates (consumes the stream)
+            subdomains = self._extract_subdomains_data(watermark.filter(certificates or []), domain, db)
+            if crtsh_client.last_complete:
+                self._complete_watermark(watermark)
+        finally:
+            crtsh_client.close()
+
+        return subdomains
+
+    def _store_subdomains_data(self, db: Session, data: dict):
+        """ Queue a subdomain row for the bulk writer of the running search """
+        self.writer.add(data)
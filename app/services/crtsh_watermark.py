@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.models.crtsh_watermark import CrtshWatermark
+from app.utils.log import app_logger
+
+
+class CertificateWatermark:
+    """Watermark of one crt.sh query while its certificates are processed.
+
+    `filter()` drops certificates whose id is at or below `since_id` (None
+    means a full pass) and tracks the highest id / entry_timestamp seen, so the
+    stored watermark can be advanced once the results are safely written.
+    """
+
+    def __init__(self, domain: str, since_id: Optional[int]):
+        self.domain = domain
+        self.since_id = since_id
+        self.max_id = since_id or 0
+        self.max_entry_timestamp: Optional[str] = None
+        self.skipped = 0
+
+    @property
+    def full(self) -> bool:
+        return self.since_id is None
+
+    def filter(self, certificates: Iterable[dict]) -> Iterator[dict]:
+        since_id = self.since_id
+        for cert in certificates:
+            cert_id = cert.get('id') or 0
+            if cert_id > self.max_id:
+                self.max_id = cert_id
+            entry_timestamp = cert.get('entry_timestamp')
+            if entry_timestamp and (self.max_entry_timestamp is None or entry_timestamp > self.max_entry_timestamp):
+                self.max_entry_timestamp = entry_timestamp
+            if since_id is not None and cert_id <= since_id:
+                self.skipped += 1
+                continue
+            yield cert
+
+
+class CrtshWatermarkStore:
+    """Loads and advances per-domain crt.sh watermarks.
+
+    Behavior:
+    - `open(domain)` returns a full pass when incremental scans are disabled,
+      when the domain has no watermark yet, or when its last full pass is
+      older than `CRTSH_FULL_REFRESH_DAYS`; otherwise only certificates newer
+      than the stored id are processed.
+    - `save()` upserts watermarks in one statement and never moves them
+      backwards. Callers only save after the matching rows were written.
+    - Uses short sessions of its own, so it is safe from crt.sh worker threads.
+    """
+
+    def __init__(self, db: Session, full_refresh: bool = False):
+        self.bind = db.get_bind()
+        self.full_refresh = full_refresh or not settings.CRTSH_INCREMENTAL
+
+    def open(self, domain: str) -> CertificateWatermark:
+        if self.full_refresh:
+            return CertificateWatermark(domain, None)
+
+        try:
+            with Session(bind=self.bind) as session:
+                row = session.execute(
+                    select(CrtshWatermark).where(CrtshWatermark.domain == domain)
+                ).scalar_one_or_none()
+        except Exception as e:
+            app_logger.error(f"Crtsh: could not load watermark for {domain}: {e}")
+            return CertificateWatermark(domain, None)
+
+        refresh_after = timedelta(days=settings.CRTSH_FULL_REFRESH_DAYS)
+        if row is None or row.last_full_scan_at is None or datetime.now() - row.last_full_scan_at >= refresh_after:
+            return CertificateWatermark(domain, None)
+        return CertificateWatermark(domain, row.max_cert_id)
+
+    def save(self, watermarks: List[CertificateWatermark]) -> int:
+        """Persist advanced watermarks. Returns the number of rows written."""
+        now = datetime.now()
+        # one row per domain: a multi-row upsert cannot touch the same row twice
+        rows = list({
+            w.domain: {
+                'domain': w.domain,
+                'max_cert_id': w.max_id,
+                'max_entry_timestamp': w.max_entry_timestamp,
+                'last_full_scan_at': now if w.full else None,
+                'updated_at': now,
+            }
+            for w in watermarks
+            if w.max_id > 0
+        }.values())
+        if not rows:
+            return 0
+
+        table = CrtshWatermark.__table__
+        stmt = pg_insert(table).values(rows)
+        existing = table.c
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[existing.domain],
+            set_={
+                'max_cert_id': func.greatest(existing.max_cert_id, stmt.excluded.max_cert_id),
+                'max_entry_timestamp': func.greatest(existing.max_entry_timestamp, stmt.excluded.max_entry_timestamp),
+                'last_full_scan_at': func.coalesce(stmt.excluded.last_full_scan_at, existing.last_full_scan_at),
+                'updated_at': stmt.excluded.updated_at,
+            },
+        )
+        with Session(bind=self.bind) as session:
+            try:
+                session.execute(stmt)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                app_logger.error(f"Crtsh: failed to save {len(rows)} watermarks: {e}")
+                return 0
+        return len(rows)
@@ -0,0 +1,178 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from functools import partial
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from app.utils.log import app_logger
+from app.config.settings import settings
+
+
+# outcomes for which the name is dropped before HTTP probing; resolver trouble
+# (timeouts, SERVFAIL) is not proof that the host is gone, so those names are kept
+UNRESOLVED = ("nxdomain", "no_answer")
+
+
+def parse_nameservers(value: Optional[str]) -> List[Tuple[str, Optional[int]]]:
+    """Parse `"1.1.1.1,8.8.8.8:53,[::1]:5353"` into `(address, port)` pairs."""
+    servers = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        port = None
+        if item.startswith("["):
+            address, _, rest = item[1:].partition("]")
+            if rest.startswith(":"):
+                port = int(rest[1:])
+        elif item.count(":") == 1:
+            address, port_str = item.split(":")
+            port = int(port_str)
+        else:
+            address = item
+        servers.append((address, port))
+    return servers
+
+
+class DnsCache:
+    """Resolution results kept for a whole probe run, shared by the resolver of every chunk.
+
+    Bounded to `max_size` names (`PROBER_DNS_CACHE_SIZE`); the least recently
+    used entries are evicted first. Safe to share between threads.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = settings.PROBER_DNS_CACHE_SIZE if max_size is None else max_size
+        self.hits = 0
+        self._results: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            result = self._results.get(name)
+            if result is not None:
+                self._results.move_to_end(name)
+                self.hits += 1
+            return result
+
+    def put(self, name: str, result: Dict) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._results[name] = result
+            self._results.move_to_end(name)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+
+class DnsResolver:
+    """Bulk async A/AAAA resolution run before HTTP probing.
+
+    - CNAME chains are followed by the resolver; the final canonical name is
+      reported in `cname` when it differs from the queried name.
+    - `nameservers` (`PROBER_DNS_RESOLVERS`) overrides the system resolvers;
+      entries may carry a port (`127.0.0.1:5353`).
+    - A and AAAA are looked up independently: a failing AAAA query (timeouts
+      and SERVFAIL are common) does not discard the A answer, and the name's
+      status is decided from both outcomes.
+    - Concurrent lookups of the same name share one query, and finished
+      results go to `cache`: pass the run's `DnsCache` so every chunk's
+      resolver (each on its own event loop) reuses them; without one the
+      cache lives as long as the instance.
+
+    Each result is a dict with keys: subdomain, status ("ok", "nxdomain",
+    "no_answer", "timeout", "error"), addresses (list of str), cname (str|None),
+    resolved_at (datetime).
+    """
+
+    def __init__(
+        self,
+        nameservers: Optional[str] = None,
+        timeout: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        cache: Optional[DnsCache] = None,
+    ):
+        nameservers = settings.PROBER_DNS_RESOLVERS if nameservers is None else nameservers
+        servers = parse_nameservers(nameservers)
+        self.resolver = dns.asyncresolver.Resolver(configure=not servers)
+        if servers:
+            self.resolver.nameservers = [address for address, _ in servers]
+            for address, port in servers:
+                if port is not None:
+                    self.resolver.nameserver_ports[address] = port
+        self.resolver.lifetime = timeout or settings.PROBER_DNS_TIMEOUT
+        self.concurrency = concurrency or settings.PROBER_DNS_CONCURRENCY
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.cache = cache if cache is not None else DnsCache()
+        # lookups in progress (bound to this instance's event loop)
+        self._pending: Dict[str, "asyncio.Future"] = {}
+
+    async def _query(self, name: str, rdtype: str):
+        async with self._semaphore:
+            return await self.resolver.resolve(name, rdtype, raise_on_no_answer=False, search=False)
+
+    async def _lookup(self, name: str) -> Dict:
+        result = {"subdomain": name, "status": "ok", "addresses": [], "cname": None, "resolved_at": datetime.now()}
+        outcomes = await asyncio.gather(self._query(name, "A"), self._query(name, "AAAA"), return_exceptions=True)
+
+        answered = 0
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                continue
+            answered += 1
+            if outcome.rrset is not None:
+                result["addresses"].extend(rr.address for rr in outcome.rrset)
+            canonical = outcome.canonical_name.to_text(omit_final_dot=True)
+            if canonical != name:
+                result["cname"] = canonical
+        if result["addresses"]:
+            return result
+
+        # no address: the name is only gone when that is certain, resolver trouble keeps it
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if any(isinstance(e, dns.resolver.NXDOMAIN) for e in errors):
+            result["status"] = "nxdomain"
+        elif answered == len(outcomes):
+            result["status"] = "no_answer"
+        elif any(isinstance(e, (dns.exception.Timeout, dns.resolver.LifetimeTimeout)) for e in errors):
+            result["status"] = "timeout"
+        else:
+            app_logger.debug("dns.error", subdomain=name, error=str(errors[0]))
+            result["status"] = "error"
+        return result
+
+    async def resolve(self, name: str) -> Dict:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        cached = self.cache.get(name)
+        if cached is not None:
+            return cached
+        future = self._pending.get(name)
+        if future is None:
+            future = self._pending[name] = asyncio.ensure_future(self._lookup(name))
+            future.add_done_callback(partial(self._store, name))
+        return await asyncio.shield(future)
+
+    def _store(self, name: str, future: "asyncio.Future") -> None:
+        del self._pending[name]
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(name, future.result())
+
+    async def resolve_many(self, names: Iterable[str]) -> Dict[str, Dict]:
+        """Resolve `names` concurrently; returns `{name: result}`."""
+        names = list(dict.fromkeys(names))
+        results = await asyncio.gather(*(self.resolve(name) for name in names))
+        return dict(zip(names, results))
+
+
+def resolve_all(names: Iterable[str], cache: Optional[DnsCache] = None, **kwargs) -> Dict[str, Dict]:
+    """Synchronous entry point: resolve `names` in a fresh event loop, reusing `cache` (the run's) when given."""
+    return asyncio.run(DnsResolver(cache=cache, **kwargs).resolve_many(names))
@@ -0,0 +1,46 @@
+import hashlib
+import html
+import re
+from typing import Dict, Mapping, Optional
+
+
+_TITLE_RE = re.compile(rb"<title[^>]*>(.*?)</title\s*>", re.IGNORECASE | re.DOTALL)
+TITLE_MAX_LENGTH = 512
+
+
+def extract_title(body: bytes, encoding: Optional[str] = None) -> Optional[str]:
+    """The page `<title>` from a (possibly truncated) body, whitespace-collapsed."""
+    match = _TITLE_RE.search(body or b"")
+    if not match:
+        return None
+    try:
+        text = match.group(1).decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        # unknown charset announced by the server
+        text = match.group(1).decode("utf-8", errors="replace")
+    # NUL cannot be stored in a Postgres text column
+    title = " ".join(html.unescape(text).replace("\x00", "").split())
+    return title[:TITLE_MAX_LENGTH] or None
+
+
+def body_hash(body: bytes) -> str:
+    """SHA-256 of the body bytes that were read."""
+    return hashlib.sha256(body).hexdigest()
+
+
+def fingerprint(
+    final_url: Optional[str],
+    headers: Optional[Mapping[str, str]],
+    body: Optional[bytes] = None,
+    encoding: Optional[str] = None,
+) -> Dict[str, Optional[str]]:
+    """Fingerprint fields carried by probe results and stored on `alive_subdomains`.
+
+    `body` is None when no body was read (HEAD probes): title and hash stay empty.
+    """
+    return {
+        "final_url": final_url,
+        "server": (headers or {}).get("Server"),
+        "title": extract_title(body, encoding) if body is not None else None,
+        "body_hash": body_hash(body) if body is not None else None,
+    }
@@ -0,0 +1,136 @@
+import collections
+import ipaddress
+import socket
+import time
+import zlib
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional
+
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+
+
+def primary_address(addresses: Dict[str, List[str]], host: str) -> Optional[str]:
+    """The address a host is grouped under (its first resolved address), if known."""
+    candidates = addresses.get(host)
+    return candidates[0] if candidates else None
+
+
+def interleave_by_ip(hosts: Iterable[str], addresses: Dict[str, List[str]]) -> List[str]:
+    """Order hosts round-robin across their IPs.
+
+    Names sharing a backend are spread through the list, so a bounded probe
+    window is not filled with hosts all waiting on the same per-IP cap.
+    Hosts without a known address form their own groups.
+    """
+    groups: Dict[str, collections.deque] = collections.OrderedDict()
+    for host in hosts:
+        key = primary_address(addresses, host) or host
+        groups.setdefault(key, collections.deque()).append(host)
+
+    ordered = []
+    queues = list(groups.values())
+    while queues:
+        remaining = []
+        for q in queues:
+            ordered.append(q.popleft())
+            if q:
+                remaining.append(q)
+        queues = remaining
+    return ordered
+
+
+def partition_by_ip(hosts: Iterable[str], addresses: Dict[str, List[str]], parts: int) -> List[List[str]]:
+    """Split hosts into `parts` lists, every host of one IP in the same list.
+
+    The list an IP lands in is stable across calls, so a probe worker keeps
+    seeing the same backends (its per-IP cap and circuit breakers stay
+    accurate). Hosts without a known address are spread by name.
+    """
+    partitioned: List[List[str]] = [[] for _ in range(parts)]
+    for host in hosts:
+        key = primary_address(addresses, host) or host
+        partitioned[zlib.crc32(key.encode()) % parts].append(host)
+    return partitioned
+
+
+class IpStats:
+    """Per-IP request counters for one probe run (thread-safe)."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._lock = Lock()
+        self._requests = collections.Counter()
+        self._errors = collections.Counter()
+        self._hosts: Dict[str, set] = collections.defaultdict(set)
+
+    def record(self, ip: Optional[str], host: str, ok: bool) -> None:
+        key = ip or "unresolved"
+        with self._lock:
+            self._requests[key] += 1
+            if not ok:
+                self._errors[key] += 1
+            self._hosts[key].add(host)
+
+    def export(self) -> Dict[str, Dict[str, Any]]:
+        """Raw counters, picklable, for `merge()` into another process's stats."""
+        with self._lock:
+            return {
+                ip: {"requests": count, "errors": self._errors[ip], "hosts": sorted(self._hosts[ip])}
+                for ip, count in self._requests.items()
+            }
+
+    def merge(self, exported: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            for ip, counts in exported.items():
+                self._requests[ip] += counts["requests"]
+                self._errors[ip] += counts["errors"]
+                self._hosts[ip].update(counts["hosts"])
+
+    def summary(self, top: int = 10) -> List[Dict[str, Any]]:
+        """The `top` busiest IPs: requests, errors, distinct hosts and requests/second over the run."""
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        with self._lock:
+            return [
+                {
+                    "ip": ip,
+                    "requests": count,
+                    "errors": self._errors[ip],
+                    "hosts": len(self._hosts[ip]),
+                    "rps": round(count / elapsed, 2),
+                }
+                for ip, count in self._requests.most_common(top)
+            ]
+
+
+class PreResolvedResolver(AbstractResolver):
+    """aiohttp resolver answering from the probe run's DNS stage.
+
+    Hosts resolved beforehand are connected to without another lookup; the
+    rest fall back to aiohttp's default resolver.
+    """
+
+    def __init__(self, addresses: Dict[str, List[str]]):
+        self.addresses = addresses
+        self._fallback = DefaultResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict[str, Any]]:
+        hosts = []
+        for address in self.addresses.get(host) or []:
+            addr_family = socket.AF_INET6 if ipaddress.ip_address(address).version == 6 else socket.AF_INET
+            if family not in (socket.AF_UNSPEC, addr_family):
+                continue
+            hosts.append({
+                "hostname": host,
+                "host": address,
+                "port": port,
+                "family": addr_family,
+                "proto": 0,
+                "flags": socket.AI_NUMERICHOST | socket.AI_NUMERICSERV,
+            })
+        if hosts:
+            return hosts
+        return await self._fallback.resolve(host, port, family)
+
+    async def close(self) -> None:
+        await self._fallback.close()
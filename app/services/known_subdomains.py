@@ -0,0 +1,104 @@
+import collections
+from threading import Lock
+from typing import Dict, Iterable, Iterator
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.models.subdomains_master import MasterSubdomains
+from app.utils.log import app_logger
+
+
+class KnownSubdomains:
+    """Snapshot of the names already in `subdomains_master` for one root domain.
+
+    Loaded once per scan and shared by every provider so rows that would not
+    change anything are never sent to the database. Each name maps to a small
+    bitmask of the sources already credited for it, so a name is skipped for a
+    provider only when that provider is already attributed (a new source
+    attribution is still written). Membership is exact.
+
+    Also counts skipped and written rows per source for the scan report.
+    Safe to share between threads.
+    """
+
+    LOAD_BATCH_SIZE = 10000
+
+    def __init__(self, root_domain: str):
+        self.root = root_domain.strip().lower()
+        self._names: Dict[str, int] = {}
+        self._bits: Dict[str, int] = {}
+        self._lock = Lock()
+        self.skipped = collections.Counter()
+        self.written = collections.Counter()
+
+    @classmethod
+    def load(cls, db: Session, root_domain: str) -> "KnownSubdomains":
+        known = cls(root_domain)
+        column = MasterSubdomains.subdomain
+        stmt = (
+            select(column, MasterSubdomains.sources)
+            .where(or_(column == known.root, column.like(f'%.{known.root}')))
+            .execution_options(yield_per=cls.LOAD_BATCH_SIZE)
+        )
+        try:
+            for subdomain, sources in db.execute(stmt):
+                known._names[subdomain] = known._mask(sources or [])
+        except Exception as e:
+            db.rollback()
+            app_logger.error(f"known: could not preload subdomains for {known.root}: {e}")
+            # an empty snapshot only disables skipping
+            known._names.clear()
+        app_logger.info(f"known: preloaded {len(known._names)} subdomains for {known.root}")
+        return known
+
+    def _bit(self, source: str) -> int:
+        bit = self._bits.get(source)
+        if bit is None:
+            bit = self._bits[source] = 1 << len(self._bits)
+        return bit
+
+    def _mask(self, sources: Iterable[str]) -> int:
+        mask = 0
+        for source in sources:
+            mask |= self._bit(source)
+        return mask
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def is_known(self, subdomain: str, source: str) -> bool:
+        """True when `subdomain` is already in master credited to `source`."""
+        bit = self._bits.get(source)
+        return bit is not None and bool(self._names.get(subdomain, 0) & bit)
+
+    def should_write(self, subdomain: str, source: str) -> bool:
+        """`not is_known(...)`, counting the skip."""
+        if self.is_known(subdomain, source):
+            with self._lock:
+                self.skipped[source] += 1
+            return False
+        return True
+
+    def filter_rows(self, rows: Iterable[dict], source: str) -> Iterator[dict]:
+        """Yield only the rows that still need to be written for `source`."""
+        skipped = 0
+        try:
+            for row in rows:
+                if self.is_known(row['subdomain'], source):
+                    skipped += 1
+                    continue
+                yield row
+        finally:
+            with self._lock:
+                self.skipped[source] += skipped
+
+    def record_written(self, source: str, count: int) -> None:
+        with self._lock:
+            self.written[source] += count
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """`{source: {'written': n, 'skipped': m}}` for every source seen this scan."""
+        with self._lock:
+            sources = set(self.skipped) | set(self.written)
+            return {s: {'written': self.written[s], 'skipped': self.skipped[s]} for s in sorted(sources)}
@@ -0,0 +1,100 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.crtsh_subdomain import CrtshSubdomain
+from app.models.otx_subdomains import OtxSubdomain
+from app.models.probe_tls_subdomain import ProbeTlsSubdomain
+from app.models.shodan_subdomain import ShodanSubdomain
+from app.models.virus_total_subdomain import VirusTotalSubdomain
+from app.utils.log import app_logger
+
+
+# source tag stored in `subdomains_master.sources` -> provider table
+PROVIDER_TABLES = {
+    'crtsh': CrtshSubdomain.__tablename__,
+    'otx': OtxSubdomain.__tablename__,
+    'probe_tls': ProbeTlsSubdomain.__tablename__,
+    'shodan': ShodanSubdomain.__tablename__,
+    'virustotal': VirusTotalSubdomain.__tablename__,
+}
+
+
+class MasterReconciler:
+    """Consolidate provider tables into `subdomains_master` inside Postgres.
+
+    Behavior:
+    - One `INSERT ... SELECT ... ON CONFLICT DO UPDATE` per call, driven by the
+      provider tables for a root domain (the root itself and `*.root`).
+    - `sources` becomes the de-duplicated union of the stored list and the
+      providers that currently hold the name, keeping the original order.
+    - `first_seen` is lowered to the earliest provider `detected_at`.
+    - Rows whose sources and first_seen would not change are not rewritten.
+
+    Because the provider tables are the source of truth, the merge is
+    idempotent: a failed run is repaired by the next one.
+    """
+
+    def __init__(self, providers: Optional[Iterable[str]] = None):
+        providers = list(providers) if providers is not None else list(PROVIDER_TABLES)
+        unknown = [p for p in providers if p not in PROVIDER_TABLES]
+        if unknown:
+            raise ValueError(f"unknown providers: {unknown}")
+        self.providers = providers
+
+    def _statement(self):
+        found = "\n            UNION ALL\n".join(
+            f"            SELECT subdomain, '{source}' AS source, detected_at FROM {PROVIDER_TABLES[source]}"
+            f" WHERE subdomain = :root OR subdomain LIKE :pattern"
+            for source in self.providers
+        )
+        return text(f"""
+        WITH found AS (
+{found}
+        ), merged AS (
+            SELECT subdomain, jsonb_agg(DISTINCT source) AS sources, MIN(detected_at) AS first_seen
+            FROM found
+            WHERE subdomain IS NOT NULL
+            GROUP BY subdomain
+        )
+        INSERT INTO subdomains_master (subdomain, sources, first_seen, created_at)
+        SELECT subdomain, sources::json, first_seen, LOCALTIMESTAMP
+        FROM merged
+        ON CONFLICT (subdomain) DO UPDATE SET
+            sources = (
+                SELECT json_agg(u.source ORDER BY u.pos)
+                FROM (
+                    SELECT t.source, MIN(t.pos) AS pos
+                    FROM jsonb_array_elements_text(
+                        subdomains_master.sources::jsonb || excluded.sources::jsonb
+                    ) WITH ORDINALITY AS t(source, pos)
+                    GROUP BY t.source
+                ) u
+            ),
+            first_seen = LEAST(subdomains_master.first_seen, excluded.first_seen)
+        WHERE NOT (subdomains_master.sources::jsonb @> excluded.sources::jsonb)
+           OR subdomains_master.first_seen IS DISTINCT FROM LEAST(subdomains_master.first_seen, excluded.first_seen)
+        """)
+
+    def reconcile(self, db: Session, root_domain: str) -> int:
+        """Merge provider rows for `root_domain` into the master table.
+
+        Returns the number of master rows inserted or updated (0 on error).
+        """
+        root = root_domain.strip().lower()
+        try:
+            result = db.execute(self._statement(), {'root': root, 'pattern': f'%.{root}'})
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            app_logger.error(f"master: reconciliation failed for {root}: {e}")
+            return 0
+
+        app_logger.info(f"master: reconciled {result.rowcount} subdomains for {root} from {', '.join(self.providers)}")
+        return result.rowcount
+
+
+def reconcile_master(db: Session, root_domain: str, providers: Optional[Iterable[str]] = None) -> int:
+    """Shortcut for `MasterReconciler(providers).reconcile(db, root_domain)`."""
+    return MasterReconciler(providers).reconcile(db, root_domain)
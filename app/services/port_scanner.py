@@ -0,0 +1,113 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from app.utils.log import app_logger
+from app.config.settings import settings
+
+
+def parse_ports(value: Optional[str]) -> List[int]:
+    """Parse `"8443,8080"` into `[8443, 8080]`, keeping order and dropping duplicates."""
+    ports = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if item and int(item) not in ports:
+            ports.append(int(item))
+    return ports
+
+
+def default_port(scheme: str, port: Optional[int]) -> int:
+    """The TCP port a probe target connects to (`None` means the scheme default)."""
+    if port is not None:
+        return port
+    return 443 if scheme == "https" else 80
+
+
+class PortScanner:
+    """Non-blocking TCP connect sweep over (host, port) pairs before HTTP probing.
+
+    A port counts as open when the TCP handshake completes within `timeout`;
+    the connection is closed right away. Hosts are connected through their
+    pre-resolved addresses when given, so the sweep does not go back to the
+    system resolver for every pair; ports closed on the first address are
+    tried on the next ones, as the HTTP clients fall back to them too.
+    """
+
+    def __init__(
+        self,
+        ports: Iterable[int],
+        timeout: Optional[float] = None,
+        concurrency: Optional[int] = None,
+    ):
+        self.ports = list(dict.fromkeys(ports))
+        self.timeout = timeout or settings.PROBER_CONNECT_TIMEOUT
+        self.concurrency = concurrency or settings.PROBER_PORT_SCAN_CONCURRENCY
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _connect(self, address: str, port: int) -> bool:
+        async with self._semaphore:
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                return False
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return True
+
+    async def scan(self, host: str, addresses: Optional[List[str]] = None) -> List[int]:
+        """Return the ports of `self.ports` accepting connections on `host`, in sweep order.
+
+        A port counts as open when any of `addresses` (tried in order, only
+        for the ports still closed) or, without addresses, the name accepts it.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        closed = list(self.ports)
+        for target in addresses or [host]:
+            opened = await asyncio.gather(*(self._connect(target, port) for port in closed))
+            closed = [port for port, is_open in zip(closed, opened) if not is_open]
+            if not closed:
+                break
+        return [port for port in self.ports if port not in closed]
+
+    async def scan_many(self, hosts: Iterable[str], addresses: Optional[Dict[str, List[str]]] = None) -> Dict[str, List[int]]:
+        """Sweep every host; returns `{host: open_ports}`.
+
+        Keeps a bounded window of host tasks so large host lists do not create
+        one coroutine per (host, port) pair up front.
+        """
+        addresses = addresses or {}
+        window = max(1, self.concurrency // max(1, len(self.ports))) * 2
+        pending = iter(dict.fromkeys(hosts))
+        in_flight = {}
+        swept: Dict[str, List[int]] = {}
+        try:
+            while True:
+                for host in pending:
+                    in_flight[asyncio.ensure_future(self.scan(host, addresses.get(host)))] = host
+                    if len(in_flight) >= window:
+                        break
+                if not in_flight:
+                    break
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    swept[in_flight.pop(task)] = task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+        app_logger.info(
+            "port_scan.finished",
+            hosts=len(swept),
+            ports=len(self.ports),
+            hosts_with_open_ports=sum(1 for p in swept.values() if p),
+        )
+        return swept
+
+
+def sweep(hosts: Iterable[str], ports: Iterable[int], addresses: Optional[Dict[str, List[str]]] = None, **kwargs) -> Dict[str, List[int]]:
+    """Synchronous entry point: sweep `hosts` x `ports` in a fresh event loop."""
+    return asyncio.run(PortScanner(ports, **kwargs).scan_many(hosts, addresses))
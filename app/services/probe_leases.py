@@ -0,0 +1,100 @@
+import os
+import socket
+from typing import Iterator, List, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.models.subdomains_master import MasterSubdomains
+from app.utils.log import app_logger
+
+
+def default_worker_id() -> str:
+    return settings.PROBER_WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ProbeLeaseManager:
+    """Claims due subdomains for one probe worker so several workers can share a database.
+
+    Behavior:
+    - `claim()` picks due rows (`next_probe_at` passed or never probed, no
+      live lease) in priority order with `FOR UPDATE SKIP LOCKED`, so
+      concurrent workers never wait on or claim the same rows, and stamps
+      them with this worker's id and a lease expiry in the same statement.
+    - Leases are cleared by `ProbeResultWriter` (given this worker's id) in
+      the transaction that stores the row's result. Rows whose worker crashed
+      become claimable again once `PROBER_LEASE_SECONDS` have passed.
+    - Lease times, like `next_probe_at`, use the database clock, so workers
+      on different machines agree on expiry and on what is due.
+    - Uses short sessions of its own.
+    """
+
+    def __init__(self, db: Session, worker_id: Optional[str] = None, lease_seconds: Optional[int] = None):
+        self.bind = db.get_bind()
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds or settings.PROBER_LEASE_SECONDS
+        self.claimed = 0
+
+    def claim(self, batch_size: int) -> List[str]:
+        """Lease up to `batch_size` due subdomains; returns their names."""
+        table = MasterSubdomains.__table__
+        now = func.localtimestamp()
+        due = (
+            select(table.c.id)
+            .where(or_(table.c.next_probe_at.is_(None), table.c.next_probe_at <= now))
+            .where(or_(table.c.lease_expires_at.is_(None), table.c.lease_expires_at < now))
+            .order_by(table.c.next_probe_at.asc().nulls_first())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .cte("due")
+        )
+        stmt = (
+            update(table)
+            .where(table.c.id == due.c.id)
+            .values(
+                lease_owner=self.worker_id,
+                lease_expires_at=now + func.make_interval(0, 0, 0, 0, 0, 0, self.lease_seconds),
+            )
+            .returning(table.c.subdomain)
+        )
+        with Session(bind=self.bind) as session:
+            try:
+                names = list(session.execute(stmt).scalars())
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                app_logger.error("probe_lease.claim_error", worker=self.worker_id, error=str(e))
+                return []
+        self.claimed += len(names)
+        app_logger.debug("probe_lease.claimed", worker=self.worker_id, count=len(names))
+        return names
+
+    def iter_claims(self, batch_size: int, limit: Optional[int] = None) -> Iterator[List[str]]:
+        """Claim batches until nothing is due or `limit` rows were claimed."""
+        while limit is None or self.claimed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - self.claimed)
+            names = self.claim(size)
+            if not names:
+                return
+            yield names
+
+    def release(self) -> int:
+        """Drop the leases this worker still holds (rows it claimed but did not finish)."""
+        table = MasterSubdomains.__table__
+        stmt = (
+            update(table)
+            .where(table.c.lease_owner == self.worker_id)
+            .values(lease_owner=None, lease_expires_at=None)
+        )
+        with Session(bind=self.bind) as session:
+            try:
+                released = session.execute(stmt).rowcount
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                app_logger.error("probe_lease.release_error", worker=self.worker_id, error=str(e))
+                return 0
+        if released:
+            app_logger.info("probe_lease.released", worker=self.worker_id, count=released)
+        return released
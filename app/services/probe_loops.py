@@ -0,0 +1,322 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from app.clients.base_http_client import BaseHTTPClient
+from app.config.settings import settings
+from app.services.async_prober import AsyncProberService
+from app.services.ip_groups import IpStats, interleave_by_ip, primary_address
+from app.services.probe_retry import RetryScheduler
+from app.services.prober_service import ProberService
+from app.utils.log import app_logger
+
+
+class ChunkTracker:
+    """Completion of chunks whose items settle out of order; callbacks run in chunk order.
+
+    `add(count, on_done)` registers a chunk of `count` items and returns its
+    tag, `settle(tag)` marks one of them done. A chunk's `on_done` runs once
+    it and every chunk added before it are complete, so a checkpoint never
+    passes a chunk that still has hosts in progress or waiting for a retry.
+    """
+
+    def __init__(self):
+        self._remaining: Dict[int, int] = {}
+        self._order: Deque[Tuple[int, Optional[Callable[[], None]]]] = deque()
+        self._next = 0
+
+    def __len__(self) -> int:
+        """Chunks not completed yet (or waiting for an earlier one)."""
+        return len(self._order)
+
+    def add(self, count: int, on_done: Optional[Callable[[], None]] = None) -> int:
+        tag = self._next
+        self._next += 1
+        self._remaining[tag] = count
+        self._order.append((tag, on_done))
+        self._release()
+        return tag
+
+    def settle(self, tag: int, count: int = 1) -> None:
+        self._remaining[tag] -= count
+        self._release()
+
+    def _release(self) -> None:
+        while self._order and self._remaining[self._order[0][0]] <= 0:
+            tag, on_done = self._order.popleft()
+            del self._remaining[tag]
+            if on_done is not None:
+                on_done()
+
+
+class ThreadedProbeLoop:
+    """Threaded probing for a whole run: one thread pool and one `ProberService` for every chunk.
+
+    - One bounded window (two hosts per worker) spans the run: `probe()` adds
+      a chunk's hosts, interleaved by resolved IP so the per-IP cap does not
+      idle workers, and returns once the last of them is started. Its
+      `on_done` runs when every host of the chunk (and of the chunks before
+      it) is settled.
+    - Rate-limited and transiently failing hosts wait in `retries` (the run's
+      `RetryScheduler`) and go back into the window once due, next to the
+      following chunks' hosts. Only `drain()`, when the run has no fresh
+      hosts left, sleeps on the delay queue; `wait(future)` keeps probing
+      until a future (the next chunk being prepared) is done.
+    - Settled results go to `sink`. The pool, the prober and its HTTP client
+      live until `close()`.
+    - Not thread-safe: every method is called from one thread.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[dict], None],
+        max_workers: Optional[int] = None,
+        http_client: Optional[object] = None,
+        ports: Optional[List[int]] = None,
+        ip_stats: Optional[IpStats] = None,
+        retries: Optional[RetryScheduler] = None,
+    ):
+        self.sink = sink
+        self.max_workers = max_workers or settings.PROBER_MAX_WORKERS
+        # if no http_client passed, create a default BaseHTTPClient instance
+        if http_client is None:
+            # BaseHTTPClient requires a base_url; we pass empty string because
+            # ProberService uses full URLs when calling client's session.request.
+            http_client = BaseHTTPClient(base_url="", timeout=settings.PROBER_TIMEOUT, max_retries=settings.PROBER_MAX_RETRIES, retry_delay=settings.PROBER_RETRY_DELAY)
+        self.prober = ProberService(timeout=settings.PROBER_TIMEOUT, http_client=http_client, ports=ports, ip_stats=ip_stats)
+        # rate-limited and transiently failing hosts wait in the delay queue, not in a worker
+        self.retries = retries if retries is not None else RetryScheduler()
+        # keep at most two probes per worker queued
+        self.window = self.max_workers * 2
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="probe")
+        self._chunks = ChunkTracker()
+        self._fresh: Deque[str] = deque()
+        self._in_flight: Dict[Future, str] = {}
+        # per host until it is settled: its chunk and its open ports from the sweep
+        self._tags: Dict[str, int] = {}
+        self._open_ports: Dict[str, List[int]] = {}
+
+    def probe(
+        self,
+        subdomains: List[str],
+        open_ports: Optional[Dict[str, List[int]]] = None,
+        addresses: Optional[Dict[str, List[str]]] = None,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Add a chunk to the window; returns once every host of it is started (not settled)."""
+        if addresses:
+            # the prober groups requests by IP; entries are dropped as hosts settle
+            self.prober.addresses.update(addresses)
+            # spread hosts sharing a backend through the window
+            subdomains = interleave_by_ip(subdomains, addresses)
+        tag = self._chunks.add(len(subdomains), on_done)
+        for sd in subdomains:
+            self._tags[sd] = tag
+            if open_ports is not None and sd in open_ports:
+                self._open_ports[sd] = open_ports[sd]
+        self._fresh.extend(subdomains)
+        self._run(lambda: not self._fresh)
+
+    def wait(self, future: Future) -> None:
+        """Keep probing (and retrying) until `future` is done."""
+        self._run(future.done, future)
+
+    def drain(self) -> None:
+        """Probe until every host is settled, waiting out the delay queue."""
+        self._run(lambda: not self._chunks)
+
+    def _run(self, done: Callable[[], bool], future: Optional[Future] = None) -> None:
+        retries = self.retries
+        while True:
+            for sd in retries.due():
+                self._submit(sd)
+            while self._fresh and len(self._in_flight) < self.window:
+                self._submit(self._fresh.popleft())
+            if done():
+                return
+            waiting = set(self._in_flight)
+            if future is not None:
+                waiting.add(future)
+            delay = retries.next_due_in()
+            if not waiting:
+                if delay is None:
+                    return
+                # nothing to probe until the next retry is due
+                time.sleep(delay)
+                continue
+            wait(waiting, timeout=delay, return_when=FIRST_COMPLETED)
+            self._collect()
+
+    def _submit(self, sd: str) -> None:
+        blocked = self.retries.admit(sd, primary_address(self.prober.addresses, sd))
+        if blocked is not None:
+            self._settled(sd, blocked)
+            return
+        self._in_flight[self._executor.submit(self.prober.probe, sd, self._open_ports.get(sd))] = sd
+
+    def _collect(self) -> None:
+        for fut in [fut for fut in self._in_flight if fut.done()]:
+            sd = self._in_flight.pop(fut)
+            try:
+                res = fut.result()
+            except Exception as e:
+                app_logger.error("probe_master.worker_error", subdomain=sd, error=str(e))
+                res = None
+            if res is not None:
+                res = self.retries.settle(res, primary_address(self.prober.addresses, sd))
+                if res is None:
+                    # queued for a retry
+                    continue
+            self._settled(sd, res)
+
+    def _settled(self, sd: str, res: Optional[dict]) -> None:
+        if res is not None:
+            self.sink(res)
+        self.prober.addresses.pop(sd, None)
+        self._open_ports.pop(sd, None)
+        tag = self._tags.pop(sd, None)
+        if tag is not None:
+            self._chunks.settle(tag)
+
+    def close(self, terminate: bool = False) -> None:
+        """Stop the pool (`terminate` drops queued probes instead of waiting for them)."""
+        self._executor.shutdown(wait=True, cancel_futures=terminate)
+        self.prober.close()
+
+
+class AsyncProbeLoop:
+    """Asyncio probing for a whole run: one event loop and one `AsyncProberService` for every chunk.
+
+    Same contract as `ThreadedProbeLoop` (`probe()` / `wait()` / `drain()`,
+    one window across chunks, retries carried into later chunks) with host
+    tasks on an event loop owned by this object. The loop only runs inside
+    those calls, so the caller keeps its own work between them short. The
+    prober's connection pool is kept until `close()`. Called from one thread.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[dict], None],
+        ports: Optional[List[int]] = None,
+        ip_stats: Optional[IpStats] = None,
+        retries: Optional[RetryScheduler] = None,
+    ):
+        self.sink = sink
+        self.retries = retries if retries is not None else RetryScheduler()
+        self.loop = asyncio.new_event_loop()
+        self.prober = AsyncProberService(
+            timeout=settings.PROBER_TIMEOUT,
+            ports=ports,
+            concurrency=settings.PROBER_ASYNC_CONCURRENCY,
+            max_retries=settings.PROBER_MAX_RETRIES,
+            retry_delay=settings.PROBER_RETRY_DELAY,
+            ip_stats=ip_stats,
+        )
+        self.loop.run_until_complete(self.prober.start())
+        # at most two hosts per request slot in progress
+        self.window = self.prober.concurrency * 2
+        self._chunks = ChunkTracker()
+        self._fresh: Deque[str] = deque()
+        self._in_flight: Dict[asyncio.Task, str] = {}
+        self._tags: Dict[str, int] = {}
+        self._open_ports: Dict[str, List[int]] = {}
+
+    def probe(
+        self,
+        subdomains: List[str],
+        open_ports: Optional[Dict[str, List[int]]] = None,
+        addresses: Optional[Dict[str, List[str]]] = None,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Add a chunk to the window; returns once every host of it is started (not settled)."""
+        if addresses:
+            # also what the connector connects to; entries are dropped as hosts settle
+            self.prober.addresses.update(addresses)
+            subdomains = interleave_by_ip(subdomains, addresses)
+        tag = self._chunks.add(len(subdomains), on_done)
+        for sd in subdomains:
+            self._tags[sd] = tag
+            if open_ports is not None and sd in open_ports:
+                self._open_ports[sd] = open_ports[sd]
+        self._fresh.extend(subdomains)
+        self.loop.run_until_complete(self._run(lambda: not self._fresh))
+
+    def wait(self, future: Future) -> None:
+        """Keep probing (and retrying) until `future` is done."""
+        self.loop.run_until_complete(self._wait(future))
+
+    def drain(self) -> None:
+        """Probe until every host is settled, waiting out the delay queue."""
+        self.loop.run_until_complete(self._run(lambda: not self._chunks))
+
+    async def _wait(self, future: Future) -> None:
+        await self._run(future.done, asyncio.wrap_future(future))
+
+    async def _run(self, done: Callable[[], bool], future: Optional[asyncio.Future] = None) -> None:
+        retries = self.retries
+        while True:
+            for sd in retries.due():
+                self._launch(sd)
+            while self._fresh and len(self._in_flight) < self.window:
+                self._launch(self._fresh.popleft())
+            if done():
+                return
+            waiting = set(self._in_flight)
+            if future is not None:
+                waiting.add(future)
+            delay = retries.next_due_in()
+            if not waiting:
+                if delay is None:
+                    return
+                # nothing to probe until the next retry is due
+                await asyncio.sleep(delay)
+                continue
+            await asyncio.wait(waiting, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            self._collect()
+
+    def _launch(self, sd: str) -> None:
+        blocked = self.retries.admit(sd, primary_address(self.prober.addresses, sd))
+        if blocked is not None:
+            self._settled(sd, blocked)
+            return
+        self._in_flight[self.loop.create_task(self.prober.probe(sd, self._open_ports.get(sd)))] = sd
+
+    def _collect(self) -> None:
+        for task in [task for task in self._in_flight if task.done()]:
+            sd = self._in_flight.pop(task)
+            try:
+                res = task.result()
+            except Exception as e:
+                app_logger.error("probe_master.worker_error", subdomain=sd, error=str(e))
+                res = None
+            if res is not None:
+                res = self.retries.settle(res, primary_address(self.prober.addresses, sd))
+                if res is None:
+                    # queued for a retry
+                    continue
+            self._settled(sd, res)
+
+    def _settled(self, sd: str, res: Optional[dict]) -> None:
+        if res is not None:
+            self.sink(res)
+        self.prober.addresses.pop(sd, None)
+        self._open_ports.pop(sd, None)
+        tag = self._tags.pop(sd, None)
+        if tag is not None:
+            self._chunks.settle(tag)
+
+    def close(self, terminate: bool = False) -> None:
+        """Cancel what is still in progress, then close the prober's connections and the loop."""
+        if self.loop.is_closed():
+            return
+        try:
+            if self._in_flight:
+                for task in self._in_flight:
+                    task.cancel()
+                self.loop.run_until_complete(asyncio.gather(*self._in_flight, return_exceptions=True))
+                self._in_flight.clear()
+            self.loop.run_until_complete(self.prober.close())
+        finally:
+            self.loop.close()
@@ -0,0 +1,240 @@
+import multiprocessing
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from app.config.settings import settings
+from app.services.ip_groups import IpStats, partition_by_ip
+from app.services.probe_loops import AsyncProbeLoop, ChunkTracker, ThreadedProbeLoop
+from app.services.probe_retry import RetryScheduler
+from app.utils.log import app_logger
+
+
+# messages from the worker processes: (kind, worker index, payload)
+_RESULTS = "results"
+_DONE = "done"
+_ERROR = "error"
+_STATS = "stats"
+
+# results are sent back in small batches instead of one message per host
+_SEND_BATCH = 64
+
+# chunks handed to the workers and not finished yet before `probe()` waits
+_CHUNKS_AHEAD = 2
+
+# seconds between checks of a future while waiting for results
+_POLL_INTERVAL = 0.05
+
+
+class ProbeProcessPool:
+    """Probe chunks across worker processes, with results collected in this one.
+
+    One process saturates a core on TLS handshakes and response parsing long
+    before the network is busy; this pool spreads that work:
+
+    - `processes` worker processes (default `PROBER_PROCESSES`) are started
+      once per probe run; each keeps one probe loop for the run (`engine`,
+      default `PROBER_PROCESS_ENGINE`: `ThreadedProbeLoop` with `max_workers`
+      threads or `AsyncProbeLoop`), with its own `IpStats` and `RetryScheduler`.
+    - `probe()` splits a chunk by resolved IP (`partition_by_ip`): every host
+      of an IP goes to the same worker, run after run, so per-IP caps and
+      circuit breakers hold across the pool. Workers take the next chunk while
+      hosts of the previous one wait for a retry; `probe()` returns once at
+      most `_CHUNKS_AHEAD` chunks are unfinished, and a chunk's `on_done` runs
+      when every worker is done with its part (in chunk order). `wait()` and
+      `drain()` behave as on the probe loops. Results are handed to `sink` in
+      this process as they arrive, so a single `ProbeResultWriter` stores
+      them and collects the run's new alive hosts.
+    - DNS and the port sweep stay in the caller; the worker processes never
+      touch the database.
+    - `close()` stops the workers and merges their per-IP counters into
+      `ip_stats` and their retry counters into `retry_stats`. A failing or
+      dead worker aborts the run with a RuntimeError.
+
+    Workers are spawned (not forked), so they do not inherit the caller's
+    threads, locks or database connections.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[dict], None],
+        processes: Optional[int] = None,
+        engine: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        ports: Optional[List[int]] = None,
+        ip_stats: Optional[IpStats] = None,
+    ):
+        self.sink = sink
+        self.processes = max(1, processes or settings.PROBER_PROCESSES)
+        self.engine = (engine or settings.PROBER_PROCESS_ENGINE).lower()
+        self.max_workers = max_workers or settings.PROBER_MAX_WORKERS
+        self.ports = ports
+        self.ip_stats = ip_stats if ip_stats is not None else IpStats()
+        self.retry_stats: Dict[str, int] = {}
+        ctx = multiprocessing.get_context("spawn")
+        self._results = ctx.Queue()
+        self._tasks = [ctx.Queue() for _ in range(self.processes)]
+        self._workers = [
+            ctx.Process(
+                target=_worker_main,
+                args=(index, self.engine, self.max_workers, self.ports, self._tasks[index], self._results),
+                name=f"probe-worker-{index}",
+                daemon=True,
+            )
+            for index in range(self.processes)
+        ]
+        self._chunks = ChunkTracker()
+        self._errors: List[str] = []
+        self._started = False
+
+    def __enter__(self) -> "ProbeProcessPool":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(terminate=exc_type is not None)
+
+    def start(self) -> None:
+        if self._started:
+            return
+        for worker in self._workers:
+            worker.start()
+        self._started = True
+        app_logger.info("probe_processes.started", processes=self.processes, engine=self.engine, max_workers=self.max_workers)
+
+    def probe(
+        self,
+        subdomains: List[str],
+        open_ports: Optional[Dict[str, List[int]]],
+        addresses: Optional[Dict[str, List[str]]],
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.start()
+        addresses = addresses or {}
+        parts = [(index, part) for index, part in enumerate(partition_by_ip(subdomains, addresses, self.processes)) if part]
+        tag = self._chunks.add(len(parts), on_done)
+        for index, part in parts:
+            part_ports = {sd: open_ports[sd] for sd in part if sd in open_ports} if open_ports is not None else None
+            part_addresses = {sd: addresses[sd] for sd in part if sd in addresses}
+            self._tasks[index].put((part, part_ports, part_addresses, tag))
+        while len(self._chunks) > _CHUNKS_AHEAD:
+            self._handle(self._get())
+
+    def wait(self, future: Future) -> None:
+        """Collect results until `future` is done."""
+        while not future.done():
+            message = self._get(timeout=_POLL_INTERVAL)
+            if message is not None:
+                self._handle(message)
+
+    def drain(self) -> None:
+        """Collect results until every chunk is finished."""
+        while self._chunks:
+            self._handle(self._get())
+
+    def _handle(self, message) -> None:
+        kind, index, payload = message
+        if kind == _RESULTS:
+            for res in payload:
+                self.sink(res)
+        elif kind == _ERROR:
+            app_logger.error("probe_processes.worker_error", worker=index, error=payload)
+            self._errors.append(payload)
+        elif kind == _DONE:
+            self._chunks.settle(payload)
+        if self._errors:
+            raise RuntimeError(f"probe worker failed: {self._errors[0]}")
+
+    def close(self, terminate: bool = False) -> None:
+        """Finish the chunks handed out, stop the workers and merge their stats (`terminate` skips both waits)."""
+        if not self._started:
+            return
+        if not terminate:
+            self.drain()
+        self._started = False
+        if terminate:
+            for worker in self._workers:
+                worker.terminate()
+            for worker in self._workers:
+                worker.join()
+            return
+
+        for tasks in self._tasks:
+            tasks.put(None)
+        pending = set(range(self.processes))
+        try:
+            while pending:
+                kind, index, payload = self._get(allow_exit=True)
+                if kind == _STATS:
+                    exported, retry_stats = payload
+                    self.ip_stats.merge(exported)
+                    for key, value in retry_stats.items():
+                        self.retry_stats[key] = self.retry_stats.get(key, 0) + value
+                    pending.discard(index)
+        finally:
+            for worker in self._workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+                    worker.join()
+
+    def _get(self, allow_exit: bool = False, timeout: Optional[float] = None):
+        """Next message from the workers; with `timeout`, None if none arrived by then."""
+        while True:
+            try:
+                return self._results.get(timeout=1.0 if timeout is None else timeout)
+            except queue.Empty:
+                for worker in self._workers:
+                    if worker.exitcode is not None and (worker.exitcode != 0 or not allow_exit):
+                        raise RuntimeError(f"{worker.name} exited with code {worker.exitcode}")
+                if allow_exit and all(worker.exitcode is not None for worker in self._workers):
+                    raise RuntimeError("probe workers exited without reporting their stats")
+                if timeout is not None:
+                    return None
+
+
+def _worker_main(index: int, engine: str, max_workers: int, ports: Optional[List[int]], tasks, results) -> None:
+    ip_stats = IpStats()
+    retries = RetryScheduler()
+    batch: List[dict] = []
+
+    def flush() -> None:
+        if batch:
+            results.put((_RESULTS, index, list(batch)))
+            batch.clear()
+
+    def sink(res: dict) -> None:
+        batch.append(res)
+        if len(batch) >= _SEND_BATCH:
+            flush()
+
+    def done(tag: int) -> None:
+        flush()
+        results.put((_DONE, index, tag))
+
+    # one probe loop (thread pool or event loop, and its connections) for the whole run
+    if engine == "async":
+        loop = AsyncProbeLoop(sink, ports=ports, ip_stats=ip_stats, retries=retries)
+    else:
+        loop = ThreadedProbeLoop(sink, max_workers=max_workers, ports=ports, ip_stats=ip_stats, retries=retries)
+    try:
+        # the next task is read in the background: hosts waiting for a retry keep being probed meanwhile
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="probe-tasks") as reader:
+            while True:
+                upcoming = reader.submit(tasks.get)
+                loop.wait(upcoming)
+                task = upcoming.result()
+                if task is None:
+                    break
+                subdomains, open_ports, addresses, tag = task
+                try:
+                    loop.probe(subdomains, open_ports, addresses, on_done=lambda tag=tag: done(tag))
+                except Exception as e:
+                    results.put((_ERROR, index, str(e) or type(e).__name__))
+                    done(tag)
+        loop.drain()
+        flush()
+    finally:
+        loop.close()
+
+    results.put((_STATS, index, (ip_stats.export(), retries.stats())))
@@ -0,0 +1,97 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.probe_retry import RATE_LIMITED, TRANSIENT, RetryLater
+
+
+class TargetRace:
+    """Bookkeeping for racing one host's scheme/port targets, happy-eyeballs style.
+
+    Targets are indexed in preference order (default https, default http,
+    then the extra ports). The caller launches them through `should_launch()`,
+    one every `stagger` seconds or right away when everything launched so far
+    has failed, and feeds each outcome to `record()`:
+
+    - `winner()` is the most preferred target that answered once every more
+      preferred target has failed, or the best answer so far once `grace`
+      seconds passed since the first answer; the caller then cancels the rest.
+    - No new targets are launched after the first answer.
+    - `finished()` is true when every target was launched and none is running.
+
+    `now` values are monotonic seconds from the caller's clock.
+    """
+
+    def __init__(self, count: int, stagger: float, grace: float):
+        self.count = count
+        self.stagger = stagger
+        self.grace = grace
+        self.launched = 0
+        # index -> (answered, value): value is (status, info), a RetryLater, an exception or None
+        self.outcomes: Dict[int, Tuple[bool, Any]] = {}
+        self._next_launch = 0.0
+        self._deadline: Optional[float] = None
+
+    def _answered(self) -> List[int]:
+        return sorted(i for i, (answered, _) in self.outcomes.items() if answered)
+
+    def should_launch(self, running: int, now: float) -> bool:
+        if self.launched >= self.count or self._answered():
+            return False
+        return running == 0 or now >= self._next_launch
+
+    def launch(self, now: float) -> int:
+        """Account for launching the next target; returns its index."""
+        index = self.launched
+        self.launched += 1
+        self._next_launch = now + self.stagger
+        return index
+
+    def record(self, index: int, answered: bool, value: Any) -> None:
+        self.outcomes[index] = (answered, value)
+
+    def winner(self, now: float) -> Optional[int]:
+        answered = self._answered()
+        if not answered:
+            return None
+        best = answered[0]
+        if all(i in self.outcomes for i in range(best)):
+            return best
+        if self._deadline is None:
+            self._deadline = now + self.grace
+        return best if now >= self._deadline else None
+
+    def finished(self, running: int) -> bool:
+        return self.launched >= self.count and running == 0
+
+    def wait_timeout(self, now: float) -> Optional[float]:
+        """How long the caller may block waiting for an outcome before re-checking."""
+        waits = []
+        if self._deadline is not None:
+            waits.append(self._deadline - now)
+        elif self.launched < self.count:
+            waits.append(self._next_launch - now)
+        return max(0.0, min(waits)) if waits else None
+
+
+def race_result(subdomain: str, probed_at: datetime, open_ports: Optional[List[int]], race: TargetRace, won: Optional[int]) -> Dict:
+    """Turn a finished race into the probe result dict, as the sequential walk would build it."""
+    if won is not None:
+        value = race.outcomes[won][1]
+        if isinstance(value, RetryLater):
+            return {"subdomain": subdomain, "is_alive": True, "probed_at": probed_at, "status_code": 429, "error": value.error, "open_ports": open_ports, "retry": RATE_LIMITED, "retry_after": value.retry_after}
+        status, info = value
+        return {"subdomain": subdomain, "is_alive": True, "probed_at": probed_at, "status_code": status, "error": None, "open_ports": open_ports, **(info or {})}
+
+    last_error = None
+    transient = False
+    for index in sorted(race.outcomes):
+        value = race.outcomes[index][1]
+        if isinstance(value, RetryLater):
+            last_error = value.error
+            transient = transient or value.reason == TRANSIENT
+        elif isinstance(value, BaseException):
+            last_error = str(value) or type(value).__name__
+    result = {"subdomain": subdomain, "is_alive": False, "probed_at": probed_at, "status_code": None, "error": last_error, "open_ports": open_ports}
+    if transient:
+        result.update(retry=TRANSIENT, retry_after=None)
+    return result
@@ -0,0 +1,161 @@
+import heapq
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from app.config.settings import settings
+from app.utils.log import app_logger
+
+
+# values of a probe result's "retry" key
+RATE_LIMITED = "rate_limited"
+TRANSIENT = "transient"
+
+
+class RetryLater(Exception):
+    """Raised inside a prober when a host should be probed again later instead of now."""
+
+    def __init__(self, reason: str, error: str, retry_after: Optional[float] = None):
+        super().__init__(error)
+        self.reason = reason
+        self.error = error
+        self.retry_after = retry_after
+
+
+class RetryScheduler:
+    """Delay queue for probes that hit a 429 or a transient network error.
+
+    Probers never sleep on a rate limit or back off inline: they hand back a
+    result carrying `retry` (`"rate_limited"` / `"transient"`) and an optional
+    `retry_after`, the worker moves on, and the run loop passes the result to
+    `settle()`:
+
+    - The host is queued with a not-before time (`Retry-After`, or
+      `base_delay * 2**attempt`) and handed out again by `due()`, up to
+      `max_attempts` times per host and `budget` times per run.
+    - Delays longer than `max_wait` are not waited for in the run: the result
+      is marked `deferred` and the writer stores the not-before time as the
+      row's `next_probe_at` without counting a failure.
+    - A per-IP circuit breaker opens after `breaker_threshold` consecutive
+      retryable failures on one IP (any successful probe resets it). While it
+      is open, `admit()` turns the IP's hosts into deferred results without
+      sending a request, for `breaker_cooldown` seconds.
+    - Once retries run out, the last result stands: a rate-limited host is
+      reported alive with status 429, a transient failure as not alive.
+
+    Methods are thread-safe; one scheduler is shared by a whole probe run.
+    """
+
+    def __init__(
+        self,
+        max_attempts: Optional[int] = None,
+        budget: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_wait: Optional[float] = None,
+        breaker_threshold: Optional[int] = None,
+        breaker_cooldown: Optional[float] = None,
+    ):
+        self.max_attempts = settings.PROBER_MAX_RETRIES if max_attempts is None else max_attempts
+        self.budget = settings.PROBER_RETRY_BUDGET if budget is None else budget
+        self.base_delay = settings.PROBER_RETRY_DELAY if base_delay is None else base_delay
+        self.max_wait = settings.PROBER_RETRY_MAX_WAIT if max_wait is None else max_wait
+        self.breaker_threshold = breaker_threshold or settings.PROBER_BREAKER_THRESHOLD
+        self.breaker_cooldown = settings.PROBER_BREAKER_COOLDOWN if breaker_cooldown is None else breaker_cooldown
+        self.retried = 0
+        self.deferred = 0
+        self.breaker_trips = 0
+        self._lock = Lock()
+        self._queue: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self._attempts: Dict[str, int] = {}
+        self._failures: Dict[str, int] = {}
+        self._open_until: Dict[str, float] = {}
+
+    def admit(self, host: str, ip: Optional[str]) -> Optional[dict]:
+        """None when `host` may be probed now, else a deferred result to store instead."""
+        key = ip or host
+        with self._lock:
+            remaining = self._open_until.get(key, 0.0) - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.deferred += 1
+        return _deferred_result(host, remaining, "circuit open")
+
+    def settle(self, result: dict, ip: Optional[str]) -> Optional[dict]:
+        """Record a probe result; returns the result to store, or None when the host was queued for a retry."""
+        host = result["subdomain"]
+        key = ip or host
+        reason = result.get("retry")
+        now = time.monotonic()
+        with self._lock:
+            if not reason:
+                if result.get("is_alive"):
+                    self._failures.pop(key, None)
+                self._attempts.pop(host, None)
+                return result
+
+            failures = self._failures[key] = self._failures.get(key, 0) + 1
+            if failures >= self.breaker_threshold and self._open_until.get(key, 0.0) <= now:
+                self._open_until[key] = now + self.breaker_cooldown
+                self.breaker_trips += 1
+                app_logger.info("probe_retry.breaker_open", key=key, failures=failures, cooldown=self.breaker_cooldown)
+
+            attempt = self._attempts.get(host, 0)
+            delay = result.get("retry_after")
+            if delay is None:
+                delay = self.base_delay * (2 ** attempt)
+            if self._open_until.get(key, 0.0) > now:
+                delay = max(delay, self._open_until[key] - now)
+
+            if attempt >= self.max_attempts or self.retried >= self.budget:
+                # out of retries: the last answer stands
+                self._attempts.pop(host, None)
+                return _final_result(result)
+            if delay > self.max_wait:
+                self._attempts.pop(host, None)
+                self.deferred += 1
+                return _deferred_result(host, delay, result.get("error"), result.get("status_code"))
+
+            self._attempts[host] = attempt + 1
+            self.retried += 1
+            self._seq += 1
+            heapq.heappush(self._queue, (now + delay, self._seq, host))
+        return None
+
+    def due(self) -> List[str]:
+        """Pop the queued hosts whose not-before time has passed."""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            while self._queue and self._queue[0][0] <= now:
+                ready.append(heapq.heappop(self._queue)[2])
+        return ready
+
+    def next_due_in(self) -> Optional[float]:
+        """Seconds until the next queued host is due (None when the queue is empty)."""
+        with self._lock:
+            if not self._queue:
+                return None
+            return max(0.0, self._queue[0][0] - time.monotonic())
+
+    def stats(self) -> Dict[str, int]:
+        return {"retried": self.retried, "deferred": self.deferred, "breaker_trips": self.breaker_trips, "queued": len(self._queue)}
+
+
+def _final_result(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k not in ("retry", "retry_after")}
+
+
+def _deferred_result(host: str, delay: float, error: Optional[str], status_code: Optional[int] = None) -> dict:
+    return {
+        "subdomain": host,
+        "is_alive": False,
+        "probed_at": datetime.now(),
+        "status_code": status_code,
+        "error": error,
+        "open_ports": None,
+        # stored as next_probe_at = probed_at + retry_after, without counting a failure
+        "deferred": True,
+        "retry_after": delay,
+    }
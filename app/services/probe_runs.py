@@ -0,0 +1,245 @@
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.models.probe_run import ProbeRun
+from app.models.probe_run_new_alive import ProbeRunNewAlive
+from app.utils.log import app_logger
+
+
+# run ids worked on by this process: never resumed by a second caller here
+_active_runs = set()
+_active_lock = threading.Lock()
+
+
+class ProbeRunStore:
+    """Checkpoints of `probe_master` runs in `probe_runs`, so an interrupted run resumes.
+
+    Behavior:
+    - Runs are owned by `hostname:pid`. `start(kind, limit)` resumes the
+      newest unfinished run of the same kind when it is not active in this
+      process and either has not been updated for `PROBER_RUN_STALE_SECONDS`
+      (its worker is gone) or was owned on this host by a process that no
+      longer exists (a restarted container); a live process on the same host
+      (another uvicorn worker, `probe_worker`) keeps its run. The run is taken
+      over with a conditional UPDATE so two callers never resume the same run.
+      Otherwise a new run is inserted.
+    - Progress is written by `ProbeResultWriter` in the same transaction as
+      the results it covers: counters on every flush, the id cursor once a
+      chunk is complete, and first-time-alive hosts appended to
+      `probe_run_new_alives` (the run's pending notification).
+    - `finish()` closes the run with an UPDATE guarded on its status; only the
+      caller that closes it sends the notification (`pending_new_alives()`),
+      after which `mark_notified()` stamps `notified_at` and clears the
+      pending rows.
+    - A finished run with no `notified_at` (the notifier failed, or the
+      process died before sending) is still owed its notification:
+      `unnotified()` lists the ones this process may take over (same rules as
+      for resuming) and `claim_notification()` takes one with a conditional
+      UPDATE, so it is sent by one caller only.
+    - Uses short sessions of its own.
+    """
+
+    def __init__(self, db: Session):
+        self.bind = db.get_bind()
+        self.host = socket.gethostname()
+        self.owner = f"{self.host}:{os.getpid()}"
+
+    def start(self, kind: str, limit: Optional[int] = None) -> Optional[ProbeRun]:
+        """Resume or create the run for `kind`; None if `probe_runs` cannot be used."""
+        try:
+            run = self._resume(kind) if settings.PROBER_RUN_RESUME else None
+            if run is None:
+                run = self._create(kind, limit)
+        except Exception as e:
+            app_logger.error("probe_run.start_error", kind=kind, error=str(e))
+            return None
+        with _active_lock:
+            _active_runs.add(run.id)
+        return run
+
+    def _candidates(self, session: Session, kind: Optional[str] = None, finished: bool = False) -> List[ProbeRun]:
+        stale_before = datetime.now() - timedelta(seconds=settings.PROBER_RUN_STALE_SECONDS)
+        q = (
+            select(ProbeRun)
+            .where(self._unnotified() if finished else ProbeRun.status == "running")
+            .where(or_(
+                ProbeRun.updated_at < stale_before,
+                ProbeRun.owner == self.host,
+                ProbeRun.owner.startswith(f"{self.host}:", autoescape=True),
+            ))
+            .order_by(ProbeRun.id.desc())
+        )
+        if kind is not None:
+            q = q.where(ProbeRun.kind == kind)
+        with _active_lock:
+            active = set(_active_runs)
+        return [
+            run for run in session.execute(q).scalars()
+            if run.id not in active and (run.updated_at < stale_before or self._owner_gone(run.owner))
+        ]
+
+    def _owner_gone(self, owner: Optional[str]) -> bool:
+        """True when `owner` (`hostname:pid` on this host) is this process or a process that no longer exists."""
+        if owner == self.owner:
+            # this process, not working on it (checked against `_active_runs`)
+            return True
+        _, _, pid = (owner or "").rpartition(":")
+        if not pid.isdigit():
+            # owners written before the pid was recorded
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            # exists, owned by another user
+            return False
+        except OSError:
+            return True
+        return False
+
+    @staticmethod
+    def _unnotified():
+        table = ProbeRun.__table__
+        return and_(table.c.status == "finished", table.c.notified_at.is_(None))
+
+    def _resume(self, kind: str) -> Optional[ProbeRun]:
+        table = ProbeRun.__table__
+        with Session(bind=self.bind, expire_on_commit=False) as session:
+            for run in self._candidates(session, kind):
+                taken = session.execute(
+                    update(table)
+                    .where(and_(table.c.id == run.id, table.c.status == "running", table.c.updated_at == run.updated_at))
+                    .values(owner=self.owner, updated_at=datetime.now())
+                ).rowcount
+                session.commit()
+                if taken:
+                    app_logger.info("probe_run.resumed", run_id=run.id, kind=kind, cursor=run.cursor, scanned=run.scanned, probed=run.probed)
+                    return run
+        return None
+
+    def _create(self, kind: str, limit: Optional[int]) -> ProbeRun:
+        with Session(bind=self.bind, expire_on_commit=False) as session:
+            run = ProbeRun(kind=kind, status="running", owner=self.owner, row_limit=limit)
+            session.add(run)
+            session.commit()
+        app_logger.info("probe_run.started", run_id=run.id, kind=kind)
+        return run
+
+    def interrupted(self) -> List[ProbeRun]:
+        """Unfinished runs this process could resume (see `start`)."""
+        try:
+            with Session(bind=self.bind, expire_on_commit=False) as session:
+                return self._candidates(session)
+        except Exception as e:
+            app_logger.error("probe_run.lookup_error", error=str(e))
+            return []
+
+    def unnotified(self) -> List[ProbeRun]:
+        """Finished runs whose notification was never sent and that this process could send."""
+        try:
+            with Session(bind=self.bind, expire_on_commit=False) as session:
+                return self._candidates(session, finished=True)
+        except Exception as e:
+            app_logger.error("probe_run.lookup_error", error=str(e))
+            return []
+
+    def claim_notification(self, run: ProbeRun) -> bool:
+        """Take over sending `run`'s notification; True only for the caller that got it.
+
+        The claim holds until `release()`: the run is not offered again in this
+        process, and other hosts wait `PROBER_RUN_STALE_SECONDS` for it.
+        """
+        table = ProbeRun.__table__
+        stmt = (
+            update(table)
+            .where(and_(table.c.id == run.id, self._unnotified(), table.c.updated_at == run.updated_at))
+            .values(owner=self.owner, updated_at=datetime.now())
+        )
+        with _active_lock:
+            if run.id in _active_runs:
+                return False
+            _active_runs.add(run.id)
+        try:
+            with Session(bind=self.bind) as session:
+                taken = session.execute(stmt).rowcount
+                session.commit()
+        except Exception as e:
+            app_logger.error("probe_run.claim_error", run_id=run.id, error=str(e))
+            taken = 0
+        if not taken:
+            self.release(run.id)
+            return False
+        app_logger.info("probe_run.notification_claimed", run_id=run.id, kind=run.kind)
+        return True
+
+    @staticmethod
+    def checkpoint_stmt(run_id: int, values: dict):
+        """UPDATE of a run's progress, executed by the writer inside its flush transaction."""
+        table = ProbeRun.__table__
+        return update(table).where(table.c.id == run_id).values(updated_at=datetime.now(), **values)
+
+    @staticmethod
+    def new_alives_stmt(run_id: int, items: List[dict]):
+        """INSERT of first-time-alive hosts into the run's pending notification."""
+        return insert(ProbeRunNewAlive.__table__).values([
+            {"run_id": run_id, "subdomain": it["subdomain"], "status_code": it.get("status"), "probed_at": it.get("probed_at")}
+            for it in items
+        ])
+
+    def pending_new_alives(self, run_id: int) -> List[dict]:
+        """The run's new alive hosts in the shape `notifier.notify_new_alives` takes."""
+        table = ProbeRunNewAlive.__table__
+        q = select(table.c.subdomain, table.c.status_code, table.c.probed_at).where(table.c.run_id == run_id).order_by(table.c.id)
+        with Session(bind=self.bind) as session:
+            return [
+                {"subdomain": subdomain, "status": status, "probed_at": probed_at}
+                for subdomain, status, probed_at in session.execute(q)
+            ]
+
+    def finish(self, run_id: int) -> bool:
+        """Mark the run finished; True only for the caller that actually closed it.
+
+        That caller keeps the run (for its notification) until `release()`.
+        """
+        table = ProbeRun.__table__
+        stmt = (
+            update(table)
+            .where(and_(table.c.id == run_id, table.c.status == "running"))
+            .values(status="finished", finished_at=datetime.now(), updated_at=datetime.now())
+        )
+        closed = 0
+        try:
+            with Session(bind=self.bind) as session:
+                closed = session.execute(stmt).rowcount
+                session.commit()
+        except Exception as e:
+            app_logger.error("probe_run.finish_error", run_id=run_id, error=str(e))
+        finally:
+            if not closed:
+                self.release(run_id)
+        return bool(closed)
+
+    def mark_notified(self, run_id: int) -> None:
+        table = ProbeRun.__table__
+        pending = ProbeRunNewAlive.__table__
+        try:
+            with Session(bind=self.bind) as session:
+                session.execute(update(table).where(table.c.id == run_id).values(notified_at=datetime.now(), updated_at=datetime.now()))
+                session.execute(delete(pending).where(pending.c.run_id == run_id))
+                session.commit()
+        except Exception as e:
+            app_logger.error("probe_run.notified_error", run_id=run_id, error=str(e))
+
+    @staticmethod
+    def release(run_id: int) -> None:
+        """Forget that this process works on the run (it can be resumed again)."""
+        with _active_lock:
+            _active_runs.discard(run_id)
@@ -0,0 +1,308 @@
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Float, String, case, cast, column, func, literal_column, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.models.alive_subdomain import AliveSubdomain
+from app.models.probe_run import ProbeRun
+from app.models.subdomains_master import MasterSubdomains
+from app.services.probe_runs import ProbeRunStore
+from app.services.tls_names import TlsNameHarvester
+from app.utils.log import app_logger
+
+
+_CLOSE = object()
+# a batch that cannot be stored is retried this many times (seconds between attempts grow linearly)
+_FLUSH_ATTEMPTS = 3
+_FLUSH_RETRY_DELAY = 1.0
+
+
+class _Checkpoint:
+    """Queue marker: every result queued before it belongs to completed chunks."""
+
+    def __init__(self, cursor: Optional[int], scanned: int, done: Optional[threading.Event] = None):
+        self.cursor = cursor
+        self.scanned = scanned
+        # set once the results queued before the marker are stored
+        self.done = done
+
+
+class ProbeResultWriter:
+    """Persist probe results from a dedicated thread in set-based batches.
+
+    Behavior:
+    - `put()` hands a result to the writer thread through a bounded queue, so
+      collecting probe results never waits on the database unless the writer
+      falls far behind.
+    - A flush runs when `batch_size` results are queued or `flush_interval`
+      seconds passed, and on `close()`. One `UPDATE ... FROM (VALUES ...)`
+      schedules every probed row on `subdomains_master` (`last_alive`,
+      `probe_failures`, `next_probe_at`, and with a `worker_id` the leases
+      this worker holds on them) and one `INSERT ... ON CONFLICT DO
+      UPDATE` upserts the reachable hosts (with their fingerprint: final URL,
+      server, title, body hash) into `alive_subdomains`, in a single
+      transaction.
+    - Scheduling: alive hosts are due again after `PROBER_ALIVE_INTERVAL_HOURS`;
+      dead ones after `PROBER_DEAD_BACKOFF_HOURS`, doubled per consecutive
+      failure and capped at `PROBER_DEAD_BACKOFF_MAX_DAYS`. The backoff is
+      computed in SQL from the stored failure count. Deferred results (rate
+      limited or behind an open circuit breaker, see `RetryScheduler`) only
+      move `next_probe_at` to their not-before time. `next_probe_at` is
+      counted from the database clock, like lease expiry and the due filters.
+    - First-time-alive hosts are read from the upsert's `RETURNING (xmax = 0)`
+      (true for inserted rows) instead of a SELECT before writing, and are
+      collected in `new_alives` once their batch is committed.
+    - With a `run` (see `ProbeRunStore`), each flush also stores the run's
+      counters and appends its first-time-alive hosts to the run's pending
+      notification in the same transaction, and `checkpoint()` advances the
+      run's cursor once the results queued before it are stored. Counters
+      start from the run's saved state; `new_alives` only holds this process's.
+    - A failed flush is retried (`_FLUSH_ATTEMPTS`); if the batch still
+      cannot be stored it is dropped and the run's cursor stops advancing
+      (`stalled`), so a resumed run probes those rows again.
+    - With a `harvester`, the certificate names carried by alive results are
+      handed to it once their batch is committed (see `TlsNameHarvester`).
+    - `put()` is meant to be called from one thread (the result collector);
+      `db` is used only by the writer thread.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        run: Optional[ProbeRun] = None,
+        harvester: Optional[TlsNameHarvester] = None,
+        worker_id: Optional[str] = None,
+    ):
+        self.db = db
+        self.batch_size = batch_size or settings.PROBER_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.PROBER_WRITE_FLUSH_INTERVAL
+        self.run_id = run.id if run is not None else None
+        self.harvester = harvester
+        # leased runs clear their own leases as results are stored; other runs leave leases alone
+        self.worker_id = worker_id
+        self.new_alives: List[dict] = []
+        # a resumed run continues from its saved counters
+        self.received = run.probed if run is not None else 0
+        self.alive = run.alive if run is not None else 0
+        self.written = run.probed if run is not None else 0
+        self.alive_written = run.alive if run is not None else 0
+        self.scanned = run.scanned if run is not None else 0
+        self.failed = 0
+        # set once a batch of a run is dropped: later checkpoints no longer move the cursor past it
+        self.stalled = False
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.batch_size * 8)
+        self._thread = threading.Thread(target=self._run, name="probe-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def put(self, result: dict) -> None:
+        """Queue one probe result (see ProberService.probe) for writing."""
+        self.received += 1
+        if result.get("is_alive"):
+            self.alive += 1
+        self._queue.put(result)
+
+    def checkpoint(self, cursor: Optional[int], scanned: int) -> None:
+        """Record that a chunk of `scanned` master rows up to id `cursor` has all its results queued."""
+        if self.run_id is not None:
+            self._queue.put(_Checkpoint(cursor, scanned))
+
+    def drain(self) -> None:
+        """Block until every result queued so far is stored."""
+        if self._thread.is_alive():
+            done = threading.Event()
+            self._queue.put(_Checkpoint(None, 0, done))
+            while not done.wait(timeout=1.0):
+                if not self._thread.is_alive():
+                    return
+
+    def close(self) -> List[dict]:
+        """Flush what is left, stop the writer thread and return `new_alives`."""
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        app_logger.debug("probe_writer.closed", written=self.written, failed=self.failed, new_alives=len(self.new_alives))
+        return self.new_alives
+
+    def _run(self) -> None:
+        batch: Dict[str, dict] = {}
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is _CLOSE:
+                self._flush(batch)
+                return
+            if isinstance(item, _Checkpoint):
+                self._flush(batch, item)
+                if item.done is not None:
+                    item.done.set()
+                batch = {}
+                deadline = time.monotonic() + self.flush_interval
+                continue
+            if item is not None:
+                # last result for a name wins within a batch
+                batch[item["subdomain"]] = item
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = {}
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, batch: Dict[str, dict], checkpoint: Optional[_Checkpoint] = None) -> None:
+        if not batch and checkpoint is None:
+            return
+        rows = list(batch.values())
+        alive = [r for r in rows if r.get("is_alive")]
+        for attempt in range(1, _FLUSH_ATTEMPTS + 1):
+            try:
+                fresh = self._write(rows, alive, checkpoint)
+                break
+            except Exception as e:
+                self.db.rollback()
+                app_logger.error("probe_writer.flush_error", count=len(rows), attempt=attempt, error=str(e))
+                if attempt < _FLUSH_ATTEMPTS:
+                    time.sleep(_FLUSH_RETRY_DELAY * attempt)
+        else:
+            self.failed += len(rows)
+            if self.run_id is not None and not self.stalled:
+                # a resumed run must probe these rows again: the cursor stays before them
+                self.stalled = True
+                app_logger.warning("probe_writer.cursor_stalled", run_id=self.run_id, dropped=len(rows))
+            return
+
+        self.written += len(rows)
+        self.alive_written += len(alive)
+        if checkpoint is not None and not self.stalled:
+            self.scanned += checkpoint.scanned
+        self.new_alives.extend(fresh)
+        if self.harvester is not None and alive:
+            self.harvester.add(alive)
+        app_logger.debug("probe_writer.flushed", count=len(rows))
+
+    def _write(self, rows: List[dict], alive: List[dict], checkpoint: Optional[_Checkpoint]) -> List[dict]:
+        """Store one batch in a single transaction; returns its first-time-alive hosts."""
+        if rows:
+            self._update_master(rows)
+        inserted = self.db.execute(self._alive_upsert(alive)).all() if alive else []
+        by_name = {r["subdomain"]: r for r in alive}
+        fresh: List[dict] = []
+        for subdomain, is_new in inserted:
+            if is_new:
+                r = by_name[subdomain]
+                fresh.append({
+                    "subdomain": subdomain,
+                    "status": r.get("status_code"),
+                    "probed_at": r.get("probed_at"),
+                })
+        if self.run_id is not None:
+            self.db.execute(self._run_progress(len(rows), len(alive), checkpoint))
+            if fresh:
+                self.db.execute(ProbeRunStore.new_alives_stmt(self.run_id, fresh))
+        self.db.commit()
+        return fresh
+
+    def _run_progress(self, written: int, alive: int, checkpoint: Optional[_Checkpoint]):
+        values = {
+            "probed": self.written + written,
+            "alive": self.alive_written + alive,
+        }
+        if checkpoint is not None and not self.stalled:
+            values["scanned"] = self.scanned + checkpoint.scanned
+            if checkpoint.cursor is not None:
+                values["cursor"] = checkpoint.cursor
+        return ProbeRunStore.checkpoint_stmt(self.run_id, values)
+
+    def _update_master(self, rows: List[dict]) -> None:
+        table = MasterSubdomains.__table__
+        probed = values(
+            column("subdomain", String),
+            column("probed_at", DateTime),
+            column("alive", Boolean),
+            column("defer_secs", Float),
+            name="probed",
+        ).data([
+            (r["subdomain"], r.get("probed_at") or datetime.now(), bool(r.get("is_alive")), r.get("retry_after") if r.get("deferred") else None)
+            for r in rows
+        ])
+        # an all-NULL VALUES column is typed text by Postgres: cast before mixing it with numbers
+        defer_secs = cast(probed.c.defer_secs, Float)
+        deferred = defer_secs.isnot(None)
+
+        alive_after = settings.PROBER_ALIVE_INTERVAL_HOURS * 3600
+        dead_after = func.least(
+            settings.PROBER_DEAD_BACKOFF_HOURS * 3600 * func.power(2, func.least(table.c.probe_failures, 30)),
+            settings.PROBER_DEAD_BACKOFF_MAX_DAYS * 86400,
+        )
+        schedule = dict(
+            last_alive=case((probed.c.alive, probed.c.probed_at), else_=table.c.last_alive),
+            probe_failures=case((probed.c.alive, 0), (deferred, table.c.probe_failures), else_=table.c.probe_failures + 1),
+            # database clock, as for lease expiry: every worker and due filter compares against the same time
+            next_probe_at=func.localtimestamp() + func.make_interval(
+                0, 0, 0, 0, 0, 0, case((deferred, defer_secs), (probed.c.alive, alive_after), else_=dead_after)
+            ),
+        )
+        if self.worker_id is not None:
+            # the result is stored: this worker's lease on the row is done (another worker's is left alone)
+            mine = table.c.lease_owner == self.worker_id
+            schedule.update(
+                lease_owner=case((mine, None), else_=table.c.lease_owner),
+                lease_expires_at=case((mine, None), else_=table.c.lease_expires_at),
+            )
+        stmt = (
+            update(table)
+            .where(table.c.subdomain == probed.c.subdomain)
+            .values(**schedule)
+            .returning(table.c.subdomain)
+        )
+        updated = {sd for (sd,) in self.db.execute(stmt)}
+        if len(updated) < len(rows):
+            missing = [r["subdomain"] for r in rows if r["subdomain"] not in updated]
+            app_logger.warning("probe_master.missing_in_db", count=len(missing), subdomains=missing[:10])
+
+    def _alive_upsert(self, rows: List[dict]):
+        table = AliveSubdomain.__table__
+        stmt = pg_insert(table).values([
+            {
+                "subdomain": r["subdomain"],
+                "probed_at": r.get("probed_at"),
+                "last_alive": r.get("probed_at"),
+                "status_code": r.get("status_code"),
+                "open_ports": r.get("open_ports"),
+                "final_url": r.get("final_url"),
+                "server": r.get("server"),
+                "title": r.get("title"),
+                "body_hash": r.get("body_hash"),
+            }
+            for r in rows
+        ])
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.subdomain],
+            set_={
+                "probed_at": stmt.excluded.probed_at,
+                "last_alive": stmt.excluded.last_alive,
+                "status_code": stmt.excluded.status_code,
+                "open_ports": stmt.excluded.open_ports,
+                "final_url": stmt.excluded.final_url,
+                "server": stmt.excluded.server,
+                "title": stmt.excluded.title,
+                "body_hash": stmt.excluded.body_hash,
+            },
+        ).returning(table.c.subdomain, literal_column("(xmax = 0)").label("inserted"))
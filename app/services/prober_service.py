@@ -1,24 +1,56 @@
 import requests
-import time
 import random
 import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+from urllib3.exceptions import ProtocolError
 
 from app.utils.log import app_logger
 from app.config.settings import settings
-from app.clients.base_http_client import BaseHTTPClient
+from app.clients.base_http_client import BaseHTTPClient, parse_retry_after
+from app.services.port_scanner import default_port
+from app.services.ip_groups import IpStats, primary_address
+from app.services.fingerprint import fingerprint
+from app.services.probe_retry import RATE_LIMITED, TRANSIENT, RetryLater
+from app.services.probe_race import TargetRace, race_result
+from app.services.tls_names import peer_cert_names
 
 
 class ProberService:
     """Simple HTTP prober for subdomains.
 
-    - Tries an HTTP HEAD request first, then a GET if HEAD fails with a 405.
+    - Tries an HTTP HEAD request first, then a GET if HEAD fails with a 405
+        (`mode="head"`), or sends a single streamed GET (`mode="get"`): redirects are
+        followed up to `max_redirects` and at most `max_body_bytes` of the body are read.
         - Treats any HTTP response (including 2xx/3xx/4xx/5xx) as a reachable host.
             Only network-level errors (connection refused, DNS failure, timeout, etc.)
             are considered "not alive".
         - Returns a dict with keys: subdomain, is_alive (bool - reachable), probed_at (datetime),
-            status_code (int|None), error (str|None)
+            status_code (int|None), error (str|None), open_ports (list|None); alive results
+            also carry final_url and server, plus title and body_hash in "get" mode, and
+            `tls_names` (SAN/CN names of the certificate the HTTPS connection presented,
+            read from the open connection) when `harvest_tls` is set
+        - When `open_ports` from a TCP sweep is given, only targets whose port accepted
+            a connection are requested.
+        - Hosts with a known address (`addresses`) are capped at `max_per_ip` concurrent
+            requests per IP across all threads; per-IP counters go to `ip_stats`.
+        - Never sleeps or retries inline: a 429 stops the host at once (status 429,
+            `retry="rate_limited"`, `retry_after` from the header) and a host whose targets
+            failed with timeouts or dropped connections gets `retry="transient"`; the run
+            re-queues both through `RetryScheduler`.
+        - With `race`, targets are raced on a shared thread pool instead of tried one by one
+            (see `TargetRace`): one starts every `PROBER_RACE_STAGGER` seconds, the first
+            answer wins unless a more preferred target answers within `PROBER_RACE_GRACE`.
+            Losing attempts are abandoned: queued ones never start, ones waiting for their
+            IP slot give up, and a response that arrives for one is closed at once (as is a
+            body or redirect chain being read), so they free their pool thread and IP slot
+            as soon as the request in progress returns.
     """
 
     def __init__(
@@ -28,6 +60,14 @@ class ProberService:
         user_agent: Optional[str] = None,
         http_client: Optional[object] = None,
         ports: Optional[List[int]] = None,
+        max_per_ip: Optional[int] = None,
+        ip_stats: Optional[IpStats] = None,
+        mode: Optional[str] = None,
+        max_body_bytes: Optional[int] = None,
+        max_redirects: Optional[int] = None,
+        race: Optional[bool] = None,
+        race_workers: Optional[int] = None,
+        harvest_tls: Optional[bool] = None,
     ):
         self.timeout = timeout
         self.verify = verify
@@ -44,106 +84,305 @@ class ProberService:
         # ports to try (exclude default 443/80 since we probe default schemes first)
         # try secure ports first, then common HTTP developer ports
         self.ports = ports or [8443, 8080, 8000, 3000]
+        # resolved addresses per host (from the DNS stage) used to group requests by IP
+        self.addresses: Dict[str, List[str]] = {}
+        self.max_per_ip = settings.PROBER_MAX_PER_IP if max_per_ip is None else max_per_ip
+        self.ip_stats = ip_stats or IpStats()
+        self._ip_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._ip_lock = threading.Lock()
+        self.mode = (mode or settings.PROBER_REQUEST_MODE).lower()
+        self.max_body_bytes = max_body_bytes or settings.PROBER_BODY_MAX_BYTES
+        self.max_redirects = settings.PROBER_MAX_REDIRECTS if max_redirects is None else max_redirects
+        self.race = settings.PROBER_RACE if race is None else race
+        self.race_stagger = settings.PROBER_RACE_STAGGER
+        self.race_grace = settings.PROBER_RACE_GRACE
+        # attempts of raced hosts run here, apart from the callers' worker threads
+        self.race_workers = race_workers or settings.PROBER_MAX_WORKERS * 4
+        self._race_pool: Optional[ThreadPoolExecutor] = None
+        self.harvest_tls = settings.PROBER_TLS_HARVEST if harvest_tls is None else harvest_tls
 
-    def probe(self, subdomain: str) -> Dict:
+    def _ip_slot(self, ip: Optional[str]):
+        """Per-IP concurrency cap (a no-op for unresolved hosts or when disabled)."""
+        if ip is None or not self.max_per_ip:
+            return nullcontext()
+        with self._ip_lock:
+            semaphore = self._ip_semaphores.get(ip)
+            if semaphore is None:
+                semaphore = self._ip_semaphores[ip] = threading.BoundedSemaphore(self.max_per_ip)
+        return semaphore
+
+    @contextmanager
+    def _ip_turn(self, ip: Optional[str], abandoned: Optional[threading.Event] = None):
+        """Hold the IP's slot for one request; gives up (`_Abandoned`) once `abandoned` is set."""
+        slot = self._ip_slot(ip)
+        if abandoned is None or isinstance(slot, nullcontext):
+            with slot:
+                yield
+            return
+        while not slot.acquire(timeout=_ABANDON_POLL):
+            if abandoned.is_set():
+                raise _Abandoned()
+        try:
+            yield
+        finally:
+            slot.release()
+
+    def close(self) -> None:
+        """Stop the race pool (abandoned attempts still finish in the background)."""
+        if self._race_pool is not None:
+            self._race_pool.shutdown(wait=False)
+            self._race_pool = None
+
+    def _race_executor(self) -> ThreadPoolExecutor:
+        with self._ip_lock:
+            if self._race_pool is None:
+                self._race_pool = ThreadPoolExecutor(max_workers=self.race_workers, thread_name_prefix="probe-race")
+            return self._race_pool
+
+    def probe(self, subdomain: str, open_ports: Optional[List[int]] = None) -> Dict:
         probed_at = datetime.now()
 
-        # helper to perform a single request using provided http client if available
-        def _single_request(method: str, url: str):
-            # If an http_client with a requests-like session is provided, prefer it
-            client = self.http_client
-            max_retries = getattr(client, "max_retries", 2) if client else 2
-            retry_delay = getattr(client, "retry_delay", 1.0) if client else 1.0
+        if open_ports is not None and not open_ports:
+            app_logger.debug("probe.no_open_ports", subdomain=subdomain)
+            return {"subdomain": subdomain, "is_alive": False, "probed_at": probed_at, "status_code": None, "error": "no open ports", "open_ports": open_ports}
 
-            for attempt in range(max_retries + 1):
-                try:
-                    if client and hasattr(client, "session"):
-                        # Use client's session headers (do not override) so configured UA, auth, and other defaults are preserved
-                        resp = client.session.request(
-                            method=method,
-                            url=url,
-                            timeout=self.timeout,
-                            allow_redirects=True,
-                            verify=self.verify,
-                        )
-                    else:
-                        resp = requests.request(
-                            method=method,
-                            url=url,
-                            timeout=self.timeout,
-                            allow_redirects=True,
-                            headers=self.headers,
-                            verify=self.verify,
-                        )
-
-                    # handle rate limit header
-                    if resp.status_code == 429:
-                        retry_after = int(resp.headers.get("Retry-After", 60))
-                        app_logger.warning("probe.rate_limited", subdomain=subdomain, url=url, wait=retry_after)
-                        time.sleep(retry_after)
-                        continue
+        ip = primary_address(self.addresses, subdomain)
 
-                    return resp
-                except requests.RequestException as e:
-                    # sanitize exception message to avoid leaking memory addresses like <HTTPConnection(...) at 0x...>
-                    raw_err = str(e)
-                    sanitized = re.sub(r'0x[0-9a-fA-F]+', '<ptr>', raw_err)
-                    app_logger.debug("probe.request_exception", subdomain=subdomain, url=url, error=sanitized, attempt=attempt)
-                    if attempt == max_retries:
-                        raise
-                    time.sleep(retry_delay * (2 ** attempt))
-
-        # Ordered probing logic:
-        # 1) try default https (no explicit port)
-        # 2) try default http (no explicit port)
-        # 3) try additional ports with https then http
-        last_error = None
+        # one HTTP request, counted against the host's IP
+        def _send(method: str, url: str, client, stream: bool, allow_redirects: bool):
+            try:
+                if client and hasattr(client, "session"):
+                    # Use client's session headers (do not override) so configured UA, auth, and other defaults are preserved
+                    resp = client.session.request(
+                        method=method,
+                        url=url,
+                        timeout=self.timeout,
+                        allow_redirects=allow_redirects,
+                        verify=self.verify,
+                        stream=stream,
+                    )
+                else:
+                    resp = requests.request(
+                        method=method,
+                        url=url,
+                        timeout=self.timeout,
+                        allow_redirects=allow_redirects,
+                        headers=self.headers,
+                        verify=self.verify,
+                        stream=stream,
+                    )
+            except requests.RequestException:
+                self.ip_stats.record(ip, subdomain, ok=False)
+                raise
+            self.ip_stats.record(ip, subdomain, ok=True)
+            return resp
+
+        # helper to perform a single request using provided http client if available;
+        # 429s and transient errors are handed back to the run's retry queue instead of slept on here
+        def _single_request(method: str, url: str, stream: bool = False, allow_redirects: bool = True, abandoned: Optional[threading.Event] = None):
+            if abandoned is not None and abandoned.is_set():
+                raise _Abandoned()
+            try:
+                with self._ip_turn(ip, abandoned):
+                    resp = _send(method, url, self.http_client, stream, allow_redirects)
+            except requests.RequestException as e:
+                # sanitize exception message to avoid leaking memory addresses like <HTTPConnection(...) at 0x...>
+                sanitized = re.sub(r'0x[0-9a-fA-F]+', '<ptr>', str(e))
+                app_logger.debug("probe.request_exception", subdomain=subdomain, url=url, error=sanitized)
+                if _is_transient(e):
+                    raise RetryLater(TRANSIENT, sanitized) from e
+                raise
+
+            if resp.status_code == 429:
+                resp.close()
+                retry_after = resp.headers.get("Retry-After")
+                wait = parse_retry_after(retry_after) if retry_after else None
+                app_logger.warning("probe.rate_limited", subdomain=subdomain, url=url, wait=wait)
+                raise RetryLater(RATE_LIMITED, "rate limited", wait)
+            if abandoned is not None and abandoned.is_set():
+                # the race was decided meanwhile: drop the connection instead of reading it
+                resp.close()
+                raise _Abandoned()
+            return resp
+
+        # certificate names of a response still holding its connection (streamed, not yet closed)
+        def _tls_names(resp) -> Optional[List[str]]:
+            if not self.harvest_tls or resp is None or not resp.url.startswith("https://"):
+                return None
+            return peer_cert_names(_response_socket(resp))
 
-        def _try_scheme_port(scheme: str, port: Optional[int] = None):
+        # "get" mode: one streamed GET, redirects followed by hand up to max_redirects,
+        # at most max_body_bytes of the body read
+        def _fetch(url: str, abandoned: Optional[threading.Event] = None):
+            resp = _single_request("GET", url, stream=True, allow_redirects=False, abandoned=abandoned)
+            # the host's own certificate, before any redirect leaves it
+            try:
+                tls_names = _tls_names(resp)
+            except Exception:
+                resp.close()
+                raise
+            for _ in range(self.max_redirects):
+                if resp is None or not resp.is_redirect:
+                    break
+                location = urljoin(resp.url, resp.headers["Location"])
+                try:
+                    nxt = _single_request("GET", location, stream=True, allow_redirects=False, abandoned=abandoned)
+                except _Abandoned:
+                    resp.close()
+                    raise
+                except (requests.RequestException, RetryLater) as e:
+                    # the host answered; an unreachable redirect target does not make it dead
+                    app_logger.debug("probe.redirect_failed", subdomain=subdomain, url=location, error=str(e))
+                    break
+                resp.close()
+                resp = nxt
+            if resp is None:
+                return None, None
+            try:
+                body = bytearray()
+                for chunk in resp.iter_content(chunk_size=8192):
+                    body += chunk
+                    if len(body) >= self.max_body_bytes:
+                        break
+                    if abandoned is not None and abandoned.is_set():
+                        raise _Abandoned()
+            except requests.RequestException as e:
+                app_logger.debug("probe.body_read_failed", subdomain=subdomain, url=resp.url, error=str(e))
+            finally:
+                resp.close()
+            info = fingerprint(resp.url, resp.headers, bytes(body[:self.max_body_bytes]), resp.encoding)
+            if tls_names:
+                info["tls_names"] = tls_names
+            return resp.status_code, info
+
+        def _try_scheme_port(scheme: str, port: Optional[int] = None, abandoned: Optional[threading.Event] = None):
             url = f"{scheme}://{subdomain}/" if port is None else f"{scheme}://{subdomain}:{port}/"
-            # HEAD first
-            resp = _single_request("HEAD", url)
-            status = getattr(resp, "status_code", None)
-            # If HEAD not allowed or status missing, try GET
-            if status == 405 or status is None:
-                resp = _single_request("GET", url)
+            # closed in the TCP sweep: no HTTP/TLS work on it
+            if open_ports is not None and default_port(scheme, port) not in open_ports:
+                return False, None, None
+            if self.mode == "get":
+                status, info = _fetch(url, abandoned)
+            else:
+                # HEAD first; streamed so the connection (and its certificate) is still at hand
+                resp = _single_request("HEAD", url, stream=True, abandoned=abandoned)
                 status = getattr(resp, "status_code", None)
+                # If HEAD not allowed or status missing, try GET
+                if status == 405 or status is None:
+                    if resp is not None:
+                        resp.close()
+                    resp = _single_request("GET", url, stream=True, abandoned=abandoned)
+                    status = getattr(resp, "status_code", None)
+                info = None
+                if resp is not None:
+                    try:
+                        tls_names = _tls_names(resp)
+                    finally:
+                        resp.close()
+                    info = fingerprint(resp.url, resp.headers)
+                    if tls_names:
+                        info["tls_names"] = tls_names
             is_alive = status is not None
             app_logger.debug("probe.result", subdomain=subdomain, url=url, is_alive=is_alive, status_code=status)
-            return is_alive, status
+            return is_alive, status, info
 
-        # 1) https default
-        try:
-            is_alive, status = _try_scheme_port("https", None)
-            if is_alive:
-                app_logger.debug("probe.success", subdomain=subdomain, url=f"https://{subdomain}/", status_code=status)
-                return {"subdomain": subdomain, "is_alive": True, "probed_at": probed_at, "status_code": status, "error": None}
-        except Exception as e:
-            last_error = str(e)
-            app_logger.debug("probe.try_failed", subdomain=subdomain, url=f"https://{subdomain}/", error=last_error)
-
-        # 2) http default
-        try:
-            is_alive, status = _try_scheme_port("http", None)
-            if is_alive:
-                app_logger.debug("probe.success", subdomain=subdomain, url=f"http://{subdomain}/", status_code=status)
-                return {"subdomain": subdomain, "is_alive": True, "probed_at": probed_at, "status_code": status, "error": None}
-        except Exception as e:
-            last_error = str(e)
-            app_logger.debug("probe.try_failed", subdomain=subdomain, url=f"http://{subdomain}/", error=last_error)
-
-        # 3) other ports (both https and http)
-        for port in self.ports:
-            for scheme in ("https", "http"):
-                try:
-                    is_alive, status = _try_scheme_port(scheme, port)
-                    if is_alive:
-                        app_logger.debug("probe.success", subdomain=subdomain, url=f"{scheme}://{subdomain}:{port}/", status_code=status)
-                        return {"subdomain": subdomain, "is_alive": True, "probed_at": probed_at, "status_code": status, "error": None}
-                except Exception as e:
-                    last_error = str(e)
-                    app_logger.debug("probe.try_failed", subdomain=subdomain, url=f"{scheme}://{subdomain}:{port}/", error=last_error)
-
-        # all attempts failed (network errors)
+        # one raced target: (answered, value) as recorded by TargetRace
+        def _attempt(scheme: str, port: Optional[int], abandoned: threading.Event):
+            try:
+                is_alive, status, info = _try_scheme_port(scheme, port, abandoned)
+            except RetryLater as e:
+                # a 429 is an answer; a transient failure is not
+                return e.reason == RATE_LIMITED, e
+            except _Abandoned:
+                return False, None
+            except Exception as e:
+                app_logger.debug("probe.try_failed", subdomain=subdomain, scheme=scheme, port=port, error=str(e))
+                return False, e
+            return (True, (status, info)) if is_alive else (False, None)
+
+        def _race(racing):
+            race = TargetRace(len(racing), self.race_stagger, self.race_grace)
+            # set once the race is decided: the attempts still running stop at their next step
+            abandoned = threading.Event()
+            futures = {}
+            pool = self._race_executor()
+            try:
+                while True:
+                    now = time.monotonic()
+                    won = race.winner(now)
+                    if won is not None or race.finished(len(futures)):
+                        return race, won
+                    if race.should_launch(len(futures), now):
+                        index = race.launch(now)
+                        futures[pool.submit(_attempt, *racing[index], abandoned)] = index
+                        continue
+                    done, _ = wait(futures, timeout=race.wait_timeout(now), return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        race.record(futures.pop(fut), *fut.result())
+            finally:
+                # first answer wins: attempts not started are dropped, running ones stop at their next step
+                abandoned.set()
+                for fut in futures:
+                    fut.cancel()
+
+        # with https before http
+        targets = [("https", None), ("http", None)] + [(scheme, port) for port in self.ports for scheme in ("https", "http")]
+
+        if self.race:
+            racing = [(scheme, port) for scheme, port in targets if open_ports is None or default_port(scheme, port) in open_ports]
+            if len(racing) > 1:
+                race, won = _race(racing)
+                if won is not None:
+                    app_logger.debug("probe.success", subdomain=subdomain, scheme=racing[won][0], port=racing[won][1], raced=race.launched)
+                return race_result(subdomain, probed_at, open_ports, race, won)
+
+        last_error = None
+        transient = None
+        for scheme, port in targets:
+            url = f"{scheme}://{subdomain}/" if port is None else f"{scheme}://{subdomain}:{port}/"
+            try:
+                is_alive, status, info = _try_scheme_port(scheme, port)
+                if is_alive:
+                    app_logger.debug("probe.success", subdomain=subdomain, url=url, status_code=status)
+                    return {"subdomain": subdomain, "is_alive": True, "probed_at": probed_at, "status_code": status, "error": None, "open_ports": open_ports, **(info or {})}
+            except RetryLater as e:
+                if e.reason == RATE_LIMITED:
+                    # the host answered; stop here and come back after Retry-After
+                    return {"subdomain": subdomain, "is_alive": True, "probed_at": probed_at, "status_code": 429, "error": e.error, "open_ports": open_ports, "retry": RATE_LIMITED, "retry_after": e.retry_after}
+                last_error = transient = e.error
+                app_logger.debug("probe.try_failed", subdomain=subdomain, url=url, error=last_error)
+            except Exception as e:
+                last_error = str(e)
+                app_logger.debug("probe.try_failed", subdomain=subdomain, url=url, error=last_error)
+
+        # all attempts failed (network errors); timeouts and dropped connections are worth another try later
         app_logger.debug("probe.error", subdomain=subdomain, error=last_error)
-        return {"subdomain": subdomain, "is_alive": False, "probed_at": probed_at, "status_code": None, "error": last_error}
+        result = {"subdomain": subdomain, "is_alive": False, "probed_at": probed_at, "status_code": None, "error": last_error, "open_ports": open_ports}
+        if transient is not None:
+            result.update(retry=TRANSIENT, retry_after=None)
+        return result
+
+
+# seconds between checks of an abandoned race attempt waiting for its IP slot
+_ABANDON_POLL = 0.05
+
+
+class _Abandoned(Exception):
+    """A raced attempt stopped because its race was already decided."""
+
+
+def _response_socket(resp: requests.Response):
+    """The TLS socket a streamed response is read from, if it is still open."""
+    connection = getattr(resp.raw, "connection", None)
+    sock = getattr(connection, "sock", None)
+    if sock is None:
+        # a connection that closes after this response hands its socket to the http.client response
+        fp = getattr(getattr(resp.raw, "_fp", None), "fp", None)
+        sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    return sock
+
+
+def _is_transient(e: requests.RequestException) -> bool:
+    """Timeouts and dropped connections; refused connections and TLS failures are not retried."""
+    if isinstance(e, (requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return True
+    return isinstance(e, requests.ConnectionError) and bool(e.args) and isinstance(e.args[0], ProtocolError)
@@ -0,0 +1,179 @@
+from datetime import datetime
+from threading import Lock
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.domain_requested import DomainRequested
+from app.models.probe_tls_subdomain import ProbeTlsSubdomain
+from app.services.bulk_writer import BulkSubdomainWriter
+from app.utils.log import app_logger
+from app.utils.normalizer import get_normalizer
+
+
+# source tag of harvested names in `subdomains_master.sources`
+SOURCE = "probe_tls"
+
+
+# DER tags and the OID bodies this module looks for
+_EXPLICIT_VERSION = 0xA0
+_EXPLICIT_EXTENSIONS = 0xA3
+_DNS_NAME = 0x82
+_OID_COMMON_NAME = bytes.fromhex("550403")
+_OID_SUBJECT_ALT_NAME = bytes.fromhex("551d11")
+
+
+def _tlvs(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+    """Walk the DER elements in data[start:end]: yields (tag, value start, value end)."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos < end:
+        tag = data[pos]
+        length = data[pos + 1]
+        pos += 2
+        if length & 0x80:
+            size = length & 0x7F
+            length = int.from_bytes(data[pos:pos + size], "big")
+            pos += size
+        if pos + length > end:
+            raise ValueError("truncated DER element")
+        yield tag, pos, pos + length
+        pos += length
+
+
+def _children(data: bytes, element: Tuple[int, int, int]) -> List[Tuple[int, int, int]]:
+    return list(_tlvs(data, element[1], element[2]))
+
+
+def cert_names(der: bytes) -> List[str]:
+    """DNS names a DER certificate is issued for: subjectAltName dNSNames, else the subject CN.
+
+    Only the fields needed here are parsed; names are returned as found
+    (possibly wildcards), deduplicated, in certificate order.
+    """
+    certificate = next(_tlvs(der))
+    tbs = _children(der, certificate)[0]
+    fields = _children(der, tbs)
+    if fields and fields[0][0] == _EXPLICIT_VERSION:
+        fields = fields[1:]
+    # serial, signature algorithm, issuer, validity, subject, public key, then optional fields
+    subject = fields[4]
+
+    names: List[str] = []
+    for field in fields[6:]:
+        if field[0] != _EXPLICIT_EXTENSIONS:
+            continue
+        for extension in _children(der, _children(der, field)[0]):
+            parts = _children(der, extension)
+            if der[parts[0][1]:parts[0][2]] != _OID_SUBJECT_ALT_NAME:
+                continue
+            value = parts[-1]
+            for tag, start, end in _children(der, next(_tlvs(der, value[1], value[2]))):
+                if tag == _DNS_NAME:
+                    names.append(der[start:end].decode("ascii", errors="replace"))
+
+    if not names:
+        for rdn in _children(der, subject):
+            for attribute in _children(der, rdn):
+                oid, value = _children(der, attribute)[:2]
+                if der[oid[1]:oid[2]] == _OID_COMMON_NAME:
+                    names.append(der[value[1]:value[2]].decode("utf-8", errors="replace"))
+    return list(dict.fromkeys(names))
+
+
+def peer_cert_names(ssl_object) -> Optional[List[str]]:
+    """Names of the certificate an `ssl.SSLSocket` / `ssl.SSLObject` was presented, if any.
+
+    Reads the certificate the handshake already received (no extra round
+    trip), also when it was not verified. A certificate that cannot be read
+    or parsed yields None: it never fails the probe of a host that answered.
+    """
+    if ssl_object is None:
+        return None
+    try:
+        der = ssl_object.getpeercert(binary_form=True)
+        return cert_names(der) if der else None
+    except Exception as e:
+        # malformed DER surfaces as ValueError, IndexError or StopIteration (an empty element)
+        app_logger.debug("tls_names.parse_error", error=str(e) or type(e).__name__)
+        return None
+
+
+def load_roots(db: Session) -> List[str]:
+    """The scan roots (`domain_requested.domain`), lowercased and deduplicated."""
+    try:
+        rows = db.execute(select(func.lower(DomainRequested.domain)).distinct()).scalars()
+        return sorted({root.strip().rstrip('.') for root in rows if root})
+    except Exception as e:
+        db.rollback()
+        app_logger.error("tls_names.roots_error", error=str(e))
+        return []
+
+
+def requested_root(host: str, roots: Iterable[str]) -> Optional[str]:
+    """The longest of `roots` that `host` is or falls under (`dev.example.com` is under `example.com`)."""
+    host = host.lower()
+    best = None
+    for root in roots:
+        if (host == root or host.endswith("." + root)) and (best is None or len(root) > len(best)):
+            best = root
+    return best
+
+
+def harvest_names(host: str, names: List[str], roots: Iterable[str]) -> Set[str]:
+    """Certificate names of `host` that are valid hostnames under its scan root (wildcards stripped).
+
+    The root is the longest of `roots` the host falls under, so a scan of
+    `dev.example.com` never picks up `www.example.com` from a shared
+    certificate. Hosts under no root, and the host itself, yield nothing.
+    """
+    root = requested_root(host, roots)
+    if root is None:
+        return set()
+    valid = get_normalizer(root).normalize_all(names)
+    valid.discard(host)
+    return valid
+
+
+class TlsNameHarvester:
+    """Feed names from probed hosts' certificates back into `subdomains_master`.
+
+    Alive probe results carry the `tls_names` of the certificate their HTTPS
+    connection presented. `add()` keeps the ones under the scan root the
+    probed host belongs to (`roots`, by default the `domain_requested`
+    domains when the harvester is created; see `harvest_names`), skips names
+    already harvested in this run, and writes the rest to
+    `probe_tls_subdomain` and master (source `probe_tls`) through
+    `BulkSubdomainWriter`. Names new to master have no `next_probe_at`, so
+    they are due right away.
+    """
+
+    def __init__(self, db: Session, roots: Optional[Iterable[str]] = None):
+        self.db = db
+        self.roots = list(roots) if roots is not None else load_roots(db)
+        self.writer = BulkSubdomainWriter(db, ProbeTlsSubdomain, SOURCE, merge_master=True)
+        self.harvested = 0
+        self._seen: Set[str] = set()
+        self._lock = Lock()
+
+    def add(self, results: Iterable[dict]) -> None:
+        now = datetime.now()
+        for res in results:
+            names = res.get("tls_names")
+            if not names or not res.get("is_alive"):
+                continue
+            for name in harvest_names(res["subdomain"], names, self.roots):
+                with self._lock:
+                    if name in self._seen:
+                        continue
+                    self._seen.add(name)
+                    self.harvested += 1
+                self.writer.add({"subdomain": name, "seen_on": res["subdomain"], "detected_at": now})
+
+    def flush(self) -> int:
+        return self.writer.flush()
+
+    def close(self) -> None:
+        self.writer.close()
+        self.db.close()
@@ -1,16 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from app.clients.virus_total_client import VirusTotalClient
+from app.clients.virus_total_client import VirusTotalClient, AsyncVirusTotalClient
 from app.models.virus_total_subdomain import VirusTotalSubdomain
 from app.utils.log import app_logger
 from app.services.base_subdomain_service import BaseSubdomainService
-from app.models.subdomains_master import MasterSubdomains
-from sqlalchemy import func
-from sqlmodel import select
-from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.services.bulk_writer import BulkSubdomainWriter
 
+import asyncio
 import math
-import time
 
 
 class VirusTotalService(BaseSubdomainService):
@@ -22,21 +18,21 @@ class VirusTotalService(BaseSubdomainService):
         if not self.enabled:
             app_logger.info("VirusTotal service disabled: no VIRUS_TOTAL_API_KEY configured")
 
-    def extract_subdomains_data(self, data, target_domain, db: Session):
+    def extract_subdomains_data(self, data, target_domain, writer: BulkSubdomainWriter):
         subdomains = set()
         raw_subdomains = data['data']
         app_logger.debug(f"VirusTotal: extracting {len(raw_subdomains)} items for {target_domain}")
         try:
             for sub in raw_subdomains:
                 if sub['type'] == 'domain':
-                    subdomain = sub['id']
-                    if self.is_valid_subdomain(subdomain, target_domain):
+                    subdomain = self.normalize_subdomain(sub['id'], target_domain)
+                    if subdomain:
                         app_logger.debug(f"VirusTotal: valid subdomain extracted: {subdomain}")
                         subdomains.add(subdomain)
                         to_store = {
                             "subdomain": subdomain,
                         }
-                        self.store_subdomains_data(db, to_store)
+                        writer.add(to_store)
         except Exception as e:
             app_logger.error(f"error extracting and storing {e}")
         return subdomains
@@ -53,92 +49,88 @@ class VirusTotalService(BaseSubdomainService):
         pages = 0
         MAX_PAGES = 0
         
-        while True:
-            if pages > MAX_PAGES:
-                app_logger.warning(f"reached max pages ({MAX_PAGES}) for domain {domain}")
-                break
-
-            # prefer following the full `links.next` URL returned by VirusTotal when available
-            data = virus_total_client.search_domain(domain, next_url=next_url)
-            app_logger.debug(f"VirusTotal: page={pages} data_present={bool(data)}")
-            
-            # metadata to create max pages to request
-            MAX_PAGES = math.ceil(data.get('meta', {}).get('count', 0) / 40)
-            
-            if not data:
-                break
-
-            # extract and store subdomains from this page
-            try:
-                page_subs = self.extract_subdomains_data(data, domain, db)
-                all_subdomains.update(page_subs)
-                app_logger.info(f"VirusTotal: page {pages} added {len(page_subs)} subdomains for {domain}")
-            except Exception as e:
-                app_logger.error(f"error processing page {pages} for {domain}: {e}")
-
-            # prefer the `next` link (includes both limit and cursor) if VirusTotal provides it
-            links = data.get('links', {}) if isinstance(data, dict) else {}
-            next_link = links.get('next')
-
-            if next_link:
-                # set next_url to the absolute URL
-                next_url = next_link
-                app_logger.debug(f"VirusTotal: next page link found: {next_url}")
-
-            # if no next_url, no more pages
-            if not next_url:
-                break
-
-            # polite delay between paged requests
-            time.sleep(self.delay)
-            
-            pages += 1
-            
+        with BulkSubdomainWriter(db, VirusTotalSubdomain, 'virustotal', merge_master=False, known=self.known) as writer:
+            while True:
+                if pages > MAX_PAGES:
+                    app_logger.warning(f"reached max pages ({MAX_PAGES}) for domain {domain}")
+                    break
+
+                # prefer following the full `links.next` URL returned by VirusTotal when available
+                data = virus_total_client.search_domain(domain, next_url=next_url)
+                app_logger.debug(f"VirusTotal: page={pages} data_present={bool(data)}")
+
+                # metadata to create max pages to request
+                MAX_PAGES = math.ceil(data.get('meta', {}).get('count', 0) / 40)
+
+                if not data:
+                    break
+
+                next_url = self._process_page(data, domain, writer, pages, all_subdomains, next_url)
+
+                # if no next_url, no more pages
+                if not next_url:
+                    break
+
+                # paging is paced by the shared VirusTotal rate limiter in the client
+                pages += 1
+
         return all_subdomains
-                            
 
-    def store_subdomains_data(self, db: Session, data: dict):
+    async def search_subdomains_async(self, db: Session, domain):
+        """ `search_subdomains` on the event loop; page processing runs in a worker thread """
+        if not getattr(self, 'enabled', False):
+            app_logger.debug(f"VirusTotal: skipped for {domain} (no API key)")
+            return set()
+
+        virus_total_client = AsyncVirusTotalClient()
+        app_logger.info(f"VirusTotal: starting search for {domain}")
+        all_subdomains = set()
+        next_url = None
+        pages = 0
+        MAX_PAGES = 0
+
+        writer = BulkSubdomainWriter(db, VirusTotalSubdomain, 'virustotal', merge_master=False, known=self.known)
+        try:
+            while True:
+                if pages > MAX_PAGES:
+                    app_logger.warning(f"reached max pages ({MAX_PAGES}) for domain {domain}")
+                    break
+
+                data = await virus_total_client.search_domain(domain, next_url=next_url)
+                app_logger.debug(f"VirusTotal: page={pages} data_present={bool(data)}")
+
+                MAX_PAGES = math.ceil(data.get('meta', {}).get('count', 0) / 40)
+
+                if not data:
+                    break
+
+                next_url = await asyncio.to_thread(self._process_page, data, domain, writer, pages, all_subdomains, next_url)
+                if not next_url:
+                    break
+
+                pages += 1
+        finally:
+            await asyncio.to_thread(writer.close)
+
+        return all_subdomains
+
+    def _process_page(self, data, domain, writer: BulkSubdomainWriter, page, all_subdomains: set, next_url):
+        """ store one page of results and return the url of the next page (if any) """
+        # extract and store subdomains from this page
         try:
-            app_logger.debug(f"VirusTotal: upserting subdomain {data.get('subdomain')}")
-            table = VirusTotalSubdomain.__table__
-            insert_stmt = pg_insert(table).values(data)
-            update_stmt = {k: insert_stmt.excluded[k] for k in data.keys() if k != 'subdomain'}
-            if update_stmt:
-                stmt = insert_stmt.on_conflict_do_update(index_elements=['subdomain'], set_=update_stmt)
-            else:
-                stmt = insert_stmt.on_conflict_do_nothing(index_elements=['subdomain'])
-            db.execute(stmt)
-            db.commit()
-            app_logger.info(f"VirusTotal: upserted {data.get('subdomain')} into virus_total_subdomain")
-
-            # Upsert into master via Python-level merge so `sources` becomes a list
-            try:
-                stmt = select(MasterSubdomains).where(MasterSubdomains.subdomain == data.get('subdomain'))
-                master_obj = db.execute(stmt).scalars().one_or_none()
-                incoming_first = data.get('first_seen') or data.get('detected_at')
-                if master_obj is None:
-                    master_obj = MasterSubdomains(
-                        subdomain=data.get('subdomain'),
-                        sources=['virustotal'],
-                        first_seen=incoming_first,
-                    )
-                    db.add(master_obj)
-                else:
-                    if 'virustotal' not in (master_obj.sources or []):
-                        master_obj.sources = (master_obj.sources or []) + ['virustotal']
-                    if incoming_first:
-                        try:
-                            if master_obj.first_seen is None or incoming_first < master_obj.first_seen:
-                                master_obj.first_seen = incoming_first
-                        except Exception:
-                            pass
-                    db.add(master_obj)
-                db.commit()
-            except Exception as e:
-                db.rollback()
-                app_logger.error(f"VirusTotal: error upserting into master: {e}")
-        except IntegrityError:
-            db.rollback()
+            page_subs = self.extract_subdomains_data(data, domain, writer)
+            all_subdomains.update(page_subs)
+            app_logger.info(f"VirusTotal: page {page} added {len(page_subs)} subdomains for {domain}")
         except Exception as e:
-            db.rollback()
-            app_logger.error(f'error upserting virustotal rows: {e}')
+            app_logger.error(f"error processing page {page} for {domain}: {e}")
+
+        # prefer the `next` link (includes both limit and cursor) if VirusTotal provides it
+        links = data.get('links', {}) if isinstance(data, dict) else {}
+        next_link = links.get('next')
+
+        if next_link:
+            # set next_url to the absolute URL
+            next_url = next_link
+            app_logger.debug(f"VirusTotal: next page link found: {next_url}")
+
+        return next_url
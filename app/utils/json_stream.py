@@ -0,0 +1,143 @@
+import json
+from typing import Any, Iterable, Iterator, List
+
+from app.core.exceptions.exceptions import ParsingError
+
+
+_WHITESPACE = ' \t\n\r'
+# characters that can continue a number cut at a chunk boundary (`2.` + `5`, `1e` + `3`)
+_NUMBER_CONTINUATION = '0123456789.eE+-'
+
+
+class JsonArrayParser:
+    """Push parser for the elements of a top-level JSON array.
+
+    Text is fed in arbitrary chunks with `feed()`, which returns the elements
+    completed so far; `close()` flushes the tail and checks the array was
+    terminated. Only the element being decoded (plus one partial chunk) is
+    kept in memory, so peak usage depends on the largest element rather than
+    on the size of the document. An empty input or `null` yields nothing;
+    anything else that is not an array raises `ParsingError`.
+    """
+
+    def __init__(self, compact_at: int = 1 << 16):
+        self._decoder = json.JSONDecoder()
+        self._compact_at = compact_at
+        self._buf = ''
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        self._expect_value = True
+        self._count = 0
+        self._eof = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        if self._pos >= self._compact_at:
+            # drop consumed text once it dominates the buffer
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        self._buf += chunk
+        return self._parse()
+
+    def close(self) -> List[Any]:
+        self._eof = True
+        values = self._parse()
+        if self._started and not self._finished:
+            raise ParsingError('unterminated JSON array')
+        return values
+
+    def _skip_ws(self) -> bool:
+        buf, pos = self._buf, self._pos
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return pos < len(buf)
+
+    def _parse(self) -> List[Any]:
+        values = []
+        if self._finished:
+            if self._skip_ws():
+                raise ParsingError(self._buf[self._pos:self._pos + 64])
+            return values
+
+        if not self._started:
+            if not self._skip_ws():
+                return values
+            head = self._buf[self._pos:]
+            if head[0] == 'n':
+                # `null` body: nothing to yield once the input is complete
+                if not self._eof:
+                    return values
+                if head.strip() == 'null':
+                    self._finished = True
+                    self._pos = len(self._buf)
+                    return values
+            if head[0] != '[':
+                raise ParsingError(head[:64])
+            self._started = True
+            self._pos += 1
+
+        while self._skip_ws():
+            ch = self._buf[self._pos]
+            # `]` closes the array after a value, or right away when it is empty
+            if ch == ']' and (not self._expect_value or self._count == 0):
+                self._finished = True
+                self._pos += 1
+                if self._skip_ws():
+                    raise ParsingError(self._buf[self._pos:self._pos + 64])
+                return values
+            if not self._expect_value:
+                if ch != ',':
+                    raise ParsingError(self._buf[self._pos:self._pos + 64])
+                self._pos += 1
+                self._expect_value = True
+                continue
+
+            # an incomplete element raises until more text arrives; a value
+            # ending exactly at the buffer end is only trusted at EOF (a
+            # number could still continue in the next chunk)
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise ParsingError(self._buf[self._pos:self._pos + 64])
+                return values
+            if end == len(self._buf) and not self._eof:
+                return values
+            if not isinstance(value, (dict, list, str)) and not self._scalar_complete(end):
+                return values
+
+            self._pos = end
+            self._expect_value = False
+            self._count += 1
+            values.append(value)
+
+        return values
+
+
+    def _scalar_complete(self, end: int) -> bool:
+        """Whether a scalar decoded up to `end` cannot continue in the next chunk.
+
+        It must be followed by `,` or `]` (after optional whitespace) that is
+        already buffered, or by the end of the input.
+        """
+        buf = self._buf
+        pos = end
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos == len(buf):
+            return self._eof
+        if buf[pos] in ',]':
+            return True
+        if pos == end and buf[pos] in _NUMBER_CONTINUATION and not self._eof:
+            # a number split inside (`2.` / `5`): decode it again once the rest arrives
+            return False
+        raise ParsingError(buf[self._pos:self._pos + 64])
+
+
+def iter_json_array(chunks: Iterable[str], compact_at: int = 1 << 16) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array read from text `chunks`."""
+    parser = JsonArrayParser(compact_at=compact_at)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -0,0 +1,78 @@
+import functools
+import re
+from typing import Iterable, Optional, Set
+
+
+# one LDH label: 1-63 chars, letters/digits/hyphens, no leading or trailing hyphen
+_LABEL = r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?'
+_HOSTNAME_RE = re.compile(rf'(?:{_LABEL}\.)*{_LABEL}')
+
+_MAX_HOSTNAME_LENGTH = 253
+
+
+def to_ascii(name: str) -> Optional[str]:
+    """Lowercase `name` and convert internationalized labels to punycode.
+
+    Returns None when the name cannot be IDNA-encoded (empty or oversized labels).
+    """
+    name = name.lower()
+    if name.isascii():
+        return name
+    try:
+        return name.encode('idna').decode('ascii')
+    except UnicodeError:
+        return None
+
+
+class HostnameNormalizer:
+    """Normalizes and validates hostnames found under one root domain.
+
+    Cleaning (whitespace, case, `*.` wildcards, trailing dot, IDNA) happens
+    once here instead of in every provider. A name is kept when it is a valid
+    LDH hostname and equals the root or ends with `.` + root, so lookalikes
+    such as `evilexample.com` are rejected for `example.com`. Results are
+    memoized, since providers report the same names many times.
+    """
+
+    def __init__(self, root_domain: str, memo_size: int = 1 << 16):
+        self.root = to_ascii(root_domain.strip().rstrip('.')) or ''
+        self._suffix = '.' + self.root
+        self.normalize = functools.lru_cache(maxsize=memo_size)(self._normalize)
+
+    def _normalize(self, raw: str) -> Optional[str]:
+        """Return the normalized form of `raw`, or None if it is not a valid name under the root."""
+        name = raw.strip()
+        while name.startswith('*.'):
+            name = name[2:]
+        name = to_ascii(name.rstrip('.'))
+        if not name or len(name) > _MAX_HOSTNAME_LENGTH:
+            return None
+        if name != self.root and not name.endswith(self._suffix):
+            return None
+        if _HOSTNAME_RE.fullmatch(name) is None:
+            return None
+        return name
+
+    def is_valid(self, raw: str) -> bool:
+        return self.normalize(raw) is not None
+
+    def normalize_all(self, names: Iterable[str]) -> Set[str]:
+        """Return the deduplicated set of valid, normalized names from raw `names`."""
+        normalize = self.normalize
+        valid = set()
+        for raw in set(names):
+            name = normalize(raw)
+            if name is not None:
+                valid.add(name)
+        return valid
+
+
+@functools.lru_cache(maxsize=256)
+def get_normalizer(root_domain: str) -> HostnameNormalizer:
+    """Shared normalizer for `root_domain` (its memo is reused across calls)."""
+    return HostnameNormalizer(root_domain)
+
+
+def normalize_subdomains(names: Iterable[str], root_domain: str) -> Set[str]:
+    """Batch API: valid, normalized and deduplicated names under `root_domain`."""
+    return get_normalizer(root_domain).normalize_all(names)
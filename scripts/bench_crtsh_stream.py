@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""Peak-memory benchmark: buffered vs streamed crt.sh response parsing.
+
+Serves a synthetic crt.sh JSON payload from a local HTTP server and consumes
+it with `CrtshClient.search_domain` (whole body + `resp.json()`) and with
+`CrtshClient.iter_certificates` (incremental parsing), reporting the Python
+heap peak measured by tracemalloc for each.
+
+Usage: python scripts/bench_crtsh_stream.py [--records 200000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.clients.crtsh_client import CrtshClient  # noqa: E402
+
+
+def write_payload(path: str, records: int) -> int:
+    with open(path, "w") as fh:
+        fh.write("[")
+        for i in range(records):
+            if i:
+                fh.write(",")
+            fh.write(
+                '{"issuer_ca_id":1,"issuer_name":"C=US, O=Bench CA, CN=Bench R3",'
+                f'"common_name":"host{i}.example.com",'
+                f'"name_value":"host{i}.example.com\\nwww.host{i}.example.com",'
+                f'"id":{i},"entry_timestamp":"2024-01-01T00:00:00.000",'
+                '"not_before":"2024-01-01T00:00:00","not_after":"2024-04-01T00:00:00",'
+                f'"serial_number":"{i:032x}","result_count":3}}'
+            )
+        fh.write("]")
+    return os.path.getsize(path)
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        self.path = "/payload.json"
+        return super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(label: str, fn) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} records={count:<9} peak={peak / 1024 / 1024:8.1f} MiB  time={elapsed:6.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        size = write_payload(os.path.join(tmp, "payload.json"), args.records)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_Handler, directory=tmp))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"payload: {args.records} records, {size / 1024 / 1024:.1f} MiB")
+
+        client = CrtshClient()
+        client.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            measure("buffered", lambda: len(client.search_domain("example.com")))
+            measure("streamed", lambda: sum(1 for _ in client.iter_certificates("example.com")))
+        finally:
+            client.close()
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""Micro-benchmark: legacy is_valid_subdomain loop vs the batch hostname normalizer.
+
+Builds a crt.sh-like list of raw names (heavy repetition, wildcards, mixed
+case, invalid and lookalike names, a few IDNs) and times the previous
+per-name cleaning + validation against `normalize_subdomains`. Also reports
+the lookalike names the legacy suffix check accepted.
+
+Usage: python scripts/bench_normalizer.py [--names 500000] [--unique 20000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils.normalizer import HostnameNormalizer  # noqa: E402
+
+ROOT = "example.com"
+
+
+def legacy_is_valid(name, target_domain):
+    """The validator replaced by app.utils.normalizer (without its per-name logging)."""
+    name = name.replace('*.', '')
+    if not name.endswith(f'{target_domain}') and name != target_domain:
+        return False
+    domain_pattern = re.compile(
+        r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$'
+        r'(\.[a-zA-Z0-9]([a-zA-Z0-9\-_]{0,61}[a-zA-Z0-9])?)*$'
+    )
+    domain_pattern.match(name)
+    return bool(domain_pattern.match(name))
+
+
+def legacy_batch(names, target_domain):
+    valid = set()
+    for raw in names:
+        name = raw.replace('*.', '').strip().lower()
+        if legacy_is_valid(name, target_domain):
+            valid.add(name)
+    return valid
+
+
+def make_names(total: int, unique: int, seed: int = 7):
+    rnd = random.Random(seed)
+    pool = []
+    for i in range(unique):
+        kind = i % 20
+        if kind == 0:
+            pool.append(f"*.svc{i}.{ROOT}")
+        elif kind == 1:
+            pool.append(f"  API{i}.Example.COM ")
+        elif kind == 2:
+            pool.append(f"bad_{i}.{ROOT}")
+        elif kind == 3:
+            pool.append(f"evil{i}{ROOT}")
+        elif kind == 4:
+            pool.append(f"bücher{i}.{ROOT}")
+        else:
+            pool.append(f"host{i}.region{i % 7}.{ROOT}")
+    return [rnd.choice(pool) for _ in range(total)]
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} valid={len(result):<7} time={elapsed:6.3f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=500000)
+    parser.add_argument("--unique", type=int, default=20000)
+    args = parser.parse_args()
+
+    names = make_names(args.names, args.unique)
+    print(f"input: {len(names)} raw names, {len(set(names))} distinct")
+
+    legacy = timed("legacy", lambda: legacy_batch(names, ROOT))
+    # a fresh normalizer so the memo starts empty
+    normalized = timed("normalizer", lambda: HostnameNormalizer(ROOT).normalize_all(names))
+
+    lookalikes = sorted(n for n in legacy if not n.endswith("." + ROOT) and n != ROOT)
+    print(f"legacy accepted {len(lookalikes)} lookalike names (e.g. {lookalikes[:2]})")
+    print(f"normalizer accepted {sum(1 for n in normalized if n.startswith('xn--'))} punycode names")
+
+
+if __name__ == "__main__":
+    main()
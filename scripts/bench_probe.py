@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Throughput benchmark: threaded ProberService vs the asyncio prober.
+
+Starts a farm of stub HTTP listeners, one per loopback address
+(127.1.x.y) on a shared port, each answering after `--latency` seconds;
+`--dead` of the addresses get no listener so their probes fail with
+connection refused. Both engines probe the same hosts with `ports=[port]`
+and no retries, and the script reports wall time, alive/dead counts and
+hosts per second for each. A third run sweeps the ports with the TCP
+connect scanner first and only probes the ports that accepted a connection,
+and a fourth splits the hosts across `--processes` worker processes, each
+running the threaded loop with `--workers` threads.
+`--mode` picks the request mode (`get`: one GET per target, `head`: HEAD
+with a GET fallback on 405).
+
+Usage: python scripts/bench_probe.py [--hosts 1000] [--latency 0.2] [--dead 0.2]
+       [--workers 20] [--concurrency 1000] [--mode get] [--processes N]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.clients.base_http_client import BaseHTTPClient  # noqa: E402
+from app.services.async_prober import AsyncProberService  # noqa: E402
+from app.services.port_scanner import PortScanner  # noqa: E402
+from app.services.probe_processes import ProbeProcessPool  # noqa: E402
+from app.services.prober_service import ProberService  # noqa: E402
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nServer: stub\r\nContent-Length: 28\r\nConnection: close\r\n\r\n<title>stub</title><p>ok</p>"
+
+
+def host_address(i: int) -> str:
+    return f"127.1.{i // 250}.{i % 250 + 1}"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.1.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubFarm:
+    """Stub listeners served from an event loop in a background thread."""
+
+    def __init__(self, addresses, port: int, latency: float):
+        self.addresses = addresses
+        self.port = port
+        self.latency = latency
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    async def _handle(self, reader, writer):
+        try:
+            first = await reader.read(1)
+            # a TLS ClientHello: this is a plain-HTTP listener, refuse it right away
+            if first and first != b"\x16":
+                await reader.readuntil(b"\r\n\r\n")
+                await asyncio.sleep(self.latency)
+                writer.write(RESPONSE)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve(self):
+        self.servers = [
+            await asyncio.start_server(self._handle, address, self.port, backlog=512)
+            for address in self.addresses
+        ]
+        self._ready.set()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._serve())
+        self.loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def run_threaded(hosts, port: int, workers: int, timeout: float, mode: str):
+    client = BaseHTTPClient(base_url="", timeout=timeout, max_retries=0, retry_delay=0)
+    prober = ProberService(timeout=timeout, http_client=client, ports=[port], mode=mode)
+    with ThreadPoolExecutor(max_workers=workers) as exe:
+        return list(exe.map(prober.probe, hosts))
+
+
+async def run_async(hosts, port: int, concurrency: int, timeout: float, mode: str, open_ports=None):
+    async with AsyncProberService(timeout=timeout, ports=[port], concurrency=concurrency, max_retries=0, retry_delay=0, mode=mode) as prober:
+        return [res async for res in prober.probe_many(hosts, open_ports=open_ports)]
+
+
+async def run_swept(hosts, port: int, concurrency: int, timeout: float, mode: str):
+    open_ports = await PortScanner([443, 80, port], timeout=1.0, concurrency=concurrency).scan_many(hosts)
+    return await run_async(hosts, port, concurrency, timeout, mode, open_ports)
+
+
+def run_processes(hosts, port: int, processes: int, workers: int):
+    results = []
+    with ProbeProcessPool(results.append, processes=processes, engine="threads", max_workers=workers, ports=[port]) as pool:
+        pool.probe(hosts, None, None)
+    return results
+
+
+def report(label: str, fn) -> None:
+    started = time.perf_counter()
+    results = fn()
+    elapsed = time.perf_counter() - started
+    alive = sum(1 for r in results if r["is_alive"])
+    print(f"{label:<8} probed={len(results):<6} alive={alive:<6} dead={len(results) - alive:<6} "
+          f"time={elapsed:7.2f}s  {len(results) / elapsed:8.1f} hosts/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hosts", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub response delay in seconds")
+    parser.add_argument("--dead", type=float, default=0.2, help="fraction of hosts without a listener")
+    parser.add_argument("--workers", type=int, default=20, help="threaded engine pool size")
+    parser.add_argument("--concurrency", type=int, default=1000, help="async engine requests in flight")
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--mode", choices=("get", "head"), default="get", help="probe request mode")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="worker processes of the process pool run")
+    args = parser.parse_args()
+    # the pool's spawned workers read their prober settings from the environment
+    os.environ.update(PROBER_REQUEST_MODE=args.mode, PROBER_TIMEOUT=str(args.timeout), PROBER_MAX_RETRIES="0")
+
+    hosts = [host_address(i) for i in range(args.hosts)]
+    dead_every = int(1 / args.dead) if args.dead > 0 else 0
+    live = [h for i, h in enumerate(hosts) if not dead_every or i % dead_every]
+    port = free_port()
+    farm = StubFarm(live, port, args.latency)
+    farm.start()
+    print(f"farm: {len(live)} listeners on port {port}, {len(hosts) - len(live)} dead hosts, latency {args.latency}s")
+
+    try:
+        report("threads", lambda: run_threaded(hosts, port, args.workers, args.timeout, args.mode))
+        report("async", lambda: asyncio.run(run_async(hosts, port, args.concurrency, args.timeout, args.mode)))
+        report("swept", lambda: asyncio.run(run_swept(hosts, port, args.concurrency, args.timeout, args.mode)))
+        report("procs", lambda: run_processes(hosts, port, args.processes, args.workers))
+    finally:
+        farm.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+
+
+# settings are read at import time; the unit tests never reach the database or the providers
+for _name in ("DB_USER", "DB_PASSWORD", "DB_HOST_IP", "DB_NAME", "SHODAN_API_KEY", "VIRUS_TOTAL_API_KEY", "OTX_API_KEY"):
+    os.environ.setdefault(_name, "test" if _name.startswith("DB_") else "")
@@ -0,0 +1,143 @@
+import asyncio
+import socket
+import threading
+
+import dns.message
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+import pytest
+
+from app.services.dns_resolver import DnsCache, DnsResolver, parse_nameservers, resolve_all
+
+
+# (qname, rdtype) -> rcode and answer records; names not listed are never answered (timeouts)
+ZONE = {
+    ("ok.test.", "A"): (dns.rcode.NOERROR, [("ok.test.", "A", "192.0.2.1")]),
+    ("ok.test.", "AAAA"): (dns.rcode.NOERROR, []),
+    ("nx.test.", "A"): (dns.rcode.NXDOMAIN, []),
+    ("nx.test.", "AAAA"): (dns.rcode.NXDOMAIN, []),
+    ("empty.test.", "A"): (dns.rcode.NOERROR, []),
+    ("empty.test.", "AAAA"): (dns.rcode.NOERROR, []),
+    ("v6only.test.", "A"): (dns.rcode.NOERROR, []),
+    ("v6only.test.", "AAAA"): (dns.rcode.NOERROR, [("v6only.test.", "AAAA", "2001:db8::1")]),
+    # the AAAA query of these is never answered
+    ("v4slow6.test.", "A"): (dns.rcode.NOERROR, [("v4slow6.test.", "A", "192.0.2.2")]),
+    ("emptyslow6.test.", "A"): (dns.rcode.NOERROR, []),
+    ("nxslow6.test.", "A"): (dns.rcode.NXDOMAIN, []),
+    ("broken.test.", "A"): (dns.rcode.SERVFAIL, []),
+    ("broken.test.", "AAAA"): (dns.rcode.SERVFAIL, []),
+    ("www.test.", "A"): (dns.rcode.NOERROR, [("www.test.", "CNAME", "ok.test."), ("ok.test.", "A", "192.0.2.1")]),
+    ("www.test.", "AAAA"): (dns.rcode.NOERROR, [("www.test.", "CNAME", "ok.test.")]),
+}
+
+
+class StubDnsServer:
+    """UDP DNS server answering from `ZONE`; counts the queries it receives."""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.queries = []
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                data, peer = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            query = dns.message.from_wire(data)
+            question = query.question[0]
+            key = (question.name.to_text(), dns.rdatatype.to_text(question.rdtype))
+            self.queries.append(key)
+            if key not in ZONE:
+                continue
+            rcode, records = ZONE[key]
+            response = dns.message.make_response(query)
+            response.set_rcode(rcode)
+            for name, rdtype, value in records:
+                response.answer.append(dns.rrset.from_text(name, 60, "IN", rdtype, value))
+            self.sock.sendto(response.to_wire(), peer)
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture(scope="module")
+def server():
+    stub = StubDnsServer()
+    yield stub
+    stub.close()
+
+
+def _resolve(server, names, **kwargs):
+    return resolve_all(names, nameservers=f"127.0.0.1:{server.port}", timeout=0.5, **kwargs)
+
+
+@pytest.mark.parametrize("name, status, addresses", [
+    ("ok.test", "ok", ["192.0.2.1"]),
+    ("v6only.test", "ok", ["2001:db8::1"]),
+    ("nx.test", "nxdomain", []),
+    ("empty.test", "no_answer", []),
+    # a failing AAAA query does not discard the A answer or decide the status
+    ("v4slow6.test", "ok", ["192.0.2.2"]),
+    ("emptyslow6.test", "timeout", []),
+    ("nxslow6.test", "nxdomain", []),
+    ("silent.test", "timeout", []),
+    ("broken.test", "error", []),
+])
+def test_classification(server, name, status, addresses):
+    result = _resolve(server, [name])[name]
+    assert result["status"] == status
+    assert result["addresses"] == addresses
+
+
+def test_cname_chain_is_reported(server):
+    result = _resolve(server, ["www.test"])["www.test"]
+    assert result["status"] == "ok"
+    assert result["addresses"] == ["192.0.2.1"]
+    assert result["cname"] == "ok.test"
+
+
+def test_run_cache_is_shared_across_resolvers(server):
+    cache = DnsCache()
+    _resolve(server, ["ok.test", "nx.test"], cache=cache)
+    asked = len(server.queries)
+    again = _resolve(server, ["ok.test", "nx.test"], cache=cache)
+    assert len(server.queries) == asked
+    assert again["nx.test"]["status"] == "nxdomain"
+    assert cache.hits == 2
+
+
+def test_cache_is_bounded():
+    cache = DnsCache(max_size=2)
+    for name in ("a", "b", "c"):
+        cache.put(name, {"subdomain": name})
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == {"subdomain": "c"}
+
+
+def test_concurrent_lookups_of_a_name_share_one_query(server):
+    resolver = DnsResolver(nameservers=f"127.0.0.1:{server.port}", timeout=0.5)
+
+    async def twice():
+        return await asyncio.gather(resolver.resolve("empty.test"), resolver.resolve("empty.test"))
+
+    before = len(server.queries)
+    first, second = asyncio.run(twice())
+    assert first is second
+    assert len(server.queries) - before == 2  # one A and one AAAA query
+
+
+def test_parse_nameservers():
+    assert parse_nameservers("1.1.1.1, 127.0.0.1:5353,[::1]:5300,::1") == [
+        ("1.1.1.1", None),
+        ("127.0.0.1", 5353),
+        ("::1", 5300),
+        ("::1", None),
+    ]
+    assert parse_nameservers("") == []
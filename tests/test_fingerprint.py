@@ -0,0 +1,51 @@
+import hashlib
+
+import pytest
+
+from app.services.fingerprint import TITLE_MAX_LENGTH, extract_title, fingerprint
+
+
+@pytest.mark.parametrize("body, title", [
+    (b"<html><head><title>Home</title></head></html>", "Home"),
+    (b"<TITLE lang='en'>\n  Admin \t Panel\n</TITLE >", "Admin Panel"),
+    (b"<title>Tom &amp; Jerry &#8211; Login</title>", "Tom & Jerry – Login"),
+    (b"<title>a\x00b</title>", "ab"),
+    (b"<title>   </title>", None),
+    (b"<html><body>no title</body></html>", None),
+    (b"<title>cut before the end", None),
+    (b"", None),
+])
+def test_extract_title(body, title):
+    assert extract_title(body) == title
+
+
+def test_title_uses_the_response_encoding():
+    assert extract_title("<title>Café</title>".encode("latin-1"), "latin-1") == "Café"
+
+
+def test_unknown_charset_falls_back_to_utf8():
+    assert extract_title("<title>Café</title>".encode("utf-8"), "x-not-a-charset") == "Café"
+
+
+def test_long_title_is_truncated():
+    assert len(extract_title(b"<title>" + b"x" * 2000 + b"</title>")) == TITLE_MAX_LENGTH
+
+
+def test_fingerprint_with_body():
+    body = b"<title>Hi</title>"
+    info = fingerprint("https://a.example.com/login", {"Server": "nginx"}, body)
+    assert info == {
+        "final_url": "https://a.example.com/login",
+        "server": "nginx",
+        "title": "Hi",
+        "body_hash": hashlib.sha256(body).hexdigest(),
+    }
+
+
+def test_fingerprint_without_body_leaves_title_and_hash_empty():
+    info = fingerprint("http://a.example.com/", None)
+    assert info == {"final_url": "http://a.example.com/", "server": None, "title": None, "body_hash": None}
+
+
+def test_empty_body_is_still_hashed():
+    assert fingerprint(None, {}, b"")["body_hash"] == hashlib.sha256(b"").hexdigest()
@@ -0,0 +1,61 @@
+from app.services.ip_groups import IpStats, interleave_by_ip, partition_by_ip, primary_address
+
+
+ADDRESSES = {
+    "a1": ["10.0.0.1"],
+    "a2": ["10.0.0.1", "10.0.0.9"],
+    "a3": ["10.0.0.1"],
+    "b1": ["10.0.0.2"],
+    "b2": ["10.0.0.2"],
+    "c1": [],
+}
+
+
+def test_primary_address_is_the_first_resolved_one():
+    assert primary_address(ADDRESSES, "a2") == "10.0.0.1"
+    assert primary_address(ADDRESSES, "c1") is None
+    assert primary_address(ADDRESSES, "unknown") is None
+
+
+def test_interleave_round_robins_across_ips():
+    hosts = ["a1", "a2", "a3", "b1", "b2", "c1", "d1"]
+    assert interleave_by_ip(hosts, ADDRESSES) == ["a1", "b1", "c1", "d1", "a2", "b2", "a3"]
+
+
+def test_interleave_keeps_every_host_once():
+    hosts = ["a1", "b1", "a2", "b2", "a3"]
+    ordered = interleave_by_ip(hosts, ADDRESSES)
+    assert sorted(ordered) == sorted(hosts)
+    assert ordered[:2] == ["a1", "b1"]
+
+
+def test_partition_keeps_an_ip_together():
+    hosts = ["a1", "a2", "a3", "b1", "b2", "c1", "d1"]
+    parts = partition_by_ip(hosts, ADDRESSES, 3)
+    assert len(parts) == 3
+    assert sorted(h for part in parts for h in part) == sorted(hosts)
+    for group in (["a1", "a2", "a3"], ["b1", "b2"]):
+        assert sum(1 for part in parts if set(group) & set(part)) == 1
+
+
+def test_partition_is_stable_across_calls():
+    first = partition_by_ip(["a1", "b1", "c1"], ADDRESSES, 4)
+    later = partition_by_ip(["a3", "b2", "c1"], ADDRESSES, 4)
+    index = {host: i for i, part in enumerate(first) for host in part}
+    assert later[index["a1"]].count("a3") == 1
+    assert later[index["b1"]].count("b2") == 1
+    assert later[index["c1"]].count("c1") == 1
+
+
+def test_ip_stats_export_and_merge():
+    local, other = IpStats(), IpStats()
+    local.record("10.0.0.1", "a1", ok=True)
+    other.record("10.0.0.1", "a2", ok=False)
+    other.record(None, "c1", ok=False)
+    local.merge(other.export())
+
+    summary = {row["ip"]: row for row in local.summary()}
+    assert summary["10.0.0.1"]["requests"] == 2
+    assert summary["10.0.0.1"]["errors"] == 1
+    assert summary["10.0.0.1"]["hosts"] == 2
+    assert summary["unresolved"]["requests"] == 1
@@ -0,0 +1,30 @@
+import pytest
+
+from app.core.exceptions.exceptions import ParsingError
+from app.utils.json_stream import JsonArrayParser, iter_json_array
+
+
+MIXED = '[1, 2.5, -3e2, 4E-1, "a,]", {"k": [1, 2.0]}, [], true, false, null, 0]'
+EXPECTED = [1, 2.5, -300.0, 0.4, "a,]", {"k": [1, 2.0]}, [], True, False, None, 0]
+
+
+def test_mixed_array_fed_one_byte_at_a_time():
+    assert list(iter_json_array(MIXED)) == EXPECTED
+
+
+@pytest.mark.parametrize("split", range(1, len(MIXED)))
+def test_mixed_array_split_anywhere(split):
+    assert list(iter_json_array([MIXED[:split], MIXED[split:]])) == EXPECTED
+
+
+def test_number_cut_at_decimal_point():
+    parser = JsonArrayParser()
+    assert parser.feed("[1,2.") == [1]
+    assert parser.feed("5]") == [2.5]
+    assert parser.close() == []
+
+
+def test_garbage_after_scalar_raises():
+    parser = JsonArrayParser()
+    with pytest.raises(ParsingError):
+        parser.feed("[1 x, 2]")
@@ -0,0 +1,55 @@
+import socket
+
+import pytest
+
+from app.services.port_scanner import default_port, parse_ports, sweep
+
+
+@pytest.mark.parametrize("value, ports", [
+    ("8443,8080", [8443, 8080]),
+    (" 8443 , 8080 ,, ", [8443, 8080]),
+    ("8080,8443,8080", [8080, 8443]),
+    ("", []),
+    (None, []),
+])
+def test_parse_ports(value, ports):
+    assert parse_ports(value) == ports
+
+
+def test_parse_ports_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_ports("80,http")
+
+
+def test_default_port():
+    assert default_port("https", None) == 443
+    assert default_port("http", None) == 80
+    assert default_port("http", 8080) == 8080
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen()
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+def _closed_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_sweep_reports_open_ports_in_sweep_order(listener):
+    closed = _closed_port()
+    assert sweep(["h"], [closed, listener], {"h": ["127.0.0.1"]}, timeout=1.0) == {"h": [listener]}
+
+
+def test_sweep_falls_back_to_the_next_address(listener):
+    # nothing listens on 127.0.0.3: the host is reachable through its second record
+    swept = sweep(["h", "down"], [listener], {"h": ["127.0.0.3", "127.0.0.1"], "down": ["127.0.0.3"]}, timeout=1.0)
+    assert swept == {"h": [listener], "down": []}
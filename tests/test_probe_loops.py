@@ -0,0 +1,52 @@
+from app.services.probe_loops import ChunkTracker
+
+
+def test_callbacks_run_in_chunk_order_when_chunks_settle_out_of_order():
+    done = []
+    chunks = ChunkTracker()
+    first = chunks.add(2, lambda: done.append("first"))
+    second = chunks.add(1, lambda: done.append("second"))
+    third = chunks.add(1, lambda: done.append("third"))
+
+    chunks.settle(third)
+    chunks.settle(second)
+    assert done == []
+    assert len(chunks) == 3
+
+    chunks.settle(first)
+    assert done == []
+    chunks.settle(first)
+    assert done == ["first", "second", "third"]
+    assert len(chunks) == 0
+
+
+def test_later_chunk_waits_for_an_earlier_one():
+    done = []
+    chunks = ChunkTracker()
+    first = chunks.add(1, lambda: done.append("first"))
+    second = chunks.add(1, lambda: done.append("second"))
+    chunks.settle(first)
+    assert done == ["first"]
+    assert len(chunks) == 1
+    chunks.settle(second)
+    assert done == ["first", "second"]
+
+
+def test_empty_chunk_completes_once_the_chunks_before_it_do():
+    done = []
+    chunks = ChunkTracker()
+    assert chunks.add(0, lambda: done.append("empty")) == 0
+    assert done == ["empty"]
+
+    pending = chunks.add(1, lambda: done.append("pending"))
+    chunks.add(0, lambda: done.append("after"))
+    assert done == ["empty"]
+    chunks.settle(pending)
+    assert done == ["empty", "pending", "after"]
+
+
+def test_chunks_without_callback():
+    chunks = ChunkTracker()
+    tag = chunks.add(3)
+    chunks.settle(tag, 3)
+    assert len(chunks) == 0
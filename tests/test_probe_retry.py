@@ -0,0 +1,118 @@
+import pytest
+
+from app.services import probe_retry
+from app.services.probe_retry import RATE_LIMITED, TRANSIENT, RetryScheduler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(probe_retry.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _result(host, retry=None, retry_after=None, alive=False, status=None):
+    res = {"subdomain": host, "is_alive": alive, "status_code": status, "error": "boom" if retry else None, "open_ports": None}
+    if retry:
+        res.update(retry=retry, retry_after=retry_after)
+    return res
+
+
+def _scheduler(**kwargs):
+    params = dict(max_attempts=3, budget=100, base_delay=1.0, max_wait=30.0, breaker_threshold=10, breaker_cooldown=60.0)
+    params.update(kwargs)
+    return RetryScheduler(**params)
+
+
+def test_success_is_returned_as_is(clock):
+    res = _result("a", alive=True, status=200)
+    assert _scheduler().settle(res, "1.1.1.1") is res
+
+
+def test_transient_failure_backs_off_exponentially(clock):
+    retries = _scheduler()
+    assert retries.settle(_result("a", TRANSIENT), None) is None
+    assert retries.next_due_in() == 1.0
+    assert retries.due() == []
+
+    clock[0] += 1.0
+    assert retries.due() == ["a"]
+    assert retries.next_due_in() is None
+
+    assert retries.settle(_result("a", TRANSIENT), None) is None
+    assert retries.next_due_in() == 2.0
+
+
+def test_retry_after_sets_the_delay(clock):
+    retries = _scheduler()
+    retries.settle(_result("a", RATE_LIMITED, retry_after=7.5, alive=True, status=429), None)
+    assert retries.next_due_in() == 7.5
+
+
+def test_due_hands_out_hosts_in_not_before_order(clock):
+    retries = _scheduler()
+    retries.settle(_result("late", RATE_LIMITED, retry_after=5.0), None)
+    retries.settle(_result("early", RATE_LIMITED, retry_after=2.0), None)
+    clock[0] += 10.0
+    assert retries.due() == ["early", "late"]
+
+
+def test_last_answer_stands_after_max_attempts(clock):
+    retries = _scheduler(max_attempts=1)
+    assert retries.settle(_result("a", RATE_LIMITED, alive=True, status=429), None) is None
+    final = retries.settle(_result("a", RATE_LIMITED, alive=True, status=429), None)
+    assert final["status_code"] == 429 and final["is_alive"]
+    assert "retry" not in final and "retry_after" not in final
+
+
+def test_run_budget_caps_retries_across_hosts(clock):
+    retries = _scheduler(budget=2)
+    assert retries.settle(_result("a", TRANSIENT), None) is None
+    assert retries.settle(_result("b", TRANSIENT), None) is None
+    final = retries.settle(_result("c", TRANSIENT), None)
+    assert final["subdomain"] == "c" and not final["is_alive"]
+    assert retries.stats()["retried"] == 2
+
+
+def test_long_delay_is_deferred_to_the_schedule(clock):
+    retries = _scheduler(max_wait=30.0)
+    deferred = retries.settle(_result("a", RATE_LIMITED, retry_after=120.0, status=429), None)
+    assert deferred["deferred"] and deferred["retry_after"] == 120.0
+    assert deferred["status_code"] == 429
+    assert retries.next_due_in() is None
+    assert retries.stats()["deferred"] == 1
+
+
+def test_breaker_opens_per_ip_and_defers_its_hosts(clock):
+    retries = _scheduler(breaker_threshold=2, breaker_cooldown=60.0, max_wait=300.0)
+    retries.settle(_result("a", TRANSIENT), "10.0.0.1")
+    assert retries.admit("b", "10.0.0.1") is None
+    retries.settle(_result("c", TRANSIENT), "10.0.0.1")
+    assert retries.stats()["breaker_trips"] == 1
+    # the host that tripped it waits at least until the breaker closes
+    assert retries.next_due_in() == 1.0
+    clock[0] += 1.0
+    assert retries.due() == ["a"]
+    assert retries.next_due_in() == 59.0
+
+    blocked = retries.admit("b", "10.0.0.1")
+    assert blocked["deferred"] and blocked["retry_after"] == 59.0
+    assert retries.admit("b", "10.0.0.2") is None
+
+    clock[0] += 60.0
+    assert retries.admit("b", "10.0.0.1") is None
+
+
+def test_success_resets_the_breaker_count(clock):
+    retries = _scheduler(breaker_threshold=2)
+    retries.settle(_result("a", TRANSIENT), "10.0.0.1")
+    retries.settle(_result("b", alive=True, status=200), "10.0.0.1")
+    retries.settle(_result("c", TRANSIENT), "10.0.0.1")
+    assert retries.stats()["breaker_trips"] == 0
+
+
+def test_hosts_without_ip_have_their_own_breaker(clock):
+    retries = _scheduler(breaker_threshold=2)
+    retries.settle(_result("a", TRANSIENT), None)
+    retries.settle(_result("b", TRANSIENT), None)
+    assert retries.stats()["breaker_trips"] == 0
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import pytest
+
+from app.services.tls_names import cert_names, harvest_names, peer_cert_names, requested_root
+
+
+CERTS = Path(__file__).parent / "fixtures" / "certs"
+
+
+def _der(name: str) -> bytes:
+    return (CERTS / name).read_bytes()
+
+
+class _SslObject:
+    def __init__(self, der: bytes):
+        self.der = der
+
+    def getpeercert(self, binary_form: bool = False) -> bytes:
+        return self.der
+
+
+def test_san_names_in_certificate_order_without_duplicates():
+    assert cert_names(_der("san.der")) == ["www.example.com", "*.api.example.com", "mail.example.com"]
+
+
+def test_subject_cn_when_there_is_no_san():
+    assert cert_names(_der("cn_only.der")) == ["legacy.example.com"]
+
+
+def test_malformed_certificate_raises():
+    with pytest.raises(ValueError):
+        cert_names(_der("truncated.der"))
+
+
+@pytest.mark.parametrize("der", [_der("truncated.der"), b"\x30\x00", b"\x30"])
+def test_unreadable_peer_certificate_yields_none(der):
+    assert peer_cert_names(_SslObject(der)) is None
+
+
+def test_peer_certificate_names():
+    assert peer_cert_names(_SslObject(_der("san.der"))) == cert_names(_der("san.der"))
+
+
+def test_longest_requested_root_wins():
+    roots = ["example.com", "dev.example.com"]
+    assert requested_root("a.dev.example.com", roots) == "dev.example.com"
+    assert requested_root("dev.example.com", roots) == "dev.example.com"
+    assert requested_root("www.example.com", roots) == "example.com"
+    assert requested_root("www.notexample.com", roots) is None
+
+
+def test_names_outside_the_scan_root_are_not_harvested():
+    names = ["www.example.com", "*.api.dev.example.com", "mail.dev.example.com", "a.dev.example.com", "other.org"]
+    assert harvest_names("a.dev.example.com", names, ["dev.example.com"]) == {"api.dev.example.com", "mail.dev.example.com"}
+
+
+def test_host_under_no_root_harvests_nothing():
+    assert harvest_names("www.example.com", ["mail.example.com"], ["dev.example.com"]) == set()